@@ -0,0 +1,415 @@
+'''
+Created on Oct 18, 2026
+
+Event loop based version of the AWG server.
+'''
+
+import asyncore
+import socket
+import phase_timing
+import wire_capture
+import tracing
+from awg_server import AwgServer, OK, RPCBIND_BUF_SIZE, RPCBIND_DATAGRAM_SIZE, LISTEN_BACKLOG
+from rpc_record import RecordReader, BUF_SIZE
+from awg_process import ProcessAWG, AwgNotifier
+from awgdrivers.base_awg import BaseAWG
+
+# Maximum time the event loop waits for socket events. Defines how fast
+# the loop notices that the server was stopped.
+LOOP_TIMEOUT = 0.2
+
+class AsyncAwgServer(AwgServer):
+    '''
+    AWG server which runs RPCBIND and VXI-11 listeners as independent services
+    in a single event loop. Any number of oscilloscopes may be connected at the
+    same time. Each link is routed to the AWG assigned to its device name or,
+    if the name isn't assigned, to the address of the oscilloscope which opened it.
+    '''
+
+    def __init__(self, awg, host=None, rpcbind_port=None, vxi11_port=None, timer=None,
+                 pipelined=False, coalescing=False, awgs=None, speculative=False, devices=None,
+                 capture=None, tracer=None):
+        """
+        @param awg: the AWG used by oscilloscopes which are not listed in awgs.
+        @param timer: PhaseTimer measuring the connection cycles or None.
+        @param pipelined: if True, DEVICE_WRITE is acknowledged immediately
+                and the command is executed by a worker thread of the AWG.
+                The worker notifies the loop when it becomes idle, so
+                CREATE_LINK, DEVICE_READ and a DEVICE_WRITE to a full queue
+                pause only their connection, like with ProcessAWG.
+        @param coalescing: if True, the worker executes only the latest of
+                the pending frequency, amplitude and offset updates.
+                Implies pipelined mode.
+        @param awgs: dictionary mapping oscilloscope IP addresses to AWG instances.
+        @param speculative: if True, the AWG commands of the expected next sweep
+                frequency are prepared after each reply.
+        @param devices: dictionary mapping device names of VXI-11 links (e.g. inst0)
+                to AWG instances or to (AWG, channel) tuples.
+        @param capture: WireCapture recording the requests and replies or None.
+        @param tracer: Tracer recording the spans of the request path or None.
+        """
+        AwgServer.__init__(self, awg, host, rpcbind_port, vxi11_port, timer, pipelined, coalescing,
+                           speculative, devices, capture, tracer)
+
+        if awgs is None:
+            awgs = {}
+        for scope_awg in awgs.values():
+            if not isinstance(scope_awg, BaseAWG):
+                raise TypeError("awgs values must be of AWG class.")
+        self.awgs = awgs
+        self.socket_map = {}
+        self.rpcbind_listener = None
+        self.rpcbind_udp_listener = None
+        self.lxi_listener = None
+        self.running = False
+
+    def start(self):
+        """
+        Makes all required initializations and starts the server.
+        """
+
+        print "Starting AWG server (event loop)..."
+        print "Listening on %s" % (self.host)
+        print "RPCBIND on port %s (TCP and UDP)" % (self.rpcbind_port)
+        print "VXI-11 on port %s" % (self.vxi11_port)
+
+        print "Creating sockets..."
+        self.rpcbind_listener = Listener(self, self.host, self.rpcbind_port, RpcbindConnection)
+        self.rpcbind_udp_listener = RpcbindDatagramListener(self, self.host, self.rpcbind_port)
+        self.lxi_listener = Listener(self, self.host, self.vxi11_port, LxiConnection)
+
+        # Initialize one SCPI command parser per AWG and channel
+        self.create_parsers()
+        self.create_notifiers()
+
+        # Run the server
+        self.main_loop()
+
+    def main_loop(self):
+        """
+        The main loop of the server. Runs until all the sockets are closed.
+        """
+        print "\nWaiting for connection requests..."
+        self.running = True
+        while self.running and self.socket_map:
+            asyncore.loop(timeout=LOOP_TIMEOUT, use_poll=True, map=self.socket_map, count=1)
+
+    def stop(self):
+        """
+        Stops the event loop. May be called from another thread.
+        """
+        self.running = False
+
+    def create_parsers(self):
+        AwgServer.create_parsers(self)
+        for scope_awg in self.awgs.values():
+            self.get_awg_parser(scope_awg)
+
+    def create_notifiers(self):
+        """
+        Watches the AWGs running in other processes and the workers of
+        the pipelined mode, so the requests waiting for them are resumed
+        by the event loop.
+        """
+        for awg in set(awg for awg, _ in self.parsers):
+            if isinstance(awg, ProcessAWG):
+                AwgNotifier(awg, self.socket_map)
+        for queued_awg in self.queued_awgs.values():
+            AwgNotifier(queued_awg, self.socket_map)
+
+    def get_scope_awg(self, scope):
+        """
+        Returns the AWG which is assigned to the oscilloscope.
+        Oscilloscopes sharing the same AWG share its parser as well.
+        """
+        return self.awgs.get(scope, self.awg)
+
+    def close_sockets(self):
+        asyncore.close_all(map=self.socket_map)
+        AwgServer.close_sockets(self)
+
+
+class Listener(asyncore.dispatcher):
+    '''
+    Listening socket which creates a connection handler for each accepted
+    connection.
+    '''
+
+    def __init__(self, server, host, port, connection_class):
+        asyncore.dispatcher.__init__(self, map=server.socket_map)
+        self.server = server
+        self.connection_class = connection_class
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Disable the TIME_WAIT state of connected sockets.
+        self.set_reuse_addr()
+        # Send the replies without waiting for more data. Accepted sockets
+        # inherit this option.
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.bind((host, port))
+        self.listen(LISTEN_BACKLOG)
+
+    def handle_accept(self):
+        tracer = self.server.tracer
+        if tracer is not None:
+            start = tracer.now()
+        pair = self.accept()
+        if tracer is not None:
+            tracer.span(tracing.ACCEPT, start, {"port": self.addr[1]})
+        if pair is None:
+            return
+        connection, address = pair
+        self.connection_class(self.server, connection, address)
+
+    def handle_error(self):
+        # A failed accept must not stop the listener.
+        print "Error while accepting connection on port %s." % (self.addr[1],)
+
+
+class RpcbindDatagramListener(asyncore.dispatcher):
+    '''
+    Replies to RPCBIND/Portmap requests received over UDP.
+    '''
+
+    def __init__(self, server, host, port):
+        asyncore.dispatcher.__init__(self, map=server.socket_map)
+        self.server = server
+        self.create_socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        tracer = self.server.tracer
+        if tracer is not None:
+            start = tracer.now()
+        rx_data, address = self.socket.recvfrom(RPCBIND_DATAGRAM_SIZE)
+        if tracer is not None:
+            tracer.span(tracing.RECV, start, {"scope": address[0], "udp": True})
+        if self.server.timer is not None:
+            self.server.timer.begin(address[0])
+        print "\nIncoming datagram from %s:%s." % (address[0], address[1])
+        capture = self.server.capture
+        if capture is not None:
+            capture_id = capture.open_connection(wire_capture.RPCBIND_UDP)
+            capture.record(capture_id, wire_capture.RPCBIND_UDP, wire_capture.REQUEST, rx_data)
+        res, resp_data = self.server.handle_rpcbind_request(rx_data, udp=True)
+        if res == OK:
+            if tracer is not None:
+                start = tracer.now()
+            self.socket.sendto(resp_data, address)
+            if tracer is not None:
+                tracer.span(tracing.SEND, start, {"scope": address[0], "udp": True})
+            if capture is not None:
+                capture.record(capture_id, wire_capture.RPCBIND_UDP, wire_capture.REPLY, resp_data)
+            if self.server.timer is not None:
+                self.server.timer.mark(address[0], phase_timing.GETPORT)
+        else:
+            print "Incompatible RPCBIND request."
+
+    def handle_error(self):
+        # A bad datagram must not stop the listener.
+        print "Error while processing RPCBIND datagram."
+
+
+class Connection(asyncore.dispatcher_with_send):
+    '''
+    Base class of the connection handlers. Replies are buffered and
+    sent when the socket becomes writable.
+    '''
+
+    # Service of the connection in the capture file
+    SERVICE = None
+
+    def __init__(self, server, connection, address, buf_size):
+        asyncore.dispatcher_with_send.__init__(self, connection, map=server.socket_map)
+        self.server = server
+        self.address = address
+        self.closing = False
+        # Set while a request waits for the AWG. The following requests
+        # are buffered by the reader until it is processed.
+        self.paused = False
+        self.reader = RecordReader(buf_size)
+        self.capture_id = None
+        if server.capture is not None:
+            self.capture_id = server.capture.open_connection(self.SERVICE)
+
+    def send_reply(self, resp_data):
+        if self.capture_id is not None:
+            self.server.capture.record(self.capture_id, self.SERVICE, wire_capture.REPLY, resp_data)
+        tracer = self.server.tracer
+        if tracer is not None:
+            start = tracer.now()
+        self.send(str(resp_data))
+        if tracer is not None:
+            tracer.span(tracing.SEND, start, {"scope": self.address[0]})
+
+    def close(self):
+        if self.capture_id is not None:
+            self.server.capture.close_connection(self.capture_id, self.SERVICE)
+            self.capture_id = None
+        asyncore.dispatcher_with_send.close(self)
+
+    def close_when_done(self):
+        """
+        Closes the connection as soon as all the buffered data is sent.
+        """
+        self.closing = True
+        if not self.out_buffer:
+            self.close()
+
+    def readable(self):
+        # A paused connection doesn't read, so its requests wait in the socket
+        # and the reader buffer holding the paused request isn't overwritten.
+        return not self.paused
+
+    def handle_write(self):
+        asyncore.dispatcher_with_send.handle_write(self)
+        if self.closing and not self.out_buffer:
+            self.close()
+
+    def handle_close(self):
+        self.close()
+
+    def handle_error(self):
+        # An error in one connection must not stop the other ones.
+        print "Error while processing request from %s:%s." % (self.address[0], self.address[1])
+        self.close()
+
+    def handle_read(self):
+        tracer = self.server.tracer
+        if tracer is not None:
+            start = tracer.now()
+        n = self.reader.fill_nonblocking(self.socket)
+        if tracer is not None:
+            tracer.span(tracing.RECV, start, {"scope": self.address[0], "bytes": n})
+        if n is None:
+            return
+        if n == 0:
+            self.handle_close()
+            return
+        self.process_records()
+
+    def process_records(self):
+        """
+        Processes all the complete requests received so far.
+        """
+        while not self.closing and not self.paused:
+            rx_data = self.reader.next_record()
+            if rx_data is None:
+                break
+            if self.capture_id is not None:
+                self.server.capture.record(self.capture_id, self.SERVICE, wire_capture.REQUEST, rx_data)
+            self.process_request(rx_data)
+
+    def process_request(self, rx_data):
+        raise NotImplementedError()
+
+
+class RpcbindConnection(Connection):
+    '''
+    Replies to a RPCBIND/Portmap request and closes the connection.
+    '''
+
+    SERVICE = wire_capture.RPCBIND_TCP
+
+    def __init__(self, server, connection, address):
+        Connection.__init__(self, server, connection, address, RPCBIND_BUF_SIZE)
+        if server.timer is not None:
+            server.timer.begin(address[0])
+
+    def process_request(self, rx_data):
+        print "\nIncoming connection from %s:%s." % (self.address[0], self.address[1])
+        res, resp_data = self.server.handle_rpcbind_request(rx_data)
+        if res == OK:
+            self.send_reply(resp_data)
+            if self.server.timer is not None:
+                self.server.timer.mark(self.address[0], phase_timing.GETPORT)
+        else:
+            print "Incompatible RPCBIND request."
+        self.close_when_done()
+
+
+class LxiConnection(Connection):
+    '''
+    Processes VXI-11 requests of the links opened over one connection
+    until the last of them is destroyed.
+    '''
+
+    SERVICE = wire_capture.VXI11
+
+    def __init__(self, server, connection, address):
+        Connection.__init__(self, server, connection, address, BUF_SIZE)
+        # Links opened over this connection
+        self.links = set()
+        if server.timer is not None:
+            server.timer.mark(address[0], phase_timing.CONNECT)
+
+    def process_request(self, rx_data):
+        """
+        A request which must wait for the AWG is processed when the AWG
+        becomes idle. Meanwhile, the event loop serves other connections.
+        """
+        awg = self.server.get_request_awg(rx_data, self.address[0])
+        if awg is None or awg.is_idle():
+            self.execute_request(rx_data)
+            return
+        # The record is a view of the reader buffer, which is reused by later reads.
+        rx_data = rx_data.tobytes()
+        self.paused = True
+        awg.call_when_idle(lambda: self.resume(rx_data))
+
+    def resume(self, rx_data):
+        """
+        Processes the request which waited for the AWG and the requests received meanwhile.
+        """
+        self.paused = False
+        if not self.connected:
+            return
+        self.execute_request(rx_data)
+        self.process_records()
+
+    def execute_request(self, rx_data):
+        """
+        Processes a request. If the AWG must execute the command before it is
+        acknowledged, the reply is sent when the AWG becomes idle.
+        """
+        tracer = self.server.tracer
+        if tracer is not None:
+            start = tracer.now()
+        resp_data, link_open = self.server.handle_lxi_request(rx_data, self.links, self.address[0])
+        if tracer is not None:
+            tracer.span(tracing.HANDLE_LXI, start)
+        awg = self.server.get_reply_awg(rx_data)
+        if awg is None or awg.is_idle():
+            self.complete_request(resp_data, link_open)
+            return
+        self.paused = True
+        awg.call_when_idle(lambda: self.resume_reply(resp_data, link_open))
+
+    def resume_reply(self, resp_data, link_open):
+        """
+        Sends the reply which waited for the AWG and processes the requests received meanwhile.
+        """
+        self.paused = False
+        if not self.connected:
+            return
+        self.complete_request(resp_data, link_open)
+        self.process_records()
+
+    def complete_request(self, resp_data, link_open):
+        if resp_data is not None:
+            self.send_reply(resp_data)
+        self.server.prefetch()
+        if not link_open:
+            self.close_when_done()
+
+    def close(self):
+        # Links which weren't destroyed die with the connection
+        self.server.close_links(self.links)
+        self.links.clear()
+        Connection.close(self)
+
+if __name__ == '__main__':
+    raise Exception("This module is not for running. Run bode.py instead.")
@@ -0,0 +1,247 @@
+'''
+Created on Oct 18, 2026
+
+Runs AWG drivers in worker processes, so the serial port I/O of one AWG
+never delays the oscilloscopes which use other AWGs.
+'''
+
+import asyncore
+import multiprocessing
+from awg_factory import awg_factory
+from awgdrivers.base_awg import BaseAWG, DEFAULT_DWELL
+from awgdrivers.caching_awg import CachingAWG
+
+def create_awg(driver, port, baud_rate=None, ack=True, caching=False):
+    """
+    Creates and initializes an AWG the way bode.py does.
+    @param driver: short name of the AWG driver.
+    @param baud_rate: passed to the driver only if it isn't None.
+    @param ack: if False, the transport waits a fixed delay instead of
+            the acknowledgements of the AWG.
+    @param caching: if True, the AWG is wrapped by CachingAWG.
+    """
+    awg_class = awg_factory.get_class_by_name(driver)
+    if baud_rate is None:
+        awg = awg_class(port)
+    else:
+        awg = awg_class(port, baud_rate)
+    transport = getattr(awg, "transport", None)
+    if not ack and transport is not None:
+        transport.ack = None
+    if caching:
+        awg = CachingAWG(awg)
+    awg.initialize()
+    return awg
+
+def run_awg_process(conn, driver, port, baud_rate, ack, caching):
+    """
+    Main function of a worker process. Executes the operations received
+    from the pipe in the order of their arrival and sends the result
+    of each operation back.
+    """
+    awg = create_awg(driver, port, baud_rate, ack, caching)
+    try:
+        while True:
+            method, args = conn.recv()
+            if method is None:
+                break
+            result = None
+            try:
+                result = getattr(awg, method)(*args)
+            except Exception, e:
+                # A failed command must not stop the following ones.
+                print "AWG command %s%s failed: %s" % (method, args, e)
+            conn.send(result)
+    except (EOFError, KeyboardInterrupt):
+        # The server process exited
+        pass
+    finally:
+        transport = getattr(awg, "transport", None)
+        if isinstance(awg, CachingAWG):
+            transport = getattr(awg.awg, "transport", None)
+            print "AWG cache of %s: %s." % (port, awg.get_stats())
+        if transport is not None:
+            print "AWG serial port %s: %s." % (port, transport.get_stats())
+        awg.disconnect()
+
+
+class ProcessAWG(BaseAWG):
+    '''
+    AWG proxy which passes the operations to a driver running in a worker
+    process. The methods return as soon as the operation is sent.
+
+    The worker reports each executed operation. The reports are read by
+    poll(), which is called by the event loop of the server when the pipe
+    becomes readable (see AwgNotifier), so the server learns that the AWG
+    is idle without waiting for it.
+    '''
+    SHORT_NAME = "process"
+
+    def __init__(self, driver, port, baud_rate=None, ack=True, caching=False):
+        self.driver = driver
+        self.port = port
+        self.baud_rate = baud_rate
+        self.ack = ack
+        self.caching = caching
+        self.conn = None
+        self.process = None
+        # Number of operations sent and executed
+        self.sent = 0
+        self.done = 0
+        self.result = None
+        self.alive = True
+        self.idle_callbacks = []
+
+    def start(self):
+        """
+        Starts the worker process.
+        """
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=run_awg_process, name="AWG-%s" % self.port,
+            args=(child_conn, self.driver, self.port, self.baud_rate, self.ack, self.caching))
+        self.process.daemon = True
+        self.process.start()
+        # Only the worker keeps its end of the pipe, so the pipe is closed
+        # when the worker exits.
+        child_conn.close()
+
+    def stop(self, timeout=None):
+        """
+        Lets the worker execute the sent operations and stops it.
+        """
+        if self.alive:
+            try:
+                self.conn.send((None, None))
+            except IOError:
+                pass
+        self.process.join(timeout)
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def put(self, method, *args):
+        if not self.alive:
+            return
+        self.conn.send((method, args))
+        self.sent += 1
+
+    def receive(self):
+        """
+        Reads the report of one executed operation.
+        """
+        try:
+            self.result = self.conn.recv()
+            self.done += 1
+        except (EOFError, IOError):
+            # The worker died. Its operations will never be executed.
+            print "AWG process of %s exited." % (self.port)
+            self.alive = False
+            self.done = self.sent
+
+    def poll(self):
+        """
+        Reads the available reports and calls the callbacks waiting for
+        the AWG if it became idle.
+        """
+        while self.done < self.sent and self.conn.poll():
+            self.receive()
+        if self.done == self.sent and self.idle_callbacks:
+            callbacks = self.idle_callbacks
+            self.idle_callbacks = []
+            for callback in callbacks:
+                callback()
+
+    def is_idle(self):
+        self.poll()
+        return self.done == self.sent
+
+    def wait_idle(self):
+        while self.done < self.sent:
+            self.receive()
+        self.poll()
+
+    def call_when_idle(self, callback):
+        """
+        Calls the callback from poll() when the AWG becomes idle.
+        """
+        self.idle_callbacks.append(callback)
+        self.poll()
+
+    def handle_notification(self):
+        """
+        Is called by AwgNotifier when the pipe is readable.
+        """
+        if self.done == self.sent:
+            # No report is expected, so the worker closed the pipe.
+            self.receive()
+        self.poll()
+
+    def connect(self):
+        self.put("connect")
+
+    def disconnect(self):
+        self.put("disconnect")
+
+    def initialize(self):
+        self.put("initialize")
+
+    def get_id(self):
+        self.put("get_id")
+        self.wait_idle()
+        return self.result
+
+    def enable_output(self, channel, on):
+        self.put("enable_output", channel, on)
+
+    def set_frequency(self, channel, freq):
+        self.put("set_frequency", channel, freq)
+
+    def set_phase(self, phase):
+        self.put("set_phase", phase)
+
+    def set_wave_type(self, channel, wave_type):
+        self.put("set_wave_type", channel, wave_type)
+
+    def set_amplitue(self, channel, amplitude):
+        self.put("set_amplitue", channel, amplitude)
+
+    def set_offset(self, channel, offset):
+        self.put("set_offset", channel, offset)
+
+    def set_load_impedance(self, channel, z):
+        self.put("set_load_impedance", channel, z)
+
+    def apply(self, channel, settings):
+        self.put("apply", channel, settings)
+
+    def run_sweep(self, start, stop, points, log=True, dwell=DEFAULT_DWELL, channel=1):
+        self.put("run_sweep", start, stop, points, log, dwell, channel)
+
+
+class AwgNotifier(asyncore.file_dispatcher):
+    '''
+    Watches the notification pipe of an AWG proxy (ProcessAWG, RingAWG or
+    QueuedAWG) in the event loop of the server.
+    '''
+
+    def __init__(self, awg, socket_map):
+        # Unlike file_dispatcher, the pipe is left in blocking mode, because
+        # wait_idle() reads it as well. The loop reads it only when it is readable.
+        asyncore.dispatcher.__init__(self, None, socket_map)
+        self.connected = True
+        self.set_file(awg.fileno())
+        self.awg = awg
+
+    def writable(self):
+        return False
+
+    def readable(self):
+        return self.awg.alive
+
+    def handle_read(self):
+        self.awg.handle_notification()
+
+    def handle_error(self):
+        print "Error while reading the notifications of AWG %s." % (getattr(self.awg, "port", self.awg.SHORT_NAME))
+        self.del_channel()
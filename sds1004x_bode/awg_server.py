@@ -6,8 +6,17 @@ Created on Apr 14, 2018
 
 import sys
 import socket
+import select
+import itertools
 from awgdrivers.base_awg import BaseAWG
+from awgdrivers.channel_awg import ChannelAWG
 from command_parser import CommandParser
+from awg_worker import AwgWorker, QueuedAWG
+from rpc_record import RecordReader
+import xdr_codec
+import phase_timing
+import wire_capture
+import tracing
 
 # Host and ports to use.
 ## Setting host to 0.0.0.0 will bind the incoming connections to any interface.
@@ -17,6 +26,16 @@ HOST = '0.0.0.0'
 RPCBIND_PORT = 111
 VXI11_PORT = 703
 
+# Maximum number of pending connections on each listening socket.
+## The oscilloscope opens new RPCBIND and VXI-11 connections for every command.
+## They are queued by the OS while the previous command is still being processed.
+LISTEN_BACKLOG = 16
+
+# Receive buffer size of RPCBIND connections. GETPORT request is 60 bytes long.
+RPCBIND_BUF_SIZE = 128
+# Maximum size of RPCBIND request received over UDP.
+RPCBIND_DATAGRAM_SIZE = 1024
+
 # AWG ID to send to the oscilloscope
 ## Examples: SDG SDG2042X SDG0000X SDG2000X
 ## The ID should begin with SDG letters.
@@ -37,15 +56,53 @@ LXI_PROCEDURES = {
 
 # VXI-11 Core (395183)
 VXI11_CORE_ID = 395183
+# VXI-11 error codes
+## Invalid link identifier
+INVALID_LINK_ERROR = 4
 # Function responses
 NOT_VXI11_ERROR = -1
 NOT_GET_PORT_ERROR = -2
 UNKNOWN_COMMAND_ERROR = -4
 OK = 0
 
+class Link(object):
+    '''
+    VXI-11 link opened by CREATE_LINK.
+    '''
+
+    def __init__(self, link_id, device, parser):
+        """
+        @param device: device name requested by the oscilloscope, e.g. inst0.
+        @param parser: CommandParser of the AWG or channel the link controls.
+        """
+        self.link_id = link_id
+        self.device = device
+        self.parser = parser
+        # Reply to the last query written over the link, read by DEVICE_READ
+        self.reply = None
+
 class AwgServer(object):
 
-    def __init__(self, awg, host=None, rpcbind_port=None, vxi11_port=None):
+    def __init__(self, awg, host=None, rpcbind_port=None, vxi11_port=None, timer=None,
+                 pipelined=False, coalescing=False, speculative=False, devices=None, capture=None,
+                 tracer=None):
+        """
+        @param awg: the AWG controlled by links whose device name isn't listed in devices.
+        @param timer: PhaseTimer measuring the connection cycles or None.
+        @param pipelined: if True, DEVICE_WRITE is acknowledged immediately
+                and the command is executed by a worker thread of the AWG.
+        @param coalescing: if True, the worker executes only the latest of
+                the pending frequency, amplitude and offset updates.
+                Implies pipelined mode.
+        @param speculative: if True, the AWG commands of the expected next sweep
+                frequency are prepared after each reply.
+        @param devices: dictionary mapping device names of VXI-11 links (e.g. inst0)
+                to AWG instances or to (AWG, channel) tuples. In the latter case
+                the link controls the given channel of the AWG, whatever channel
+                the oscilloscope sets.
+        @param capture: WireCapture recording the requests and replies or None.
+        @param tracer: Tracer recording the spans of the request path or None.
+        """
         if host is not None:
             self.host = host
         else:
@@ -68,15 +125,59 @@ class AwgServer(object):
         if awg is None or not isinstance(awg, BaseAWG):
                 raise TypeError("awg variable must be of AWG class.")
         self.awg = awg
+        self.timer = timer
+        self.pipelined = pipelined or coalescing
+        self.coalescing = coalescing
+        self.speculative = speculative
+        self.capture = capture
+        self.tracer = tracer
+        self.workers = []
+        
+        # Device name -> (AWG, channel or None)
+        self.devices = {}
+        if devices is None:
+            devices = {}
+        for device, target in devices.items():
+            device_awg, channel = target if isinstance(target, tuple) else (target, None)
+            if not isinstance(device_awg, BaseAWG):
+                raise TypeError("devices values must be of AWG class.")
+            self.devices[device] = (device_awg, channel)
+        # (AWG, channel) -> CommandParser
+        self.parsers = {}
+        # AWG -> QueuedAWG passing its commands to the worker in pipelined mode
+        self.queued_awgs = {}
+        # Link ID -> Link
+        self.links = {}
+        self.link_ids = itertools.count()
+        
+        self.build_reply_templates()
+    
+    def build_reply_templates(self):
+        """
+        Prepares the replies whose body never changes. Only XID of
+        the request has to be inserted into them.
+        """
+        self.rpcbind_reply = xdr_codec.ReplyTemplate(self.generate_rpcbind_response())
+        self.idn_reply = xdr_codec.ReplyTemplate(self.generate_lxi_idn_response(AWG_ID_STRING))
+        self.destroy_link_reply = xdr_codec.ReplyTemplate(self.generate_lxi_destroy_link_response())
         
     def create_socket(self, host, port):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         # Disable the TIME_WAIT state of connected sockets. 
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Send the replies without waiting for more data. Accepted sockets
+        # inherit this option.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         sock.bind((host, port))
-        sock.listen(1) # Become a server socket, maximum 1 connection
+        sock.listen(LISTEN_BACKLOG) # Become a server socket
         return sock 
 
+    def create_udp_socket(self, host, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        return sock
+
     def start(self):
         """
         Makes all required initializations and starts the server.
@@ -84,17 +185,18 @@ class AwgServer(object):
         
         print "Starting AWG server..."
         print "Listening on %s" % (self.host)
-        print "RPCBIND on port %s" % (self.rpcbind_port)
+        print "RPCBIND on port %s (TCP and UDP)" % (self.rpcbind_port)
         print "VXI-11 on port %s" % (self.vxi11_port)
         
         print "Creating sockets..."
-        # Create RPCBIND socket
+        # Create RPCBIND sockets
         self.rpcbind_socket = self.create_socket(self.host, self.rpcbind_port)
+        self.rpcbind_udp_socket = self.create_udp_socket(self.host, self.rpcbind_port)
         # Create VXI-11 socket
         self.lxi_socket = self.create_socket(self.host, self.vxi11_port)
         
-        # Initialize SCPI command parser
-        self.parser = CommandParser(self.awg)
+        # Initialize SCPI command parsers
+        self.create_parsers()
         
         # Connect to the external AWG
         #self.awg.initialize()
@@ -102,6 +204,153 @@ class AwgServer(object):
         # Run the server
         self.main_loop()
         
+    def create_parsers(self):
+        """
+        Creates the parsers of all the known AWGs and channels in advance,
+        so pipelined mode workers are running before the first link.
+        """
+        self.get_awg_parser(self.awg)
+        for device_awg, channel in self.devices.values():
+            self.get_awg_parser(device_awg, channel)
+    
+    def create_parser(self, awg, channel=None):
+        """
+        Creates SCPI command parser of an AWG. In pipelined mode the parser
+        passes the commands to a worker thread which owns the AWG.
+        @param channel: if not None, the parser controls only this channel of the AWG.
+        """
+        if self.pipelined:
+            awg = self.get_queued_awg(awg)
+        if channel is not None:
+            awg = ChannelAWG(awg, channel)
+        return CommandParser(awg, self.speculative)
+    
+    def get_queued_awg(self, awg):
+        """
+        Returns the proxy passing the commands to the worker of an AWG.
+        Each AWG has a single worker, even if several parsers control it.
+        """
+        queued_awg = self.queued_awgs.get(awg)
+        if queued_awg is None:
+            worker = AwgWorker(awg, coalescing=self.coalescing)
+            worker.start()
+            self.workers.append(worker)
+            queued_awg = self.queued_awgs[awg] = QueuedAWG(worker)
+        return queued_awg
+    
+    def get_awg_parser(self, awg, channel=None):
+        """
+        Returns the parser of an AWG or of its channel. Links controlling
+        the same AWG and channel share the parser.
+        """
+        key = (awg, channel)
+        parser = self.parsers.get(key)
+        if parser is None:
+            parser = self.parsers[key] = self.create_parser(awg, channel)
+        return parser
+    
+    def get_parsers(self):
+        """
+        Returns the parsers of all the AWGs.
+        """
+        return self.parsers.values()
+    
+    def get_scope_awg(self, scope):
+        """
+        Returns the AWG controlled by an oscilloscope whose link
+        device name isn't listed in devices.
+        @param scope: IP address of the oscilloscope.
+        """
+        return self.awg
+    
+    def get_device_parser(self, device, scope=None):
+        """
+        Returns the parser of the AWG or channel assigned to a device name.
+        """
+        target = self.devices.get(device)
+        if target is not None:
+            return self.get_awg_parser(*target)
+        return self.get_awg_parser(self.get_scope_awg(scope))
+    
+    def get_request_awg(self, rx_buf, scope=None):
+        """
+        Returns the AWG which must execute all the queued commands before
+        the request is processed or None if the request doesn't wait for it.
+        DEVICE_WRITE waits only if the AWG can't queue another command.
+        """
+        vxi11_procedure = xdr_codec.unpack_uint(rx_buf, 0x18)
+        if vxi11_procedure == CREATE_LINK:
+            _, _, device = self.parse_lxi_request(rx_buf)
+            return self.get_device_parser(device, scope).awg
+        if vxi11_procedure in (DEVICE_READ, DEVICE_WRITE):
+            link = self.links.get(self.get_link_id(rx_buf))
+            if link is not None and (vxi11_procedure == DEVICE_READ or link.parser.awg.is_full()):
+                return link.parser.awg
+        return None
+    
+    def get_reply_awg(self, rx_buf):
+        """
+        Returns the AWG which must execute all the queued commands before
+        the reply to the request is sent or None if the reply is sent at once.
+        Drivers execute a command before the parser returns and the pipelined
+        mode acknowledges the commands early, so this implementation returns None.
+        """
+        return None
+    
+    def create_link(self, device, scope=None):
+        """
+        Opens a VXI-11 link to the AWG or channel assigned to the device name.
+        @return: Link.
+        """
+        # Link IDs are unsigned 32-bit integers
+        link = Link(next(self.link_ids) & 0xFFFFFFFF, device, self.get_device_parser(device, scope))
+        self.links[link.link_id] = link
+        return link
+    
+    def close_links(self, link_ids):
+        """
+        Forgets the links. Is called when the links are destroyed or when
+        the connection which opened them is closed.
+        """
+        for link_id in link_ids:
+            self.links.pop(link_id, None)
+    
+    def prefetch(self):
+        """
+        Lets the parsers prepare the expected commands after a reply was sent.
+        """
+        for parser in self.parsers.itervalues():
+            parser.prefetch()
+    
+    def print_parser_stats(self):
+        """
+        Prints the hit rates of the speculative frequency preparation
+        and of the command cache.
+        """
+        for (awg, channel), parser in self.parsers.items():
+            name = getattr(awg, "driver", awg.SHORT_NAME)
+            if getattr(awg, "port", None) is not None:
+                name += " at %s" % (awg.port)
+            if channel is not None:
+                name += " channel %d" % (channel)
+            print "Parser of %s: %s." % (name, parser.get_stats())
+    
+    def stop_workers(self):
+        """
+        Lets the workers execute the queued commands, which were already
+        acknowledged to the oscilloscope, and stops them.
+        """
+        for worker in self.workers:
+            worker.stop()
+    
+    def print_worker_stats(self):
+        """
+        Prints the backlog statistics of the coalescing queues.
+        """
+        for worker in self.workers:
+            if self.coalescing:
+                print "Queue of %s: %s." % (worker.awg.SHORT_NAME, worker.queue.get_stats())
+    
     def main_loop(self):
         """
         The main loop of the server.
@@ -122,127 +371,305 @@ class AwgServer(object):
         self.signal_gen.connect()
     
     def process_rpcbind_request(self):
-        """Replies to RPCBIND/Portmap request and sends VXI-11 port number to the oscilloscope."""
-        #while True:
+        """Replies to RPCBIND/Portmap request and sends VXI-11 port number to the oscilloscope.
+        The request may arrive either over TCP or over UDP."""
+        readable, _, _ = select.select([self.rpcbind_socket, self.rpcbind_udp_socket], [], [])
+        if self.rpcbind_udp_socket in readable:
+            return self.process_rpcbind_datagram()
+        
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.now()
         connection, address = self.rpcbind_socket.accept()
-        rx_data = connection.recv(128)
-        if len(rx_data) > 0:
+        if tracer is not None:
+            tracer.span(tracing.ACCEPT, start, {"port": self.rpcbind_port})
+        if self.timer is not None:
+            self.timer.begin(address[0])
+        if self.capture is not None:
+            capture_id = self.capture.open_connection(wire_capture.RPCBIND_TCP)
+        if tracer is not None:
+            start = tracer.now()
+        rx_data = RecordReader(RPCBIND_BUF_SIZE).read_record(connection)
+        if tracer is not None:
+            tracer.span(tracing.RECV, start, {"scope": address[0]})
+        res = OK
+        if rx_data is not None:
             print "\nIncoming connection from %s:%s." % (address[0], address[1])
-            # Validate the request.
-            ## If the request is not GETPORT or does not come from VXI-11 Core (395183),
-            ## we have nothing to do wit it
-            procedure = self.bytes_to_uint(rx_data[0x18:0x1c])
-            if procedure != GET_PORT:
-                return NOT_GET_PORT_ERROR
-            program_id = self.bytes_to_uint(rx_data[0x2C:0x30])
-            if program_id != VXI11_CORE_ID:
-                return NOT_VXI11_ERROR
-            # Generate and send response
-            resp = self.generate_rpcbind_response()
-            resp_data = self.generate_resp_data(rx_data, resp)
-            connection.send(resp_data)
+            if self.capture is not None:
+                self.capture.record(capture_id, wire_capture.RPCBIND_TCP, wire_capture.REQUEST, rx_data)
+            res, resp_data = self.handle_rpcbind_request(rx_data)
+            if res == OK:
+                if tracer is not None:
+                    start = tracer.now()
+                connection.send(resp_data)
+                if tracer is not None:
+                    tracer.span(tracing.SEND, start, {"scope": address[0]})
+                if self.capture is not None:
+                    self.capture.record(capture_id, wire_capture.RPCBIND_TCP, wire_capture.REPLY, resp_data)
+                if self.timer is not None:
+                    self.timer.mark(address[0], phase_timing.GETPORT)
         # Close connection and RPCBIND socket.
         connection.close()
-        return OK
+        if self.capture is not None:
+            self.capture.close_connection(capture_id, wire_capture.RPCBIND_TCP)
+        return res
+    
+    def process_rpcbind_datagram(self):
+        """Replies to RPCBIND/Portmap request received over UDP."""
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.now()
+        rx_data, address = self.rpcbind_udp_socket.recvfrom(RPCBIND_DATAGRAM_SIZE)
+        if tracer is not None:
+            tracer.span(tracing.RECV, start, {"scope": address[0], "udp": True})
+        if self.timer is not None:
+            self.timer.begin(address[0])
+        print "\nIncoming datagram from %s:%s." % (address[0], address[1])
+        if self.capture is not None:
+            capture_id = self.capture.open_connection(wire_capture.RPCBIND_UDP)
+            self.capture.record(capture_id, wire_capture.RPCBIND_UDP, wire_capture.REQUEST, rx_data)
+        res, resp_data = self.handle_rpcbind_request(rx_data, udp=True)
+        if res == OK:
+            if tracer is not None:
+                start = tracer.now()
+            self.rpcbind_udp_socket.sendto(resp_data, address)
+            if tracer is not None:
+                tracer.span(tracing.SEND, start, {"scope": address[0], "udp": True})
+            if self.capture is not None:
+                self.capture.record(capture_id, wire_capture.RPCBIND_UDP, wire_capture.REPLY, resp_data)
+            if self.timer is not None:
+                self.timer.mark(address[0], phase_timing.GETPORT)
+        return res
+    
+    def handle_rpcbind_request(self, rx_data, udp=False):
+        """Validates RPCBIND/Portmap request and generates the reply.
+        @param rx_data: bytes array containing the source packet.
+        @param udp: True if the packet was received over UDP. UDP packets
+                don't have the record marking header.
+        @return: a tuple with 2 values:
+                1. status - is 0 if the request could be processed, error code otherwise.
+                2. response data to be sent to the oscilloscope or None."""
+        offset = -xdr_codec.RECORD_MARK_SIZE if udp else 0
+        if len(rx_data) < 0x30 + offset:
+            return (NOT_GET_PORT_ERROR, None)
+        # Validate the request.
+        ## If the request is not GETPORT or does not come from VXI-11 Core (395183),
+        ## we have nothing to do wit it
+        procedure = xdr_codec.unpack_uint(rx_data, 0x18 + offset)
+        if procedure != GET_PORT:
+            return (NOT_GET_PORT_ERROR, None)
+        program_id = xdr_codec.unpack_uint(rx_data, 0x2C + offset)
+        if program_id != VXI11_CORE_ID:
+            return (NOT_VXI11_ERROR, None)
+        # Generate response
+        if udp:
+            resp_data = self.rpcbind_reply.render_datagram_for(rx_data)
+        else:
+            resp_data = self.rpcbind_reply.render_for(rx_data)
+        return (OK, resp_data)
     
     def process_lxi_requests(self):
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.now()
         connection, address = self.lxi_socket.accept()
+        if tracer is not None:
+            tracer.span(tracing.ACCEPT, start, {"port": self.vxi11_port})
+        if self.timer is not None:
+            self.timer.mark(address[0], phase_timing.CONNECT)
+        if self.capture is not None:
+            capture_id = self.capture.open_connection(wire_capture.VXI11)
+        reader = RecordReader()
+        # Links opened over this connection
+        links = set()
         while True:
-            rx_buf = connection.recv(255)
-            if len(rx_buf) > 0:
-                # Parse incoming VXI-11 command
-                status, vxi11_procedure, scpi_command = self.parse_lxi_request(rx_buf)
-                
-                if status == NOT_VXI11_ERROR:
-                    print "Received VXI-11 request from an unknown source."
-                    break
-                elif status == UNKNOWN_COMMAND_ERROR:
-                    print "Unknown VXI-11 request received. Procedure id %s" % (vxi11_procedure)
-                    break
-                
-                print "VXI-11 %s, SCPI command: %s" % (LXI_PROCEDURES[vxi11_procedure], scpi_command)
-                
-                # Process the received VXI-11 request
-                if vxi11_procedure == CREATE_LINK:
-                    resp = self.generate_lxi_create_link_response()
-                
-                elif vxi11_procedure == DEVICE_WRITE:
-                    """
-                    The parser parses and executes the received SCPI command.
-                    VXI-11 DEVICE_WRITE function requires an empty reply.
-                    """
-                    self.parser.parse_scpi_command(scpi_command)
-                
-                elif vxi11_procedure == DEVICE_READ:
-                    """
-                    DEVICE_READ request is sent to a device when an answer after
-                    command execution is expected. SDG1000X-E sends this request
-                    in two cases:
-                        a.  It requests the ID of the AWG (*IDN? command).
-                            In this case we MUST supply a valid ID to make
-                            the scope think that it is working with a genuine
-                            Siglent AWG.
-                        b.  After setting all the parameters of the AWG and
-                            before starting frequency sweep (C1:BSWV? command).
-                            It looks like the scope is supposed to verify that
-                            all the required AWG settings were set correctly.
-                        In the real life it seems that in the second case the scope
-                        totally ignores the response and will accept any garbage.
-                        It makes our life easy and we send AWG ID as reply
-                        to any DEVICE_READ request.
-                    """
-                    resp = self.generate_lxi_idn_response(AWG_ID_STRING)
-                
-                elif vxi11_procedure == DESTROY_LINK:
-                    """
-                    If DESTROY_LINK is received, the oscilloscope ends the session
-                    opened by CREATE_LINK request and won't send any commands before
-                    issuing a new CREATE_LINK request.
-                    All we have to do is to exit the loop and continue listening to
-                    RPCBIND requests.
-                    """
-                    break
-                
-                else:
-                    """
-                    If the received command is none of the above, something
-                    went wrong and we should exit the loop and continue
-                    listening to RPCBIND requests.
-                    """
-                    break
-                
-                # Generate and send response
-                resp_data = self.generate_resp_data(rx_buf, resp)
+            # The span includes the time the oscilloscope takes to send the request.
+            if tracer is not None:
+                start = tracer.now()
+            rx_buf = reader.read_record(connection)
+            if tracer is not None:
+                tracer.span(tracing.RECV, start, {"scope": address[0]})
+            if rx_buf is None:
+                # The oscilloscope closed the connection without DESTROY_LINK.
+                break
+            if self.capture is not None:
+                self.capture.record(capture_id, wire_capture.VXI11, wire_capture.REQUEST, rx_buf)
+            if tracer is not None:
+                start = tracer.now()
+            resp_data, link_open = self.handle_lxi_request(rx_buf, links, address[0])
+            if tracer is not None:
+                tracer.span(tracing.HANDLE_LXI, start)
+            if resp_data is not None:
+                if tracer is not None:
+                    start = tracer.now()
                 connection.send(resp_data)
+                if tracer is not None:
+                    tracer.span(tracing.SEND, start, {"scope": address[0]})
+                if self.capture is not None:
+                    self.capture.record(capture_id, wire_capture.VXI11, wire_capture.REPLY, resp_data)
+            self.prefetch()
+            if not link_open:
+                break
                 
-        # Close connection
+        # Close connection. The OS completes the TCP shutdown on its own,
+        # so the next RPCBIND connection can be accepted right away.
         connection.close()
+        if self.capture is not None:
+            self.capture.close_connection(capture_id, wire_capture.VXI11)
+        self.close_links(links)
+
+    def handle_lxi_request(self, rx_buf, links, scope=None):
+        """Processes a single VXI-11 request and executes the SCPI command it carries.
+        The command is executed by the parser of the link the request refers to.
+        @param rx_buf: bytes array containing the source packet.
+        @param links: set of IDs of the links opened over the connection.
+                CREATE_LINK and DESTROY_LINK update it.
+        @param scope: IP address of the oscilloscope. Selects the AWG of a link
+                whose device name isn't listed in devices.
+        @return: a tuple with 2 values:
+                1. response data to be sent to the oscilloscope or None.
+                2. False if the connection must be closed after sending the response."""
+        # Parse incoming VXI-11 command
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.now()
+        status, vxi11_procedure, scpi_command = self.parse_lxi_request(rx_buf)
+        if tracer is not None:
+            args = {"procedure": LXI_PROCEDURES.get(vxi11_procedure)}
+            if vxi11_procedure in (CREATE_LINK, DEVICE_WRITE):
+                args["command"] = scpi_command
+            tracer.span(tracing.PARSE_LXI, start, args)
+        
+        if status == NOT_VXI11_ERROR:
+            print "Received VXI-11 request from an unknown source."
+            return (None, False)
+        elif status == UNKNOWN_COMMAND_ERROR:
+            print "Unknown VXI-11 request received. Procedure id %s" % (vxi11_procedure)
+            return (None, False)
+        
+        print "VXI-11 %s, SCPI command: %s" % (LXI_PROCEDURES[vxi11_procedure], scpi_command)
+        
+        # Find the link of the request. CREATE_LINK opens a new one,
+        # its SCPI command is the device name.
+        if vxi11_procedure == CREATE_LINK:
+            link = self.create_link(scpi_command, scope)
+            links.add(link.link_id)
+        else:
+            link = self.links.get(self.get_link_id(rx_buf))
+            if link is None:
+                print "Invalid link ID %s." % (self.get_link_id(rx_buf))
+                return (self.generate_resp_data(rx_buf, self.generate_lxi_error_response(
+                    vxi11_procedure, INVALID_LINK_ERROR)), True)
+        parser = link.parser
+        
+        # If the AWG queues the commands (pipelined mode or worker processes),
+        # a new link and a read must see all the previously written commands executed.
+        if vxi11_procedure in (CREATE_LINK, DEVICE_READ):
+            parser.awg.wait_idle()
+        
+        # Process the received VXI-11 request
+        if vxi11_procedure == CREATE_LINK:
+            resp_data = self.generate_resp_data(rx_buf, self.generate_lxi_create_link_response(link.link_id))
+            phase = phase_timing.CREATE_LINK
+        
+        elif vxi11_procedure == DEVICE_WRITE:
+            """
+            The parser parses and executes the received SCPI command.
+            VXI-11 DEVICE_WRITE reply contains only the error code and
+            the number of bytes written.
+            In pipelined mode the command is only queued for execution.
+            """
+            if tracer is not None:
+                start = tracer.now()
+            link.reply = parser.parse_scpi_command(scpi_command)
+            if tracer is not None:
+                tracer.span(tracing.PARSE_SCPI, start, {"command": scpi_command})
+            resp_data = xdr_codec.write_reply(self.get_xid(rx_buf), len(scpi_command))
+            phase = phase_timing.DEVICE_WRITE
+        
+        elif vxi11_procedure == DEVICE_READ:
+            """
+            DEVICE_READ request is sent to a device when an answer after
+            command execution is expected. SDG1000X-E sends this request
+            in two cases:
+                a.  It requests the ID of the AWG (*IDN? command).
+                    In this case we MUST supply a valid ID to make
+                    the scope think that it is working with a genuine
+                    Siglent AWG.
+                b.  After setting all the parameters of the AWG and
+                    before starting frequency sweep (C1:BSWV? command).
+                    It looks like the scope is supposed to verify that
+                    all the required AWG settings were set correctly.
+                The reply to C1:BSWV?, C1:OUTP? and *IDN? is generated
+                by the parser from its model of the AWG state, so the AWG
+                isn't queried. The scope seems to ignore the BSWV? reply,
+                but stricter scopes and real SDG firmware check it.
+                Any other read is answered with AWG ID.
+            """
+            reply = link.reply
+            link.reply = None
+            if reply is None:
+                resp_data = self.idn_reply.render_for(rx_buf)
+            else:
+                resp_data = self.generate_resp_data(rx_buf, self.generate_lxi_read_response(reply))
+            phase = phase_timing.DEVICE_READ
+        
+        elif vxi11_procedure == DESTROY_LINK:
+            """
+            If DESTROY_LINK is received, the oscilloscope ends the session
+            opened by CREATE_LINK request and won't send any commands before
+            issuing a new CREATE_LINK request.
+            All we have to do is to confirm and close the link. The connection
+            is closed when its last link is destroyed.
+            """
+            resp_data = self.destroy_link_reply.render_for(rx_buf)
+            links.discard(link.link_id)
+            self.close_links((link.link_id,))
+            if self.timer is not None:
+                self.timer.mark(scope, phase_timing.DESTROY_LINK)
+                self.timer.end(scope)
+            return (resp_data, bool(links))
+        
+        else:
+            """
+            If the received command is none of the above, something
+            went wrong and we should close the link and continue
+            listening to RPCBIND requests.
+            """
+            return (None, False)
+        
+        if self.timer is not None:
+            self.timer.mark(scope, phase)
+        return (resp_data, True)
 
     def parse_lxi_request(self, rx_data):
         """Parses VXI-11 request. Returns VXI-11 command code and SCPI command if it exists.
-        @param rx_data: bytes array containing the source packet.
+        @param rx_data: bytes array or memoryview containing the source packet.
         @return: a tuple with 3 values:
                 1. status - is 0 if the request could be processed, error code otherwise.
                 2. VXI-11 procedure id if it is known, None otherwise.
                 3. string containing SCPI command if it exists in the request."""
+        # The fields are sliced from a memoryview to avoid copying the packet.
+        rx_data = memoryview(rx_data)
+        
         # Validate source program id.
         ## If the request doesn't come from VXI-11 Core (395183), it is ignored.
-        program_id = self.bytes_to_uint(rx_data[0x10:0x14])
+        program_id = xdr_codec.unpack_uint(rx_data, 0x10)
         if program_id != VXI11_CORE_ID:
             return (NOT_VXI11_ERROR, None, None)
         
         # Procedure: CREATE_LINK (10), DESTROY_LINK (23), DEVICE_WRITE (11), DEVICE_READ (12)
-        vxi11_procedure = self.bytes_to_uint(rx_data[0x18:0x1c])
+        vxi11_procedure = xdr_codec.unpack_uint(rx_data, 0x18)
         scpi_command = None
         status = OK
         
         # Process the remaining data according to the received VXI-11 request
         if vxi11_procedure == CREATE_LINK:
-            cmd_length = self.bytes_to_uint(rx_data[0x38:0x3C])
-            scpi_command = rx_data[0x3C:0x3C+cmd_length]
+            cmd_length = xdr_codec.unpack_uint(rx_data, 0x38)
+            scpi_command = rx_data[0x3C:0x3C+cmd_length].tobytes()
         elif vxi11_procedure == DEVICE_WRITE:
-            cmd_length = self.bytes_to_uint(rx_data[0x3C:0x40])
-            scpi_command = rx_data[0x40:0x40+cmd_length]            
+            cmd_length = xdr_codec.unpack_uint(rx_data, 0x3C)
+            scpi_command = rx_data[0x40:0x40+cmd_length].tobytes()
         elif vxi11_procedure == DEVICE_READ:
             pass
         elif vxi11_procedure == DESTROY_LINK:
@@ -253,26 +680,25 @@ class AwgServer(object):
         
         return (status, vxi11_procedure, str(scpi_command).strip())
     
+    def get_link_id(self, rx_packet):
+        """
+        Extracts the link ID from DEVICE_WRITE, DEVICE_READ or DESTROY_LINK request.
+        It is the first argument of the procedure.
+        """
+        return xdr_codec.unpack_uint(rx_packet, 0x2C)
+    
     def get_xid(self, rx_packet):
         """
         Extracts XID from the incoming RPC packet.
         """
-        xid = rx_packet[0x04:0x08]
-        return xid
+        return xdr_codec.get_xid(rx_packet)
 
     def generate_resp_data(self, rx_buf, resp):
         """
         Generates the response data to be sent to the oscilloscope.
         """
-        # Generate RPC header
         xid = self.get_xid(rx_buf)
-        rpc_hdr = self.generate_rpc_header(xid)
-        # Generate packet size header
-        data_size = len(rpc_hdr) + len(resp)
-        size_hdr = self.generate_packet_size_header(data_size)
-        # Merge all the headers
-        resp_data = size_hdr + rpc_hdr + resp
-        return resp_data
+        return xdr_codec.rpc_reply(xid, str(resp))
     
     def generate_packet_size_header(self, size):
         """
@@ -289,20 +715,14 @@ class AwgServer(object):
         Generates RPC header for replying to oscilloscope's requests.
         @param xid: XID from the request packet as bytes sequence.
         """ 
-        hdr = ""
         # XID: 0xXXXXXXXX (4 bytes)
-        hdr += xid
         # Message Type: Reply (1)
-        hdr += "\x00\x00\x00\x01"
         # Reply State: accepted (0)
-        hdr += "\x00\x00\x00\x00"
         # Verifier
         ## Flavor: AUTH_NULL (0)
-        hdr += "\x00\x00\x00\x00"
         ## Length: 0
-        hdr += "\x00\x00\x00\x00"
         # Accept State: RPC executed successfully (0)
-        hdr += "\x00\x00\x00\x00"
+        hdr = xdr_codec.RPC_REPLY_HEADER.pack(xid, *xdr_codec.RPC_REPLY_FIELDS)
         return hdr
 
     # =========================================================================
@@ -314,13 +734,13 @@ class AwgServer(object):
         resp = self.uint_to_bytes(self.vxi11_port)
         return resp
     
-    def generate_lxi_create_link_response(self):
+    def generate_lxi_create_link_response(self, link_id=0):
         """Generates reply to VXI-11 CREATE_LINK request.""" 
         # VXI-11 response
         ## Error Code: No Error (0)
         resp = "\x00\x00\x00\x00"
-        ## Link ID: 0
-        resp += "\x00\x00\x00\x00"
+        ## Link ID
+        resp += self.uint_to_bytes(link_id)
         ## Abort Port: 0
         resp += "\x00\x00\x00\x00"
         ## Maximum Receive Size: 8388608=0x00800000
@@ -328,6 +748,25 @@ class AwgServer(object):
         resp += "\x00\x80\x00\x00"
         return resp
 
+    def generate_lxi_destroy_link_response(self):
+        """Generates reply to VXI-11 DESTROY_LINK request."""
+        ## Error Code: No Error (0)
+        resp = "\x00\x00\x00\x00"
+        return resp
+
+    def generate_lxi_error_response(self, vxi11_procedure, error):
+        """Generates reply to a VXI-11 request which failed."""
+        ## Error Code
+        resp = self.uint_to_bytes(error)
+        if vxi11_procedure == DEVICE_WRITE:
+            ## Size: 0
+            resp += "\x00\x00\x00\x00"
+        elif vxi11_procedure == DEVICE_READ:
+            ## Reason: 0, Data: empty
+            resp += "\x00\x00\x00\x00"
+            resp += "\x00\x00\x00\x00"
+        return resp
+
     def generate_lxi_idn_response(self, id_string):
         ## Error Code: No Error (0)
         resp = "\x00\x00\x00\x00"
@@ -341,6 +780,16 @@ class AwgServer(object):
         resp += "\x0A\x00\x00"
         return resp
 
+    def generate_lxi_read_response(self, answer):
+        """Generates reply to VXI-11 DEVICE_READ request carrying an answer to a query."""
+        ## Error Code: No Error (0)
+        resp = "\x00\x00\x00\x00"
+        # Reason: 0x00000004 (END)
+        resp += "\x00\x00\x00\x04"
+        # The answer ends with \n and is padded to a multiple of 4 bytes.
+        resp += xdr_codec.pack_opaque(answer + "\x0A")
+        return resp
+
     # =========================================================================
     #   Helper functions
     # =========================================================================
@@ -349,22 +798,13 @@ class AwgServer(object):
         """
         Converts a sequence of 4 bytes to 32-bit integer. Byte 0 is MSB.
         """
-        num = ord(bytes_seq[0])
-        num = num * 0x100 + ord(bytes_seq[1])
-        num = num * 0x100 + ord(bytes_seq[2])
-        num = num * 0x100 + ord(bytes_seq[3])
-        return num
+        return xdr_codec.unpack_uint(bytes_seq)
     
     def uint_to_bytes(self, num):
         """
         Converts a 32-bit integer to a sequence of 4 bytes. Byte 0 is MSB.
         """
-        byte3 = (num / 0x1000000) & 0xFF
-        byte2 = (num / 0x10000) & 0xFF
-        byte1 = (num / 0x100) & 0xFF
-        byte0 = num & 0xFF
-        bytes_seq = bytearray((byte3, byte2, byte1, byte0))
-        return bytes_seq
+        return xdr_codec.pack_uint(num)
     
     def print_as_hex(self, buf):
         """
@@ -378,12 +818,16 @@ class AwgServer(object):
     
     def close_rpcbind_sockets(self):
         """
-        Closes RPCBIND socket.
+        Closes RPCBIND sockets.
         """
         try:
             self.rpcbind_socket.close()
         except:
             pass
+        try:
+            self.rpcbind_udp_socket.close()
+        except:
+            pass
     
     def close_lxi_sockets(self):
         """
@@ -0,0 +1,426 @@
+'''
+Created on Oct 18, 2026
+
+Virtual AWGs speaking the serial protocols of JDS6600, FY6600 and BK4075
+on a pseudo-terminal. The drivers open the pseudo-terminal like a USB serial
+port, so they can be tested and benchmarked without the hardware.
+
+Usage:
+    python awg_simulator.py <awg_name> [options]
+
+Then run bode.py with the same AWG name and the printed port.
+
+Options:
+    --latency=<sec>     time the AWG spends executing each command.
+                        The default depends on the AWG.
+    --drop=<rate>       share of the commands which the AWG loses, from 0 to 1.
+    --drop-busy         the AWG loses the commands which arrive while it executes
+                        the previous command instead of buffering them.
+    --seed=<n>          seed of the random command losses.
+'''
+
+import os
+import sys
+import tty
+import time
+import random
+import select
+import threading
+from awgdrivers import constants
+from cli_options import parse_options
+
+# Options
+LATENCY_OPTION = "--latency"
+DROP_OPTION = "--drop"
+DROP_BUSY_OPTION = "--drop-busy"
+SEED_OPTION = "--seed"
+
+# Maximum time the simulator waits for input. Defines how fast
+# the simulator notices that it was stopped.
+POLL_INTERVAL = 0.1
+READ_SIZE = 4096
+
+# Bits transferred per byte: start bit, 8 data bits and stop bit
+BITS_PER_BYTE = 10
+
+# Command states in the log
+EXECUTED = "executed"
+DROPPED = "dropped"
+BUSY = "busy"
+INVALID = "invalid"
+
+class SimulatorError(Exception):
+    pass
+
+class VirtualAWG(object):
+    '''
+    Base class of the virtual AWGs. Opens a pseudo-terminal and executes
+    the lines received from it in a background thread.
+
+    Each command occupies the AWG for the transfer time of its bytes at
+    the baud rate plus the latency. The reply (acknowledgement or answer
+    to a query) is sent when the command is executed. The commands which
+    arrive meanwhile are buffered, or lost if drop_when_busy is set.
+
+    The state is kept per channel with the keys of awgdrivers.constants,
+    in the units the AWG receives, i.e. before the load impedance
+    compensation of the oscilloscope.
+    '''
+    SHORT_NAME = "virtual"
+    BAUD_RATE = 115200
+    EOL = "\r\n"
+    LATENCY = 0.0
+    CHANNELS = (1, 2)
+
+    def __init__(self, latency=None, drop_rate=0.0, drop_when_busy=False, seed=None):
+        """
+        @param latency: execution time of each command in seconds. If None,
+                the typical latency of the AWG is used.
+        @param drop_rate: probability that a command is lost.
+        @param drop_when_busy: if True, the commands arriving while the AWG
+                executes the previous command are lost.
+        @param seed: seed of the random command losses.
+        """
+        self.latency = self.LATENCY if latency is None else latency
+        self.drop_rate = drop_rate
+        self.drop_when_busy = drop_when_busy
+        self.random = random.Random(seed)
+        self.master_fd = None
+        self.slave_fd = None
+        self.port = None
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.channels = dict((channel, {
+            constants.WAVE_TYPE: constants.SINE,
+            constants.FREQUENCY: 0.0,
+            constants.AMPLITUDE: 0.0,
+            constants.OFFSET: 0.0,
+            constants.PHASE: 0.0,
+            constants.OUTPUT: False
+            }) for channel in self.CHANNELS)
+        self.sweep = {}
+        # Log of the received commands: (arrival time, command, state)
+        self.log = []
+        self.buf = ""
+        # Time when the AWG completes the commands received so far
+        self.busy_until = 0.0
+        # Replies waiting for the execution of their commands: (time, data)
+        self.replies = []
+        self.bytes_received = 0
+
+    def start(self):
+        """
+        Opens the pseudo-terminal and starts executing the commands.
+        The port attribute is the name of the device the driver opens.
+        """
+        self.master_fd, self.slave_fd = os.openpty()
+        # No echo and no line ending translation, like a USB serial port.
+        # The slave stays open, so the master isn't closed when the driver
+        # closes the port.
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="%s-%s" % (self.SHORT_NAME, self.port))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def run(self):
+        while self.running:
+            timeout = POLL_INTERVAL
+            if self.replies:
+                timeout = min(timeout, max(0.0, self.replies[0][0] - time.time()))
+            readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            if readable:
+                data = os.read(self.master_fd, READ_SIZE)
+                self.receive(data, time.time())
+            self.send_replies(time.time())
+
+    def receive(self, data, arrival):
+        """
+        Executes the complete lines of the received data.
+        """
+        self.bytes_received += len(data)
+        self.buf += data
+        lines = self.buf.split("\n")
+        self.buf = lines.pop()
+        for line in lines:
+            self.receive_command(line.rstrip("\r"), arrival)
+
+    def receive_command(self, cmd, arrival):
+        with self.lock:
+            if self.drop_when_busy and arrival < self.busy_until:
+                self.log.append((arrival, cmd, BUSY))
+                return
+            if self.drop_rate and self.random.random() < self.drop_rate:
+                self.log.append((arrival, cmd, DROPPED))
+                return
+            try:
+                reply = self.execute(cmd)
+            except (SimulatorError, ValueError, IndexError, KeyError):
+                self.log.append((arrival, cmd, INVALID))
+                return
+            self.log.append((arrival, cmd, EXECUTED))
+            transfer_time = float(len(cmd) + len(self.EOL)) * BITS_PER_BYTE / self.BAUD_RATE
+            self.busy_until = max(arrival, self.busy_until) + transfer_time + self.latency
+            if reply is not None:
+                self.replies.append((self.busy_until, reply))
+
+    def send_replies(self, now):
+        while self.replies and self.replies[0][0] <= now:
+            _, data = self.replies.pop(0)
+            os.write(self.master_fd, data)
+
+    def execute(self, cmd):
+        """
+        Applies a command to the state.
+        @return: the data sent back to the driver or None.
+        @raise SimulatorError: if the command is unknown.
+        """
+        raise NotImplementedError()
+
+    def set(self, channel, setting, value):
+        self.channels[channel][setting] = value
+
+    def get_state(self, channel=1):
+        """
+        Returns a copy of the settings of a channel.
+        """
+        with self.lock:
+            return dict(self.channels[channel])
+
+    def get_commands(self, state=EXECUTED):
+        """
+        Returns the received commands which are in the given state.
+        """
+        with self.lock:
+            return [cmd for _, cmd, cmd_state in self.log if cmd_state == state]
+
+    def get_stats(self):
+        """
+        Returns a string describing the received commands.
+        """
+        with self.lock:
+            counts = dict((state, 0) for state in (EXECUTED, DROPPED, BUSY, INVALID))
+            for _, _, state in self.log:
+                counts[state] += 1
+        return "%d bytes, %d commands executed, %d dropped, %d lost while busy, %d invalid" % (
+            self.bytes_received, counts[EXECUTED], counts[DROPPED], counts[BUSY], counts[INVALID])
+
+
+class VirtualJDS6600(VirtualAWG):
+    '''
+    JDS6600 protocol: :w<register>=<values>. writes a register and is
+    acknowledged by :ok, :r<register>=0. reads it.
+    '''
+    SHORT_NAME = "jds6600"
+    LATENCY = 0.005
+    EOL = "\r\n"
+    ACK = ":ok\r\n"
+    ID = "6600123456"
+    # Frequency units: Hz, kHz, MHz, mHz, uHz
+    FREQUENCY_UNITS = (1.0, 1e3, 1e6, 1e-3, 1e-6)
+    # Registers of channels 1 and 2
+    WAVE_TYPE_REGISTERS = {21: 1, 22: 2}
+    FREQUENCY_REGISTERS = {23: 1, 24: 2}
+    AMPLITUDE_REGISTERS = {25: 1, 26: 2}
+    OFFSET_REGISTERS = {27: 1, 28: 2}
+    OUTPUT_REGISTER = 20
+    PHASE_REGISTER = 31
+    SWEEP_REGISTERS = {32: "enable", 40: "start", 41: "stop", 42: "time", 43: "direction", 44: "log"}
+
+    def execute(self, cmd):
+        if len(cmd) < 6 or cmd[0] != ":" or cmd[1] not in "wr" or cmd[4] != "=" or cmd[-1] != ".":
+            raise SimulatorError("Unknown command %s." % cmd)
+        register = int(cmd[2:4])
+        values = cmd[5:-1].split(",")
+        if cmd[1] == "r":
+            return self.read(register)
+        if register == self.OUTPUT_REGISTER:
+            self.set(1, constants.OUTPUT, values[0] == "1")
+            self.set(2, constants.OUTPUT, values[1] == "1")
+        elif register in self.WAVE_TYPE_REGISTERS:
+            self.set(self.WAVE_TYPE_REGISTERS[register], constants.WAVE_TYPE, int(values[0]))
+        elif register in self.FREQUENCY_REGISTERS:
+            freq = int(values[0]) / 100.0 * self.FREQUENCY_UNITS[int(values[1])]
+            self.set(self.FREQUENCY_REGISTERS[register], constants.FREQUENCY, freq)
+        elif register in self.AMPLITUDE_REGISTERS:
+            self.set(self.AMPLITUDE_REGISTERS[register], constants.AMPLITUDE, int(values[0]) / 1000.0)
+        elif register in self.OFFSET_REGISTERS:
+            offset = (int(values[0]) - 1000) / 100.0
+            self.set(self.OFFSET_REGISTERS[register], constants.OFFSET, offset)
+        elif register == self.PHASE_REGISTER:
+            # The phase of channel 2 relative to channel 1
+            self.set(2, constants.PHASE, int(values[0]) / 10.0)
+        elif register in self.SWEEP_REGISTERS:
+            self.sweep[self.SWEEP_REGISTERS[register]] = cmd[5:-1]
+        else:
+            raise SimulatorError("Unknown register %d." % register)
+        return self.ACK
+
+    def read(self, register):
+        if register == 1:
+            value = self.ID
+        elif register == self.OUTPUT_REGISTER:
+            value = "%d,%d" % (self.channels[1][constants.OUTPUT], self.channels[2][constants.OUTPUT])
+        elif register in (23, 24):
+            channel = self.FREQUENCY_REGISTERS[register]
+            value = "%d,0" % int(round(self.channels[channel][constants.FREQUENCY] * 100))
+        elif register in (25, 26):
+            channel = self.AMPLITUDE_REGISTERS[register]
+            value = "%d" % int(round(self.channels[channel][constants.AMPLITUDE] * 1000))
+        else:
+            raise SimulatorError("Register %d can't be read." % register)
+        return ":r%02d=%s.%s" % (register, value, self.EOL)
+
+
+class VirtualFY6600(VirtualAWG):
+    '''
+    FY6600 protocol: W<channel><setting><value> writes a setting and is
+    acknowledged by LF, R<channel><setting> reads it. The channel is M
+    for the main channel and F for the second one.
+    '''
+    SHORT_NAME = "fy6600"
+    LATENCY = 0.05
+    EOL = "\n"
+    ACK = "\n"
+    ID = "FY6600-60M"
+    CHANNEL_NAMES = {"M": 1, "F": 2}
+    SWEEP_COMMANDS = {"SOB": "object", "SST": "start", "SEN": "stop", "STI": "time",
+                      "SMO": "log", "SBE": "enable"}
+
+    def execute(self, cmd):
+        if cmd == "UID":
+            return self.ID + "\r\n"
+        if cmd[:3] in self.SWEEP_COMMANDS:
+            self.sweep[self.SWEEP_COMMANDS[cmd[:3]]] = cmd[3:]
+            return self.ACK
+        if len(cmd) < 3 or cmd[1] not in self.CHANNEL_NAMES:
+            raise SimulatorError("Unknown command %s." % cmd)
+        channel = self.CHANNEL_NAMES[cmd[1]]
+        code, value = cmd[2], cmd[3:]
+        if cmd[0] == "R":
+            return self.read(channel, code)
+        if cmd[0] != "W":
+            raise SimulatorError("Unknown command %s." % cmd)
+        if code == "F":
+            # Frequency in uHz
+            self.set(channel, constants.FREQUENCY, int(value) / 1e6)
+        elif code == "A":
+            self.set(channel, constants.AMPLITUDE, float(value))
+        elif code == "O":
+            self.set(channel, constants.OFFSET, float(value))
+        elif code == "P":
+            self.set(channel, constants.PHASE, float(value))
+        elif code == "W":
+            self.set(channel, constants.WAVE_TYPE, int(value))
+        elif code == "N":
+            self.set(channel, constants.OUTPUT, value == "1")
+        else:
+            raise SimulatorError("Unknown command %s." % cmd)
+        return self.ACK
+
+    def read(self, channel, code):
+        state = self.channels[channel]
+        if code == "F":
+            value = "%.6f" % state[constants.FREQUENCY]
+        elif code == "A":
+            # Amplitude in 0.1 mV
+            value = "%d" % int(round(state[constants.AMPLITUDE] * 10000))
+        elif code == "N":
+            value = "1" if state[constants.OUTPUT] else "0"
+        else:
+            raise SimulatorError("Setting %s can't be read." % code)
+        return value + self.EOL
+
+
+class VirtualBK4075(VirtualAWG):
+    '''
+    BK4075 protocol: SCPI commands, several commands in a line are
+    separated by semicolons. Commands aren't acknowledged.
+    '''
+    SHORT_NAME = "bk4075"
+    BAUD_RATE = 19200
+    LATENCY = 0.002
+    CHANNELS = (1,)
+    EOL = "\r\n"
+    ID = "BK PRECISION,4075,123456,1.0"
+    WAVE_TYPES = {"SIN": constants.SINE, "SQU": constants.SQUARE,
+                  "PUL": constants.PULSE, "TRI": constants.TRIANGLE}
+
+    def execute(self, line):
+        replies = [self.execute_scpi(cmd.strip()) for cmd in line.split(";")]
+        replies = [reply for reply in replies if reply is not None]
+        if not replies:
+            return None
+        return ";".join(replies) + self.EOL
+
+    def execute_scpi(self, cmd):
+        header, _, arg = cmd.partition(" ")
+        header = header.upper().lstrip(":")
+        # The [:SOURce] prefix is optional
+        if header.startswith("SOUR:"):
+            header = header[5:]
+        state = self.channels[1]
+        if header == "*IDN?":
+            return self.ID
+        if header == "FREQ?":
+            return "%.10E" % state[constants.FREQUENCY]
+        if header == "VOLT:AMPL?":
+            return "%.3f" % state[constants.AMPLITUDE]
+        if header in ("OUTP?", "OUTP:STAT?"):
+            return "ON" if state[constants.OUTPUT] else "OFF"
+        if header == "FREQ":
+            self.set(1, constants.FREQUENCY, float(arg))
+        elif header == "VOLT:AMPL":
+            self.set(1, constants.AMPLITUDE, float(arg))
+        elif header == "VOLT:OFFS":
+            self.set(1, constants.OFFSET, float(arg))
+        elif header in ("FUNC", "FUNC:SHAP"):
+            self.set(1, constants.WAVE_TYPE, self.WAVE_TYPES[arg.upper()[:3]])
+        elif header in ("OUTP", "OUTP:STAT"):
+            self.set(1, constants.OUTPUT, arg.upper() in ("ON", "1"))
+        elif header == "SYST:SCR":
+            pass
+        else:
+            raise SimulatorError("Unknown command %s." % cmd)
+        return None
+
+
+# Virtual AWGs by the names of the drivers
+simulators = dict((sim.SHORT_NAME, sim) for sim in (VirtualJDS6600, VirtualFY6600, VirtualBK4075))
+
+if __name__ == '__main__':
+    params = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = parse_options(sys.argv[1:])
+    if len(params) != 1 or params[0] not in simulators:
+        print __doc__
+        print "Supported AWGs: %s" % ", ".join(sorted(simulators))
+        sys.exit(1)
+
+    latency = options.get(LATENCY_OPTION)
+    seed = options.get(SEED_OPTION)
+    sim = simulators[params[0]](latency=float(latency) if latency else None,
+                                drop_rate=float(options.get(DROP_OPTION) or 0),
+                                drop_when_busy=DROP_BUSY_OPTION in options,
+                                seed=int(seed) if seed else None)
+    sim.start()
+    print "Virtual %s on %s" % (sim.SHORT_NAME, sim.port)
+    print "Run: python bode.py %s %s" % (sim.SHORT_NAME, sim.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print('Ctrl+C pressed. Exiting...')
+    finally:
+        sim.stop()
+        print "Commands: %s." % (sim.get_stats())
+        for channel in sim.CHANNELS:
+            print "Channel %d: %s" % (channel, sim.get_state(channel))
+    print "Bye."
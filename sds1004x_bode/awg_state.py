@@ -0,0 +1,122 @@
+'''
+Created on Oct 18, 2026
+
+Model of the AWG state set by the oscilloscope. Queries are answered
+from the model in the format of Siglent SDG generators, so no serial
+port round trip is required.
+'''
+
+import math
+from awgdrivers import constants
+
+# ID returned for *IDN? query
+IDN_STRING = "Siglent Technologies,SDG0000X,SDG00000000000,1.01.01.33R1"
+
+# State of a channel before the oscilloscope sets it.
+## Siglent generators start with 1 kHz 4 Vpp sine wave and the output off.
+DEFAULT_STATE = {
+    constants.WAVE_TYPE: constants.SINE,
+    constants.FREQUENCY: 1000.0,
+    constants.AMPLITUDE: 4.0,
+    constants.OFFSET: 0.0,
+    constants.PHASE: 0.0,
+    constants.LOAD: constants.HI_Z,
+    constants.OUTPUT: False
+    }
+
+# Names of the wave types in the BSWV command
+WAVE_NAMES = {
+    constants.SINE: "SINE",
+    constants.SQUARE: "SQUARE",
+    constants.PULSE: "PULSE",
+    constants.TRIANGLE: "RAMP"
+    }
+
+def format_number(value):
+    """
+    Formats a value without trailing zeros, e.g. 1000HZ, 2.5V.
+    """
+    return "%.10g" % value
+
+class AwgState(object):
+    '''
+    Keeps the settings of each channel as the oscilloscope has set them.
+    '''
+
+    def __init__(self):
+        # Channel -> dictionary mapping settings to their values
+        self.channels = {}
+        # Query header following the channel number -> reply formatter
+        self.queries = {
+            "BSWV?": self.format_bswv,
+            "OUTP?": self.format_outp
+            }
+
+    def get_channel(self, channel):
+        """
+        Returns the settings of a channel. The dictionary of a channel is
+        never replaced, so its methods may be kept by the caller.
+        """
+        state = self.channels.get(channel)
+        if state is None:
+            state = self.channels[channel] = dict(DEFAULT_STATE)
+        return state
+
+    def set(self, channel, setting, value):
+        self.get_channel(channel)[setting] = value
+
+    def update(self, channel, settings):
+        """
+        Stores several settings of a channel at once.
+        """
+        self.get_channel(channel).update(settings)
+
+    def compile_query(self, line):
+        """
+        Returns the function and the arguments generating the reply to
+        a query or None if the query isn't answered from the model.
+        The reply is generated when the query is executed, so it reflects
+        the settings made after the query was compiled.
+        Examples: *IDN?, C1:BSWV?, C2:OUTP?
+        """
+        if line == "*IDN?":
+            return (self.format_idn, ())
+        formatter = self.queries.get(line[3:])
+        if formatter is None or line[0] != "C" or line[2] != ":" or not line[1].isdigit():
+            return None
+        return (formatter, (int(line[1]),))
+
+    def format_idn(self):
+        return IDN_STRING
+
+    def format_bswv(self, channel):
+        """
+        Returns the reply to Cn:BSWV? query, e.g.
+        C1:BSWV WVTP,SINE,FRQ,1000HZ,PERI,0.001S,AMP,4V,AMPVRMS,1.414213562Vrms,
+        OFST,0V,HLEV,2V,LLEV,-2V,PHSE,0
+        """
+        state = self.get_channel(channel)
+        freq = state[constants.FREQUENCY]
+        amp = state[constants.AMPLITUDE]
+        offset = state[constants.OFFSET]
+        wave_type = state[constants.WAVE_TYPE]
+        reply = "C%d:BSWV WVTP,%s,FRQ,%sHZ" % (channel, WAVE_NAMES.get(wave_type, "SINE"), format_number(freq))
+        if freq > 0:
+            reply += ",PERI,%sS" % format_number(1.0 / freq)
+        reply += ",AMP,%sV" % format_number(amp)
+        if wave_type == constants.SINE:
+            reply += ",AMPVRMS,%sVrms" % format_number(amp / (2 * math.sqrt(2)))
+        reply += ",OFST,%sV,HLEV,%sV,LLEV,%sV,PHSE,%s" % (
+            format_number(offset), format_number(offset + amp / 2), format_number(offset - amp / 2),
+            format_number(state[constants.PHASE]))
+        return reply
+
+    def format_outp(self, channel):
+        """
+        Returns the reply to Cn:OUTP? query, e.g. C1:OUTP ON,LOAD,50,PLRT,NOR
+        """
+        state = self.get_channel(channel)
+        load = state[constants.LOAD]
+        load = "HZ" if load == constants.HI_Z else format_number(load)
+        return "C%d:OUTP %s,LOAD,%s,PLRT,NOR" % (
+            channel, "ON" if state[constants.OUTPUT] else "OFF", load)
@@ -0,0 +1,321 @@
+'''
+Created on Oct 18, 2026
+
+Executes AWG commands in a dedicated thread, so the server can reply to
+the oscilloscope without waiting for the serial port.
+'''
+
+import os
+import errno
+import fcntl
+import threading
+import Queue
+from collections import deque
+from awgdrivers.base_awg import BaseAWG, DEFAULT_DWELL, BATCH_METHODS, MAX_BATCH
+
+# Maximum number of AWG operations waiting for execution. When the queue is
+# full, the server waits for the AWG before accepting the next command.
+# The event loop server pauses only the connection which sent the command.
+QUEUE_SIZE = 64
+
+# Operations of which only the latest value matters. A queued operation is
+# replaced by a newer one for the same channel. All other operations (output,
+# load, wave type and phase) are executed in order and never reordered.
+LATEST_WINS_METHODS = ("set_frequency", "set_amplitue", "set_offset")
+
+class CoalescingQueue(Queue.Queue):
+    '''
+    Queue of AWG operations which collapses pending frequency, amplitude and
+    offset updates of the same channel into the newest value.
+    Only the operations outside LATEST_WINS_METHODS (output, load, wave type,
+    phase, apply and sweeps) are merge barriers: an update is never merged into
+    one queued before such an operation. Frequency, amplitude and offset updates
+    don't block each other, e.g. FRQ 1, AMP 1, FRQ 2 becomes FRQ 2, AMP 1.
+    '''
+
+    def _init(self, maxsize):
+        # Entries are lists: [method, args, merged]
+        self.queue = deque()
+        # (method, channel) -> queued entry which newer values may replace
+        self.open_entries = {}
+        # Statistics
+        self.queued = 0
+        self.dropped = 0
+        self.collapsed = 0
+        self.max_depth = 0
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Merges the operation into a queued one or queues it.
+        Merging never blocks, even if the queue is full.
+        """
+        self.mutex.acquire()
+        try:
+            self.queued += 1
+            merged = self._merge(item)
+        finally:
+            self.mutex.release()
+        if not merged:
+            Queue.Queue.put(self, item, block, timeout)
+
+    def _merge(self, item):
+        method, args = item
+        if method not in LATEST_WINS_METHODS:
+            return False
+        entry = self.open_entries.get((method, args[0]))
+        if entry is None:
+            return False
+        # The queued value will never be sent to the AWG
+        entry[1] = args
+        if not entry[2]:
+            entry[2] = True
+            self.collapsed += 1
+        self.dropped += 1
+        return True
+
+    def _put(self, item):
+        method, args = item
+        entry = [method, args, False]
+        self.queue.append(entry)
+        self.max_depth = max(self.max_depth, len(self.queue))
+
+        if method not in LATEST_WINS_METHODS:
+            # Updates queued before this operation must stay before it
+            self.open_entries.clear()
+            return
+        channel = args[0]
+        # Channel 0 or None addresses all the channels. Updates of a single
+        # channel and of all the channels must not be merged across each other.
+        for key in self.open_entries.keys():
+            if key[0] == method and (channel in (0, None) or key[1] in (0, None)):
+                del self.open_entries[key]
+        self.open_entries[(method, channel)] = entry
+
+    def _get(self):
+        entry = self.queue.popleft()
+        key = (entry[0], entry[1][0]) if entry[1] else None
+        if self.open_entries.get(key) is entry:
+            del self.open_entries[key]
+        return (entry[0], entry[1])
+
+    def get_stats(self):
+        """
+        Returns a string describing the backlog statistics.
+        """
+        self.mutex.acquire()
+        try:
+            return "%d commands queued, %d dropped, %d entries collapsed, max depth %d" % (
+                self.queued, self.dropped, self.collapsed, self.max_depth)
+        finally:
+            self.mutex.release()
+
+def set_nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+class AwgWorker(threading.Thread):
+    '''
+    Worker thread which owns an AWG and executes the queued operations in
+    the order of their arrival.
+
+    Consecutive queued operations which only send commands are executed
+    as a batch, so their commands are written together if the AWG allows it.
+
+    When the queue drains, the worker writes a byte to a notification pipe.
+    The event loop server watches the pipe (see AwgNotifier), so it learns
+    that the AWG is idle without waiting for it.
+    '''
+
+    def __init__(self, awg, queue_size=QUEUE_SIZE, coalescing=False):
+        """
+        @param coalescing: if True, pending frequency, amplitude and offset
+                updates are replaced by the newest value of the same channel.
+        """
+        threading.Thread.__init__(self, name="AwgWorker-%s" % awg.SHORT_NAME)
+        self.daemon = True
+        self.awg = awg
+        if coalescing:
+            self.queue = CoalescingQueue(queue_size)
+        else:
+            self.queue = Queue.Queue(queue_size)
+        # Both ends are non-blocking. If nobody reads the notifications,
+        # e.g. in the sequential server, the pipe fills and the rest are dropped.
+        self.notify_fd, self.notify_write_fd = os.pipe()
+        set_nonblocking(self.notify_fd)
+        set_nonblocking(self.notify_write_fd)
+
+    def put(self, method, args):
+        """
+        Queues an operation. Blocks while the queue is full.
+        @param method: name of the AWG method.
+        @param args: tuple of the method arguments.
+        """
+        self.queue.put((method, args))
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                if batch[0][0] is None:
+                    break
+                if batch[0][0] in BATCH_METHODS and self.awg.begin_batch():
+                    self.get_batch(batch)
+                    for method, args in batch:
+                        self.execute(method, args)
+                    self.execute("end_batch", ())
+                else:
+                    self.execute(*batch[0])
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+                if self.queue.unfinished_tasks == 0:
+                    self.notify()
+
+    def get_batch(self, batch):
+        """
+        Adds the operations which are queued right after the first one of
+        the batch and may be batched with it. Never waits for new operations.
+        """
+        while len(batch) < MAX_BATCH:
+            # Only this thread removes operations, so the first queued
+            # operation stays the same until it is taken.
+            with self.queue.mutex:
+                if not self.queue.queue or self.queue.queue[0][0] not in BATCH_METHODS:
+                    return
+            batch.append(self.queue.get_nowait())
+
+    def execute(self, method, args):
+        try:
+            getattr(self.awg, method)(*args)
+        except Exception, e:
+            # A failed command must not stop the following ones.
+            print "AWG command %s%s failed: %s" % (method, args, e)
+
+    def notify(self):
+        """
+        Tells the event loop that the queue drained.
+        """
+        try:
+            os.write(self.notify_write_fd, "\x00")
+        except OSError, e:
+            # A full pipe wakes the loop anyway. EPIPE means that the loop
+            # closed its end on exit.
+            if e.errno not in (errno.EAGAIN, errno.EPIPE):
+                raise
+
+    def wait_idle(self):
+        """
+        Waits until all the queued operations are executed.
+        """
+        self.queue.join()
+
+    def stop(self):
+        """
+        Executes the queued operations and stops the thread.
+        """
+        self.queue.put((None, None))
+        self.join()
+        os.close(self.notify_write_fd)
+
+
+class QueuedAWG(BaseAWG):
+    '''
+    AWG proxy which passes the operations to a worker instead of executing them.
+    The methods return as soon as the operation is queued.
+
+    The notification pipe of the worker is watched by AwgNotifier like
+    the pipe of ProcessAWG, so call_when_idle() doesn't block the event loop.
+    '''
+    SHORT_NAME = "queued"
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.idle_callbacks = []
+
+    @property
+    def alive(self):
+        return self.worker.is_alive()
+
+    def fileno(self):
+        return self.worker.notify_fd
+
+    def is_idle(self):
+        return self.worker.queue.unfinished_tasks == 0
+
+    def is_full(self):
+        return self.worker.queue.full()
+
+    def wait_idle(self):
+        """
+        Waits until the AWG executes all the queued operations.
+        """
+        self.worker.wait_idle()
+
+    def call_when_idle(self, callback):
+        """
+        Calls the callback from poll() when the AWG becomes idle.
+        """
+        self.idle_callbacks.append(callback)
+        self.poll()
+
+    def poll(self):
+        """
+        Reads the notifications without waiting and calls the callbacks
+        waiting for the AWG if it became idle.
+        """
+        try:
+            os.read(self.worker.notify_fd, 4096)
+        except OSError, e:
+            if e.errno != errno.EAGAIN:
+                raise
+        if self.is_idle() and self.idle_callbacks:
+            callbacks = self.idle_callbacks
+            self.idle_callbacks = []
+            for callback in callbacks:
+                callback()
+
+    def handle_notification(self):
+        """
+        Is called by AwgNotifier when the notification pipe is readable.
+        """
+        self.poll()
+
+    def connect(self):
+        self.worker.put("connect", ())
+
+    def disconnect(self):
+        self.worker.put("disconnect", ())
+
+    def initialize(self):
+        self.worker.put("initialize", ())
+
+    def get_id(self):
+        self.worker.wait_idle()
+        return self.worker.awg.get_id()
+
+    def enable_output(self, channel, on):
+        self.worker.put("enable_output", (channel, on))
+
+    def set_frequency(self, channel, freq):
+        self.worker.put("set_frequency", (channel, freq))
+
+    def set_phase(self, phase):
+        self.worker.put("set_phase", (phase,))
+
+    def set_wave_type(self, channel, wave_type):
+        self.worker.put("set_wave_type", (channel, wave_type))
+
+    def set_amplitue(self, channel, amplitude):
+        self.worker.put("set_amplitue", (channel, amplitude))
+
+    def set_offset(self, channel, offset):
+        self.worker.put("set_offset", (channel, offset))
+
+    def set_load_impedance(self, channel, z):
+        self.worker.put("set_load_impedance", (channel, z))
+
+    def apply(self, channel, settings):
+        # Queued as a single operation which is never merged or reordered
+        self.worker.put("apply", (channel, dict(settings)))
+
+    def run_sweep(self, start, stop, points, log=True, dwell=DEFAULT_DWELL, channel=1):
+        self.worker.put("run_sweep", (start, stop, points, log, dwell, channel))
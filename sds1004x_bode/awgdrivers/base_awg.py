@@ -4,6 +4,65 @@ Created on Apr 24, 2018
 @author: 4x1md
 '''
 
+import time
+import constants
+
+# Methods generating the commands which apply each setting.
+## Drivers which control the AWG with text commands implement them.
+## The setting values are encoded with these methods for comparison.
+COMMAND_BUILDERS = {
+    constants.WAVE_TYPE: "wave_type_commands",
+    constants.FREQUENCY: "frequency_commands",
+    constants.AMPLITUDE: "amplitude_commands",
+    constants.OFFSET: "offset_commands",
+    constants.PHASE: "phase_commands",
+    constants.OUTPUT: "output_commands"
+    }
+
+# Setter methods of each setting.
+SETTERS = {
+    constants.WAVE_TYPE: "set_wave_type",
+    constants.FREQUENCY: "set_frequency",
+    constants.AMPLITUDE: "set_amplitue",
+    constants.OFFSET: "set_offset",
+    constants.PHASE: "set_phase",
+    constants.LOAD: "set_load_impedance",
+    constants.OUTPUT: "enable_output"
+    }
+
+# Order in which apply() sets the settings. It is the order used by the
+# oscilloscope: load impedance first, because amplitude and offset depend on
+# it, and the output is turned on after all the other settings.
+SETTINGS_ORDER = (constants.LOAD, constants.WAVE_TYPE, constants.PHASE, constants.FREQUENCY,
+                  constants.AMPLITUDE, constants.OFFSET, constants.OUTPUT)
+
+# Default time each sweep frequency is held, in seconds.
+DEFAULT_DWELL = 0.1
+
+# Methods which only send commands, so the commands of several consecutive
+# calls may be written together (see begin_batch()). Queries and sweeps,
+# which wait between their commands, are never batched.
+BATCH_METHODS = ("enable_output", "set_frequency", "set_phase", "set_wave_type", "set_amplitue",
+                 "set_offset", "set_load_impedance", "apply")
+## Maximum number of queued operations written together
+MAX_BATCH = 16
+
+def sweep_frequencies(start, stop, points, log=True):
+    """
+    Returns the frequencies of a sweep from start to stop inclusive.
+    @param points: number of frequencies.
+    @param log: if True, the frequencies are spaced logarithmically, otherwise linearly.
+    """
+    if points < 2:
+        return [float(start)]
+    if log:
+        if start <= 0 or stop <= 0:
+            raise ValueError("Logarithmic sweep requires positive frequencies.")
+        ratio = (float(stop) / start) ** (1.0 / (points - 1))
+        return [start * ratio ** n for n in xrange(points)]
+    step = (float(stop) - start) / (points - 1)
+    return [start + step * n for n in xrange(points)]
+
 class BaseAWG(object):
     '''
     Base class defining arbitrary waveform generator and its functionality.
@@ -45,4 +104,142 @@ class BaseAWG(object):
     
     def set_load_impedance(self, channel, z):
         raise NotImplementedError()
+    
+    def is_idle(self):
+        """
+        Returns True if the AWG has executed all the operations.
+        Drivers execute each operation before returning, so they are always idle.
+        Proxies which queue the operations override it.
+        """
+        return True
+    
+    def is_full(self):
+        """
+        Returns True if the AWG can't queue another operation without waiting.
+        Drivers and unbounded queues never are full.
+        """
+        return False
+    
+    def wait_idle(self):
+        """
+        Waits until the AWG executes all the operations.
+        """
+        pass
+    
+    def call_when_idle(self, callback):
+        """
+        Calls the callback as soon as the AWG executes all the operations.
+        This implementation waits for it and calls the callback immediately.
+        """
+        self.wait_idle()
+        callback()
+    
+    def begin_batch(self):
+        """
+        Starts collecting the commands of the following BATCH_METHODS calls.
+        end_batch() writes them by a single write and waits for all of them
+        at once. Drivers enable batching in their transport if their protocol
+        accepts several commands in one write.
+        @return: False if the AWG doesn't batch the commands. The calls are
+                executed one by one and end_batch() must not be called.
+        """
+        transport = getattr(self, "transport", None)
+        if transport is None or not transport.batching:
+            return False
+        transport.begin_batch()
+        return True
+    
+    def end_batch(self):
+        """
+        Sends the commands collected since begin_batch() and waits until
+        the AWG executes them.
+        """
+        self.transport.end_batch()
+    
+    def send_command(self, cmd, setting=None):
+        """
+        Sends a command to the AWG through the transport of the driver.
+        @param setting: the setting changed by the command. Defines the delay
+                after the command if the AWG doesn't acknowledge it.
+        """
+        self.transport.send((cmd,), (setting,))
+    
+    def read_setting(self, channel, setting):
+        """
+        Reads the current value of a setting from the AWG.
+        Is used for verification of the delays between commands.
+        """
+        raise NotImplementedError()
+    
+    def set_setting(self, channel, setting, value):
+        """
+        Applies a single setting by calling its setter.
+        """
+        if setting == constants.PHASE:
+            self.set_phase(value)
+        else:
+            getattr(self, SETTERS[setting])(channel, value)
+    
+    def apply(self, channel, settings):
+        """
+        Applies several settings of a channel at once.
+        @param settings: dictionary mapping settings (constants.FREQUENCY etc.) to their values.
+        The settings are applied in SETTINGS_ORDER. This implementation calls
+        the setters one by one. Drivers override it to apply the settings
+        in the cheapest way their protocol allows.
+        """
+        for setting in SETTINGS_ORDER:
+            if setting in settings:
+                self.set_setting(channel, setting, settings[setting])
+    
+    def prepare_frequency(self, channel, freq):
+        """
+        Prepares a frequency setting for send_prepared(). Drivers with serial
+        transport encode the commands in advance, so nothing is formatted
+        when the setting is sent.
+        """
+        transport = getattr(self, "transport", None)
+        if transport is None:
+            return (channel, freq, None)
+        cmds = self.frequency_commands(channel, freq)
+        return (channel, freq, transport.prepare(cmds, (constants.FREQUENCY,)))
+    
+    def send_prepared(self, prepared):
+        """
+        Sends a setting prepared by prepare_frequency().
+        """
+        channel, freq, commands = prepared
+        if commands is None:
+            self.set_frequency(channel, freq)
+        else:
+            self.transport.send_prepared(commands)
+    
+    def run_sweep(self, start, stop, points, log=True, dwell=DEFAULT_DWELL, channel=1):
+        """
+        Sweeps the frequency of a channel from start to stop and returns
+        when the sweep is completed.
+        @param points: number of frequencies in the sweep.
+        @param log: logarithmic sweep if True, linear otherwise.
+        @param dwell: time each frequency is held, in seconds.
+        This implementation sets each frequency by set_frequency().
+        Drivers of AWGs with a built-in sweep override it.
+        """
+        for freq in sweep_frequencies(start, stop, points, log):
+            self.set_frequency(channel, freq)
+            time.sleep(dwell)
+    
+    def encode_setting(self, setting, channel, value):
+        """
+        Returns the setting value the way the AWG receives it. Values with
+        equal encoding have the same effect on the AWG.
+        If the driver has a command builder for the setting, the value is
+        encoded as the tuple of the commands, so rounding and load impedance
+        compensation of the driver are taken into account.
+        """
+        builder = getattr(self, COMMAND_BUILDERS.get(setting, ""), None)
+        if builder is None:
+            return value
+        if setting == constants.PHASE:
+            return tuple(builder(value))
+        return tuple(builder(channel, value))
 
@@ -7,9 +7,10 @@ Driver for BK Precision BK4075 AWG.
 '''
 
 import serial
-import time
-from base_awg import BaseAWG
+from base_awg import BaseAWG, SETTINGS_ORDER
 import constants
+import calibration
+from serial_transport import SerialTransport
 from exceptions import UnknownChannelError
 
 # Port settings
@@ -32,9 +33,19 @@ WAVEFORM_COMMANDS = {
     constants.PULSE: ":SOUR:FUNC PUL",
     constants.TRIANGLE: ":SOUR:FUNC TRI"
     }
+# Separator of commands sent in a single line
+COMMAND_SEPARATOR = ";"
 # Delay between commands. BK4075 doesn't seem to need it.
+# BK4075 doesn't acknowledge commands, so the delay is always used.
 SLEEP_TIME = 0.005
 
+# Queries of the settings which can be read back
+READ_COMMANDS = {
+    constants.FREQUENCY: ":FREQ?",
+    constants.AMPLITUDE: ":VOLT:AMPL?",
+    constants.OUTPUT: ":OUTP:STAT?"
+    }
+
 # Default AWG settings
 DEFAULT_LOAD = 50
 DEFAULT_OUTPUT_ON = False
@@ -54,20 +65,17 @@ class BK4075(BaseAWG):
             raise ValueError("Baud rate must be 2400, 4800, 9600 or 19200 bps.")
         self.port = port
         self.baud_rate = baud_rate
-        self.timeout = timeout
+        self.transport = SerialTransport(port, baud_rate, EOL, timeout, SLEEP_TIME,
+                                         bits=BITS, parity=PARITY, stop_bits=STOP_BITS)
     
     def connect(self):
-        self.ser = serial.Serial(self.port, self.baud_rate, BITS, PARITY, STOP_BITS, timeout=self.timeout)
+        self.transport.open()
     
     def disconnect(self):
-        self.ser.close()
-        
-    def send_command(self, cmd):
-        self.ser.write(cmd)
-        self.ser.write(EOL)
-        time.sleep(SLEEP_TIME)
+        self.transport.close()
         
     def initialize(self):
+        self.transport.delays = calibration.load_profile(self.SHORT_NAME, self.port)
         self.connect()
         self.send_command("SYST:SCR ON")
         self.r_load = DEFAULT_LOAD
@@ -76,10 +84,7 @@ class BK4075(BaseAWG):
         self.enable_output(1, self.output_on)
         
     def get_id(self):
-        self.ser.reset_input_buffer()
-        self.send_command("*IDN?")
-        time.sleep(SLEEP_TIME)
-        ans = self.ser.read_until(terminator=EOL, size=None)
+        ans = self.transport.query("*IDN?", EOL)
         return ans.strip()
         
     def enable_output(self, channel=None, on=False):
@@ -91,15 +96,22 @@ class BK4075(BaseAWG):
             :OUTP:STAT ON
             :OUTP OFF
         """
+        cmds = self.output_commands(channel, on)
+        self.output_on = on
+        for cmd in cmds:
+            self.send_command(cmd, constants.OUTPUT)
+    
+    def output_commands(self, channel, on):
+        """
+        Returns the command which turns the output on or off.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
-        self.output_on = on
-        
-        if self.output_on:
-            self.send_command(":OUTP:STAT ON")
+        if on:
+            return [":OUTP:STAT ON"]
         else:
-            self.send_command(":OUTP:STAT OFF")
+            return [":OUTP:STAT OFF"]
             
     def set_frequency(self, channel, freq):
         """
@@ -113,18 +125,31 @@ class BK4075(BaseAWG):
             :FREQ MAXIMUM
             :FREQ MIN
         """
+        for cmd in self.frequency_commands(channel, freq):
+            self.send_command(cmd, constants.FREQUENCY)
+    
+    def frequency_commands(self, channel, freq):
+        """
+        Returns the command which sets output frequency.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
         freq_str = "%.10f" % freq
         cmd = ":FREQ %s" % (freq_str)
-        self.send_command(cmd)
+        return [cmd]
         
     def set_phase(self, phase):
         """
         BK4075 does not require setting phase.
         """
         pass
+    
+    def phase_commands(self, phase):
+        """
+        BK4075 does not require setting phase.
+        """
+        return []
 
     def set_wave_type(self, channel, wave_type):
         """
@@ -139,13 +164,20 @@ class BK4075(BaseAWG):
             :FUNC SIN
             :FUNC ARB
         """
+        for cmd in self.wave_type_commands(channel, wave_type):
+            self.send_command(cmd, constants.WAVE_TYPE)
+    
+    def wave_type_commands(self, channel, wave_type):
+        """
+        Returns the command which sets the output wave type.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         if not wave_type in constants.WAVE_TYPES:
             raise ValueError("Incorrect wave type.")
         
         cmd = WAVEFORM_COMMANDS[wave_type]
-        self.send_command(cmd)
+        return [cmd]
     
     def set_amplitue(self, channel, amplitude):
         """
@@ -159,6 +191,13 @@ class BK4075(BaseAWG):
             :VOLT:AMPL 2.5V
             :VOLT:AMPL MAX
         """
+        for cmd in self.amplitude_commands(channel, amplitude):
+            self.send_command(cmd, constants.AMPLITUDE)
+    
+    def amplitude_commands(self, channel, amplitude):
+        """
+        Returns the command which sets output amplitude.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
@@ -167,7 +206,7 @@ class BK4075(BaseAWG):
         
         amp_str = "%.3f" % amplitude
         cmd = ":VOLT:AMPL %s" % (amp_str)
-        self.send_command(cmd)
+        return [cmd]
     
     def set_offset(self, channel, offset):
         """
@@ -181,6 +220,13 @@ class BK4075(BaseAWG):
             :VOLT:OFFS 2.5V
             :VOLT:OFFS MAX
         """
+        for cmd in self.offset_commands(channel, offset):
+            self.send_command(cmd, constants.OFFSET)
+    
+    def offset_commands(self, channel, offset):
+        """
+        Returns the command which sets DC offset of the output.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
@@ -188,7 +234,56 @@ class BK4075(BaseAWG):
         offset = offset * self.v_out_coeff
         
         cmd = ":VOLT:OFFS %s" % (offset)
-        self.send_command(cmd)
+        return [cmd]
+        
+    def apply(self, channel, settings):
+        """
+        Applies several settings at once. All the commands are sent
+        in a single SCPI line separated by semicolons, e.g.
+            :SOUR:FUNC SIN;:FREQ 50000.0000000000;:VOLT:AMPL 2.000;:OUTP:STAT ON
+        """
+        cmds = []
+        for setting in SETTINGS_ORDER:
+            if setting not in settings:
+                continue
+            value = settings[setting]
+            if setting == constants.LOAD:
+                # Load impedance isn't sent to the AWG. It changes the
+                # amplitude and offset commands which follow.
+                self.set_load_impedance(channel, value)
+                continue
+            cmds.extend(self.encode_setting(setting, channel, value))
+            if setting == constants.OUTPUT:
+                self.output_on = value
+        
+        if cmds:
+            self.transport.send([COMMAND_SEPARATOR.join(cmds)], settings)
+        
+    def read_setting(self, channel, setting):
+        """
+        Reads frequency, amplitude or output state.
+        Returns the value in the units of the corresponding setter or None
+        if the answer can't be parsed.
+        
+        Examples:
+            :FREQ? is answered by 5.0000000000E+04
+            :OUTP:STAT? is answered by ON or OFF
+        """
+        if channel is not None and channel not in CHANNELS:
+            raise UnknownChannelError(CHANNELS_ERROR)
+        if setting not in READ_COMMANDS:
+            raise ValueError("%s can't be read back." % setting)
+        
+        ans = self.transport.query(READ_COMMANDS[setting], EOL).strip()
+        try:
+            if setting == constants.FREQUENCY:
+                return float(ans)
+            elif setting == constants.AMPLITUDE:
+                return float(ans) / self.v_out_coeff
+            else:
+                return ans in ("ON", "1")
+        except ValueError:
+            return None
         
     def set_load_impedance(self, channel, z):
         """
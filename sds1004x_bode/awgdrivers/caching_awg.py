@@ -0,0 +1,163 @@
+'''
+Created on Oct 18, 2026
+
+AWG wrapper which doesn't send settings the AWG already has.
+'''
+
+from base_awg import BaseAWG
+import constants
+
+# Channels which address all the channels at once.
+ALL_CHANNELS = (0, None)
+
+class CachingAWG(BaseAWG):
+    '''
+    Wraps any AWG driver and remembers the last applied value of each
+    setting per channel. A setting is sent to the AWG only if it would
+    change something. The values are compared after encoding by the wrapped
+    driver, so two frequencies which the driver rounds to the same command
+    are considered equal.
+
+    The cache assumes that the AWG is controlled only through this wrapper.
+    If the AWG state is unknown (e.g. it was changed manually), call invalidate().
+    '''
+    SHORT_NAME = "caching"
+
+    def __init__(self, awg):
+        if not isinstance(awg, BaseAWG):
+            raise TypeError("awg variable must be of AWG class.")
+        self.awg = awg
+        # (setting, channel) -> encoded value last sent to the AWG
+        self.state = {}
+        # Statistics
+        self.sent = 0
+        self.skipped = 0
+
+    def invalidate(self, channel=None):
+        """
+        Forgets the state of a channel. If channel is None, the state of all
+        the channels is forgotten.
+        """
+        if channel is None:
+            self.state.clear()
+            return
+        for key in self.state.keys():
+            if key[1] == channel or key[1] in ALL_CHANNELS:
+                del self.state[key]
+
+    def apply_setting(self, setting, channel, value, method, *args):
+        """
+        Calls the AWG method unless the setting already has the value.
+        """
+        encoded = self.awg.encode_setting(setting, channel, value)
+        key = (setting, channel)
+        if key in self.state and self.state[key] == encoded:
+            self.skipped += 1
+            return
+        method(*args)
+        self.sent += 1
+        self.store(setting, channel, encoded)
+
+    def store(self, setting, channel, encoded):
+        """
+        Remembers the encoded value of a setting sent to the AWG.
+        """
+        # A setting applied to all the channels replaces the values of single
+        # channels and vice versa.
+        for cached_key in self.state.keys():
+            if cached_key[0] == setting and (channel in ALL_CHANNELS or cached_key[1] in ALL_CHANNELS):
+                del self.state[cached_key]
+        self.state[(setting, channel)] = encoded
+
+    def get_stats(self):
+        """
+        Returns a string describing how many settings were sent and skipped.
+        """
+        return "%d settings sent, %d skipped" % (self.sent, self.skipped)
+
+    def connect(self):
+        self.awg.connect()
+
+    def disconnect(self):
+        self.awg.disconnect()
+
+    def initialize(self):
+        # Initialization may reset the AWG to unknown state
+        self.invalidate()
+        self.awg.initialize()
+
+    def begin_batch(self):
+        return self.awg.begin_batch()
+
+    def end_batch(self):
+        self.awg.end_batch()
+
+    def get_id(self):
+        return self.awg.get_id()
+
+    def enable_output(self, channel, on):
+        self.apply_setting(constants.OUTPUT, channel, on,
+                           self.awg.enable_output, channel, on)
+
+    def set_frequency(self, channel, freq):
+        self.apply_setting(constants.FREQUENCY, channel, freq,
+                           self.awg.set_frequency, channel, freq)
+
+    def set_phase(self, phase):
+        self.apply_setting(constants.PHASE, None, phase,
+                           self.awg.set_phase, phase)
+
+    def set_wave_type(self, channel, wave_type):
+        self.apply_setting(constants.WAVE_TYPE, channel, wave_type,
+                           self.awg.set_wave_type, channel, wave_type)
+
+    def set_amplitue(self, channel, amplitude):
+        self.apply_setting(constants.AMPLITUDE, channel, amplitude,
+                           self.awg.set_amplitue, channel, amplitude)
+
+    def set_offset(self, channel, offset):
+        self.apply_setting(constants.OFFSET, channel, offset,
+                           self.awg.set_offset, channel, offset)
+
+    def set_load_impedance(self, channel, z):
+        self.apply_setting(constants.LOAD, channel, z,
+                           self.awg.set_load_impedance, channel, z)
+
+    def apply(self, channel, settings):
+        """
+        Passes only the settings which would change something to the AWG.
+        """
+        settings = dict(settings)
+        # Load impedance changes the encoding of the amplitude and offset,
+        # so it must be known before they are compared.
+        if constants.LOAD in settings:
+            self.set_load_impedance(channel, settings.pop(constants.LOAD))
+
+        changed = {}
+        encodings = {}
+        for setting, value in settings.iteritems():
+            key_channel = None if setting == constants.PHASE else channel
+            encoded = self.awg.encode_setting(setting, key_channel, value)
+            key = (setting, key_channel)
+            if key in self.state and self.state[key] == encoded:
+                self.skipped += 1
+                continue
+            changed[setting] = value
+            encodings[setting] = (key_channel, encoded)
+
+        if not changed:
+            return
+        self.awg.apply(channel, changed)
+        self.sent += len(changed)
+        for setting, (key_channel, encoded) in encodings.iteritems():
+            self.store(setting, key_channel, encoded)
+
+    def run_sweep(self, *args, **kwargs):
+        # The frequency after a sweep depends on the AWG
+        for key in self.state.keys():
+            if key[0] == constants.FREQUENCY:
+                del self.state[key]
+        self.awg.run_sweep(*args, **kwargs)
+
+    def encode_setting(self, setting, channel, value):
+        return self.awg.encode_setting(setting, channel, value)
@@ -0,0 +1,149 @@
+'''
+Created on Oct 18, 2026
+
+Finds the shortest safe delays between AWG commands and stores them
+in timing profiles of each AWG unit.
+'''
+
+import os
+import json
+import time
+import constants
+
+# Command classes which have their own delays.
+COMMAND_CLASSES = (constants.FREQUENCY, constants.AMPLITUDE, constants.OUTPUT)
+
+# Values set on the AWG while verifying a delay. Consecutive values differ,
+# so a dropped command is detected by reading the setting back.
+TEST_VALUES = {
+    constants.FREQUENCY: (1000.0, 1234.5, 2000.0, 3456.78, 5000.0),
+    constants.AMPLITUDE: (1.0, 1.5, 0.5, 2.0, 1.25),
+    constants.OUTPUT: (True, False, True, False, True)
+    }
+
+# Binary search limits and resolution in seconds
+MIN_DELAY = 0.0
+MAX_DELAY = 1.0
+RESOLUTION = 0.001
+# Each candidate delay is verified by this number of commands.
+TRIALS = 5
+# The found delay is multiplied by this factor to leave a margin
+# for variations between commands.
+SAFETY_FACTOR = 1.5
+
+# Relative and absolute tolerance of the values read back from the AWG
+REL_TOLERANCE = 0.001
+ABS_TOLERANCE = 0.01
+
+# File storing the timing profiles of all AWG units
+PROFILES_FILE = os.path.join(os.path.expanduser("~"), ".sds1004x_bode_timing.json")
+
+class CalibrationError(Exception):
+    pass
+
+def command_delay(delays, settings, default):
+    """
+    Returns the delay required after the commands of the given settings.
+    @param delays: dictionary mapping command classes to calibrated delays.
+    @param default: delay of the settings which weren't calibrated.
+    """
+    return max([delays.get(setting, default) for setting in settings] or [default])
+
+def profile_key(awg_name, port):
+    """
+    Timing profiles are stored per driver and port, because different
+    units of the same model may require different delays.
+    """
+    return "%s:%s" % (awg_name, port)
+
+def read_profiles(path=PROFILES_FILE):
+    """
+    Reads all the stored profiles. Returns an empty dictionary if the file
+    doesn't exist or can't be parsed.
+    """
+    try:
+        with open(path) as f:
+            profiles = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(profiles, dict):
+        return {}
+    return profiles
+
+def load_profile(awg_name, port, path=PROFILES_FILE):
+    """
+    Returns the calibrated delays of the AWG unit or an empty dictionary
+    if the unit wasn't calibrated.
+    """
+    profile = read_profiles(path).get(profile_key(awg_name, port), {})
+    return dict((setting, float(delay)) for setting, delay in profile.iteritems()
+                if setting in COMMAND_CLASSES)
+
+def save_profile(awg_name, port, delays, path=PROFILES_FILE):
+    """
+    Stores the calibrated delays of the AWG unit. Profiles of other units are kept.
+    """
+    profiles = read_profiles(path)
+    profiles[profile_key(awg_name, port)] = delays
+    with open(path, "w") as f:
+        json.dump(profiles, f, indent=4, sort_keys=True)
+
+def value_matches(setting, expected, actual):
+    """
+    Compares the value read back from the AWG with the value which was set.
+    """
+    if actual is None:
+        return False
+    if setting == constants.OUTPUT:
+        return bool(actual) == bool(expected)
+    return abs(actual - expected) <= max(abs(expected) * REL_TOLERANCE, ABS_TOLERANCE)
+
+def verify_delay(awg, channel, setting, delay, trials=TRIALS, settle_time=MAX_DELAY):
+    """
+    Sets a number of different values with the given delay after each command.
+    The delay is safe if each value can be read back immediately after it.
+    @param settle_time: time given to the AWG to complete the previous commands.
+    """
+    time.sleep(settle_time)
+    awg.transport.delays[setting] = delay
+    values = TEST_VALUES[setting]
+    for n in xrange(trials):
+        value = values[n % len(values)]
+        awg.set_setting(channel, setting, value)
+        if not value_matches(setting, value, awg.read_setting(channel, setting)):
+            return False
+    return True
+
+def calibrate(awg, channel=1, max_delay=MAX_DELAY, resolution=RESOLUTION, trials=TRIALS):
+    """
+    Binary searches the shortest safe delay of each command class.
+    The AWG must be connected and initialized. Its output is left off.
+    @return: dictionary mapping command classes to delays in seconds.
+    """
+    # Acknowledgements would hide the delays which are being measured
+    transport = awg.transport
+    ack = transport.ack
+    transport.ack = None
+    saved_delays = dict(transport.delays)
+    delays = {}
+    try:
+        # Amplitudes are read back without load correction
+        awg.set_load_impedance(channel, constants.HI_Z)
+        for setting in COMMAND_CLASSES:
+            if not verify_delay(awg, channel, setting, max_delay, trials, max_delay):
+                raise CalibrationError("%s commands fail even with %.3f s delay." % (setting, max_delay))
+            low, high = MIN_DELAY, max_delay
+            while high - low > resolution:
+                mid = (low + high) / 2
+                if verify_delay(awg, channel, setting, mid, trials, max_delay):
+                    high = mid
+                else:
+                    low = mid
+            delays[setting] = round(high * SAFETY_FACTOR, 4)
+            print "%s: %.1f ms" % (setting, delays[setting] * 1000)
+    finally:
+        transport.delays = saved_delays
+        transport.delays.update(delays)
+        transport.ack = ack
+        awg.enable_output(channel, False)
+    return delays
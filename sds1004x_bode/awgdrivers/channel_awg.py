@@ -0,0 +1,95 @@
+'''
+Created on Oct 18, 2026
+
+AWG wrapper which sends all the settings to one channel of the AWG.
+'''
+
+from base_awg import BaseAWG, DEFAULT_DWELL
+
+class ChannelAWG(BaseAWG):
+    '''
+    Wraps any AWG driver and replaces the channel of each setting by
+    a fixed channel. It allows a VXI-11 link, which always controls
+    channel 1, to control another channel of the AWG. Settings without
+    channel (e.g. phase) are passed as they are.
+    '''
+    SHORT_NAME = "channel"
+
+    def __init__(self, awg, channel):
+        if not isinstance(awg, BaseAWG):
+            raise TypeError("awg variable must be of AWG class.")
+        self.awg = awg
+        self.channel = channel
+
+    def is_idle(self):
+        return self.awg.is_idle()
+
+    def is_full(self):
+        return self.awg.is_full()
+
+    def wait_idle(self):
+        self.awg.wait_idle()
+
+    def call_when_idle(self, callback):
+        self.awg.call_when_idle(callback)
+
+    def connect(self):
+        self.awg.connect()
+
+    def disconnect(self):
+        self.awg.disconnect()
+
+    def initialize(self):
+        self.awg.initialize()
+
+    def begin_batch(self):
+        return self.awg.begin_batch()
+
+    def end_batch(self):
+        self.awg.end_batch()
+
+    def get_id(self):
+        return self.awg.get_id()
+
+    def enable_output(self, channel, on):
+        self.awg.enable_output(self.channel, on)
+
+    def set_frequency(self, channel, freq):
+        self.awg.set_frequency(self.channel, freq)
+
+    def set_phase(self, phase):
+        self.awg.set_phase(phase)
+
+    def set_wave_type(self, channel, wave_type):
+        self.awg.set_wave_type(self.channel, wave_type)
+
+    def set_amplitue(self, channel, amplitude):
+        self.awg.set_amplitue(self.channel, amplitude)
+
+    def set_offset(self, channel, offset):
+        self.awg.set_offset(self.channel, offset)
+
+    def set_load_impedance(self, channel, z):
+        self.awg.set_load_impedance(self.channel, z)
+
+    def read_setting(self, channel, setting):
+        return self.awg.read_setting(self.channel, setting)
+
+    def apply(self, channel, settings):
+        self.awg.apply(self.channel, settings)
+
+    def prepare_frequency(self, channel, freq):
+        # The setting keeps the channel requested by the caller,
+        # the wrapped AWG prepares it for its own channel.
+        return (channel, freq, self.awg.prepare_frequency(self.channel, freq))
+
+    def send_prepared(self, prepared):
+        self.awg.send_prepared(prepared[2])
+
+    def run_sweep(self, start, stop, points, log=True, dwell=DEFAULT_DWELL, channel=1):
+        self.awg.run_sweep(start, stop, points, log, dwell, self.channel)
+
+    def encode_setting(self, setting, channel, value):
+        if channel is not None:
+            channel = self.channel
+        return self.awg.encode_setting(setting, channel, value)
@@ -11,3 +11,13 @@ TRIANGLE = 3
 WAVE_TYPES = (SINE, SQUARE, PULSE, TRIANGLE)
 
 HI_Z = float("inf")
+
+# AWG settings
+WAVE_TYPE = "wave_type"
+FREQUENCY = "frequency"
+AMPLITUDE = "amplitude"
+OFFSET = "offset"
+PHASE = "phase"
+LOAD = "load"
+OUTPUT = "output"
+SETTINGS = (WAVE_TYPE, FREQUENCY, AMPLITUDE, OFFSET, PHASE, LOAD, OUTPUT)
@@ -8,8 +8,10 @@ Driver for FeelTech FY6600 AWG.
 
 import serial
 import time
-from base_awg import BaseAWG
+from base_awg import BaseAWG, SETTINGS_ORDER, DEFAULT_DWELL
 import constants
+import calibration
+from serial_transport import SerialTransport
 from exceptions import UnknownChannelError
 
 # Port settings constants
@@ -25,7 +27,29 @@ EOL = '\x0A'
 CHANNELS = (0, 1, 2)
 CHANNELS_ERROR = "Channel can be 1 or 2."
 # FY6600 requires some delay between commands. 0.5 seconds seems to work, .25 seconds is iffy. Your unit might need more.
+# The delay is used only if acknowledgements are disabled.
 SLEEP_TIME = 0.5
+# FY6600 confirms each write command by sending LF back.
+ACK = '\x0A'
+# Maximum time to wait for an acknowledgement. If it doesn't arrive,
+# the command is considered executed. It is never longer than the fixed delay.
+ACK_TIMEOUT = SLEEP_TIME
+
+# Commands which read settings of channels 1 and 2
+READ_COMMANDS = {
+    constants.FREQUENCY: ("RMF", "RFF"),
+    constants.AMPLITUDE: ("RMA", "RFA"),
+    constants.OUTPUT: ("RMN", "RFN")
+    }
+
+# Built-in sweep
+## The sweep runs on the main channel only.
+SWEEP_CHANNEL = 1
+## Sweep time range in seconds
+SWEEP_TIME_MIN = 0.01
+SWEEP_TIME_MAX = 999.99
+SWEEP_START_COMMAND = "SBE1"
+SWEEP_STOP_COMMAND = "SBE0"
 
 # Output impedance of the AWG
 R_IN = 50.0
@@ -36,34 +60,35 @@ class FY6600(BaseAWG):
     '''    
     SHORT_NAME = "fy6600"
 
-    def __init__(self, port, baud_rate=BAUD_RATE, timeout=TIMEOUT):
-        """baud_rate parameter is ignored."""
+    def __init__(self, port, baud_rate=BAUD_RATE, timeout=TIMEOUT, ack=True):
+        """
+        baud_rate parameter is ignored.
+        @param ack: if True, waits for the acknowledgement of each command
+                instead of the fixed delay.
+        """
         self.port = port
-        self.ser = None
-        self.timeout = timeout
+        self.transport = SerialTransport(port, BAUD_RATE, EOL, timeout, SLEEP_TIME,
+                                         ACK if ack else None, ACK_TIMEOUT,
+                                         BITS, PARITY, STOP_BITS, batching=True)
         self.channel_on = [False, False]
         self.r_load = [50, 50]
         self.v_out_coeff = [1, 1]
     
     def connect(self):
-        self.ser = serial.Serial(self.port, BAUD_RATE, BITS, PARITY, STOP_BITS, timeout=self.timeout)
+        self.transport.open()
     
     def disconnect(self):
-        self.ser.close()
-        
-    def send_command(self, cmd):
-        self.ser.write(cmd)
-        self.ser.write(EOL)
-        time.sleep(SLEEP_TIME)
+        self.transport.close()
         
     def initialize(self):
         self.channel_on = [False, False]
+        self.transport.delays = calibration.load_profile(self.SHORT_NAME, self.port)
         self.connect()
         self.enable_output()
     
     def get_id(self):
-        self.send_command("UID")
-        ans = self.ser.read_until(terminator="\r\n", size=None)
+        # UID is answered by the id instead of the acknowledgement
+        ans = self.transport.query("UID", "\r\n")
         return ans
 
     def enable_output(self, channel=None, on=False):
@@ -79,22 +104,35 @@ class FY6600(BaseAWG):
 
         Separate commands are thus needed to set the channels for the FY6600.
         """
+        cmds = self.output_commands(channel, on)
+        self.channel_on = self.output_state(channel, on)
+        for cmd in cmds:
+            self.send_command(cmd, constants.OUTPUT)
+
+    def output_state(self, channel, on):
+        """
+        Returns output state of both channels after turning the selected channel on or off.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
         if channel is not None and channel != 0:
-            self.channel_on[channel-1] = on
+            channel_on = list(self.channel_on)
+            channel_on[channel-1] = on
         else:
-            self.channel_on = [on, on]
-        
-        ch1 = "1" if self.channel_on[0] == True else "0"
-        ch2 = "1" if self.channel_on[1] == True else "0"
+            channel_on = [on, on]
+        return channel_on
+
+    def output_commands(self, channel, on):
+        """
+        Returns the commands which turn the selected channel on or off.
+        """
+        channel_on = self.output_state(channel, on)
+        ch1 = "1" if channel_on[0] == True else "0"
+        ch2 = "1" if channel_on[1] == True else "0"
         
         # The fy6600 uses separate commands to enable each channel.
-        cmd = "WMN%s" % (ch1)
-        self.send_command(cmd)
-        cmd = "WFN%s" % (ch2)
-        self.send_command(cmd)
+        return ["WMN%s" % (ch1), "WFN%s" % (ch2)]
 
     def set_frequency(self, channel, freq):
         """
@@ -107,7 +145,13 @@ class FY6600(BaseAWG):
             WFF00000000000001 equals 1 uHz on channel 2
             and so on.
         """
-        
+        for cmd in self.frequency_commands(channel, freq):
+            self.send_command(cmd, constants.FREQUENCY)
+
+    def frequency_commands(self, channel, freq):
+        """
+        Returns the commands which set frequency on the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
@@ -115,16 +159,15 @@ class FY6600(BaseAWG):
         freq_str = freq_str.replace(".", "")
         freq_str = freq_str + "0000"
        
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = "WMF%s" % freq_str
-            self.send_command(cmd)
+            cmds.append("WMF%s" % freq_str)
         
         # Channel 2
         if channel in (0, 2) :
-            cmd = "WFF%s" % freq_str
-            self.send_command(cmd)
-        
+            cmds.append("WFF%s" % freq_str)
+        return cmds
         
     def set_phase(self, phase):
         """
@@ -135,11 +178,18 @@ class FY6600(BaseAWG):
             WMP100.0 is 100.0 degrees on Channel 1
             WFP4.9 is 4.9 degrees on Channel 2. We are only setting phase on channel 2 here.
         """
+        for cmd in self.phase_commands(phase):
+            self.send_command(cmd, constants.PHASE)
+
+    def phase_commands(self, phase):
+        """
+        Returns the command which sets the phase of channel 2.
+        """
         if phase < 0:
             phase += 360
 
         cmd = "WFP%s" % (phase)
-        self.send_command(cmd)
+        return [cmd]
 
     def set_wave_type(self, channel, wave_type):
         """
@@ -150,20 +200,27 @@ class FY6600(BaseAWG):
             WFW00 for Sine wave channel 2
         Both commands are "hard-coded".
        """
+        for cmd in self.wave_type_commands(channel, wave_type):
+            self.send_command(cmd, constants.WAVE_TYPE)
+
+    def wave_type_commands(self, channel, wave_type):
+        """
+        Returns the commands which set wave type of the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         if not wave_type in constants.WAVE_TYPES:
             raise ValueError("Incorrect wave type.")
         
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = "WMW00"
-            self.send_command(cmd)
+            cmds.append("WMW00")
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = "WFW00"
-            self.send_command(cmd)
+            cmds.append("WFW00")
+        return cmds
         
     def set_amplitue(self, channel, amplitude):
         """
@@ -173,6 +230,13 @@ class FY6600(BaseAWG):
             WMA0.44 for 0.44 volts Channel 1
             WFA9.87 for 9.87 volts Channel 2
         """
+        for cmd in self.amplitude_commands(channel, amplitude):
+            self.send_command(cmd, constants.AMPLITUDE)
+
+    def amplitude_commands(self, channel, amplitude):
+        """
+        Returns the commands which set amplitude of the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
@@ -183,15 +247,15 @@ class FY6600(BaseAWG):
         amplitude = amplitude / self.v_out_coeff[channel-1] 
         amp_str = "%.3f" % amplitude
         
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = "WMA%s" % amp_str
-            self.send_command(cmd)
+            cmds.append("WMA%s" % amp_str)
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = "WFA%s" % amp_str
-            self.send_command(cmd)
+            cmds.append("WFA%s" % amp_str)
+        return cmds
     
     def set_offset(self, channel, offset):
         """
@@ -201,20 +265,115 @@ class FY6600(BaseAWG):
         WMO0.33 sets channel 1 offset to 0.33 volts
         WFO-3.33sets channel 2 offset to -3.33 volts
         """
+        for cmd in self.offset_commands(channel, offset):
+            self.send_command(cmd, constants.OFFSET)
+
+    def offset_commands(self, channel, offset):
+        """
+        Returns the commands which set DC offset of the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         # Adjust the offset to the defined load impedance
         offset = offset / self.v_out_coeff[channel-1] 
         
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = "WMO%s" % offset
-            self.send_command(cmd)
+            cmds.append("WMO%s" % offset)
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = "WFO%s" % offset
-            self.send_command(cmd)
+            cmds.append("WFO%s" % offset)
+        return cmds
+        
+    def apply(self, channel, settings):
+        """
+        Applies several settings of the selected channel at once.
+        The commands are written by a single write. Then the driver waits for
+        all the acknowledgements or a single delay instead of waiting
+        after each command.
+        """
+        cmds = []
+        for setting in SETTINGS_ORDER:
+            if setting not in settings:
+                continue
+            value = settings[setting]
+            if setting == constants.LOAD:
+                # Load impedance isn't sent to the AWG. It changes the
+                # amplitude and offset commands which follow.
+                self.set_load_impedance(channel, value)
+                continue
+            cmds.extend(self.encode_setting(setting, channel, value))
+            if setting == constants.OUTPUT:
+                self.channel_on = self.output_state(channel, value)
+        
+        if cmds:
+            self.transport.send(cmds, settings)
+        
+    def run_sweep(self, start, stop, points, log=True, dwell=DEFAULT_DWELL, channel=1):
+        """
+        Runs the sweep by the built-in sweep function of FY6600. The AWG sweeps
+        continuously from start to stop during points * dwell seconds, so only
+        two writes are needed for the whole sweep. Channel 2 and sweep times
+        out of the range of the built-in sweep are swept by setting
+        the frequencies one by one.
+        """
+        duration = points * dwell
+        if channel != SWEEP_CHANNEL or not SWEEP_TIME_MIN <= duration <= SWEEP_TIME_MAX:
+            return BaseAWG.run_sweep(self, start, stop, points, log, dwell, channel)
+        
+        cmds = self.sweep_commands(start, stop, duration, log)
+        cmds.append(SWEEP_START_COMMAND)
+        self.transport.send(cmds)
+        try:
+            time.sleep(duration)
+        finally:
+            # The AWG keeps sweeping until it is stopped, e.g. after Ctrl+C.
+            self.send_command(SWEEP_STOP_COMMAND)
+    
+    def sweep_commands(self, start, stop, duration, log):
+        """
+        Returns the commands which configure the built-in sweep.
+        
+        Commands:
+            SOB0 selects frequency as the swept parameter
+            SST10.00 and SEN100000.00 set start and end frequencies in Hz
+            STI10.00 sets the sweep time to 10 seconds
+            SMO1 sets logarithmic sweep, SMO0 sets linear sweep
+        """
+        return ["SOB0",
+                "SST%.2f" % start,
+                "SEN%.2f" % stop,
+                "STI%.2f" % duration,
+                "SMO%d" % (1 if log else 0)]
+    
+    def read_setting(self, channel, setting):
+        """
+        Reads frequency, amplitude or output state of channel 1 or 2.
+        Returns the value in the units of the corresponding setter or None
+        if the answer can't be parsed.
+        
+        Commands:
+            RMF, RFF are answered by the frequency in Hz, e.g. 50000.000000
+            RMA, RFA are answered by the amplitude in 0.1mV units, e.g. 40000 for 4V
+            RMN, RFN are answered by 0 if the output is off
+        """
+        if channel not in (1, 2):
+            raise UnknownChannelError(CHANNELS_ERROR)
+        if setting not in READ_COMMANDS:
+            raise ValueError("%s can't be read back." % setting)
+        
+        ans = self.transport.query(READ_COMMANDS[setting][channel-1], EOL).strip()
+        try:
+            if setting == constants.FREQUENCY:
+                return float(ans)
+            elif setting == constants.AMPLITUDE:
+                return int(ans) / 10000.0 * self.v_out_coeff[channel-1]
+            else:
+                return int(ans) != 0
+        except ValueError:
+            return None
         
     def set_load_impedance(self, channel, z):
         """
@@ -8,8 +8,10 @@ Driver for JDS6600 AWG.
 
 import serial
 import time
-from base_awg import BaseAWG
+from base_awg import BaseAWG, SETTINGS_ORDER, DEFAULT_DWELL
 import constants
+import calibration
+from serial_transport import SerialTransport
 from exceptions import UnknownChannelError
 
 # Port settings constants
@@ -25,7 +27,31 @@ EOL = b'\x0D\x0A'
 CHANNELS = (0, 1, 2)
 CHANNELS_ERROR = "Channel can be 1 or 2."
 # JDS6600 requires some delay between commands. 15msec seem to be enough.
+# The delay is used only if acknowledgements are disabled.
 SLEEP_TIME = 0.015
+# JDS6600 confirms each write command with ":ok" followed by CR LF.
+ACK = ":ok" + EOL
+# Maximum time to wait for an acknowledgement. If it doesn't arrive,
+# the command is considered executed.
+ACK_TIMEOUT = 0.1
+
+# Commands which read settings of channels 1 and 2
+READ_COMMANDS = {
+    constants.FREQUENCY: (":r23=0.", ":r24=0."),
+    constants.AMPLITUDE: (":r25=0.", ":r26=0."),
+    constants.OUTPUT: (":r20=0.", ":r20=0.")
+    }
+# Frequency units of JDS6600: Hz, kHz, MHz, mHz, uHz
+FREQUENCY_UNITS = (1.0, 1e3, 1e6, 1e-3, 1e-6)
+
+# Built-in sweep
+## Sweep time range in seconds
+SWEEP_TIME_MIN = 0.1
+SWEEP_TIME_MAX = 999.9
+## :w32 enables extended functions: measurement, sweep of channel 1,
+## sweep of channel 2, pulse and burst.
+SWEEP_START_COMMANDS = {1: ":w32=0,1,0,0,0.", 2: ":w32=0,0,1,0,0."}
+SWEEP_STOP_COMMAND = ":w32=0,0,0,0,0."
 
 # Output impedance of the AWG
 R_IN = 50.0
@@ -36,34 +62,35 @@ class JDS6600(BaseAWG):
     '''    
     SHORT_NAME = "jds6600"
 
-    def __init__(self, port, baud_rate=BAUD_RATE, timeout=TIMEOUT):
-        """baud_rate parameter is ignored."""
+    def __init__(self, port, baud_rate=BAUD_RATE, timeout=TIMEOUT, ack=True):
+        """
+        baud_rate parameter is ignored.
+        @param ack: if True, waits for the acknowledgement of each command
+                instead of the fixed delay.
+        """
         self.port = port
-        self.ser = None
-        self.timeout = timeout
+        self.transport = SerialTransport(port, BAUD_RATE, EOL, timeout, SLEEP_TIME,
+                                         ACK if ack else None, ACK_TIMEOUT,
+                                         BITS, PARITY, STOP_BITS, batching=True)
         self.channel_on = [False, False]
         self.r_load = [50, 50]
         self.v_out_coeff = [1, 1]
     
     def connect(self):
-        self.ser = serial.Serial(self.port, BAUD_RATE, BITS, PARITY, STOP_BITS, timeout=self.timeout)
+        self.transport.open()
     
     def disconnect(self):
-        self.ser.close()
-        
-    def send_command(self, cmd):
-        self.ser.write(cmd)
-        self.ser.write(EOL)
-        time.sleep(SLEEP_TIME)
+        self.transport.close()
         
     def initialize(self):
         self.channel_on = [False, False]
+        self.transport.delays = calibration.load_profile(self.SHORT_NAME, self.port)
         self.connect()
         self.enable_output()
     
     def get_id(self):
-        self.send_command(":r01=0.")
-        ans = self.ser.read_until(terminator=".\r\n", size=None)
+        # Read commands are answered by the value instead of ":ok"
+        ans = self.transport.query(":r01=0.", ".\r\n")
         ans = ans.replace(":ok", "")
         ans = ans.strip()
         return ans.strip()
@@ -79,19 +106,35 @@ class JDS6600(BaseAWG):
             :w20=1,1.
         enable outputs of channels 1, 2 and of both accordingly.
         
+        """
+        cmds = self.output_commands(channel, on)
+        self.channel_on = self.output_state(channel, on)
+        for cmd in cmds:
+            self.send_command(cmd, constants.OUTPUT)
+    
+    def output_state(self, channel, on):
+        """
+        Returns output state of both channels after turning the selected channel on or off.
         """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
         if channel is not None and channel != 0:
-            self.channel_on[channel-1] = on
+            channel_on = list(self.channel_on)
+            channel_on[channel-1] = on
         else:
-            self.channel_on = [on, on]
-        
-        ch1 = "1" if self.channel_on[0] == True else "0"
-        ch2 = "1" if self.channel_on[1] == True else "0"
+            channel_on = [on, on]
+        return channel_on
+    
+    def output_commands(self, channel, on):
+        """
+        Returns the commands which turn the selected channel on or off.
+        """
+        channel_on = self.output_state(channel, on)
+        ch1 = "1" if channel_on[0] == True else "0"
+        ch2 = "1" if channel_on[1] == True else "0"
         cmd = ":w20=%s,%s." % (ch1, ch2)
-        self.send_command(cmd)
+        return [cmd]
     
     def set_frequency(self, channel, freq):
         """
@@ -105,21 +148,28 @@ class JDS6600(BaseAWG):
             :w24=25786,3.
                 sets the output frequency of channel 2 to 25.786mHz.
         """
+        for cmd in self.frequency_commands(channel, freq):
+            self.send_command(cmd, constants.FREQUENCY)
+    
+    def frequency_commands(self, channel, freq):
+        """
+        Returns the commands which set frequency on the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
         freq_str = "%.2f" % freq
         freq_str = freq_str.replace(".", "")
-
+        
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = ":w23=%s,0." % freq_str
-            self.send_command(cmd)
+            cmds.append(":w23=%s,0." % freq_str)
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = ":w24=%s,0." % freq_str
-            self.send_command(cmd)
+            cmds.append(":w24=%s,0." % freq_str)
+        return cmds
         
     def set_phase(self, phase):
         """
@@ -132,11 +182,18 @@ class JDS6600(BaseAWG):
         sets the phase to 10 and 0 degrees accordingly.
         For negative values 360 degrees are considered zero point.
         """
+        for cmd in self.phase_commands(phase):
+            self.send_command(cmd, constants.PHASE)
+    
+    def phase_commands(self, phase):
+        """
+        Returns the command which sets the phase of channel 2.
+        """
         if phase < 0:
             phase += 360
         phase = int(round(phase * 10))
         cmd = ":w31=%s." % (phase)
-        self.send_command(cmd)
+        return [cmd]
 
     def set_wave_type(self, channel, wave_type):
         """
@@ -147,20 +204,27 @@ class JDS6600(BaseAWG):
             :w22=0.
         set wave forms of channels 1 and 2 accordingly to sine wave.
         """
+        for cmd in self.wave_type_commands(channel, wave_type):
+            self.send_command(cmd, constants.WAVE_TYPE)
+    
+    def wave_type_commands(self, channel, wave_type):
+        """
+        Returns the commands which set wave type of the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         if not wave_type in constants.WAVE_TYPES:
             raise ValueError("Incorrect wave type.")
         
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = ":w21=%s." % wave_type
-            self.send_command(cmd)
+            cmds.append(":w21=%s." % wave_type)
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = ":w22=%s." % wave_type
-            self.send_command(cmd)
+            cmds.append(":w22=%s." % wave_type)
+        return cmds
         
     def set_amplitue(self, channel, amplitude):
         """
@@ -171,6 +235,13 @@ class JDS6600(BaseAWG):
             :w26=30.
         set amplitudes of channel 1 and channel 2 accordingly to 0.03V.
         """
+        for cmd in self.amplitude_commands(channel, amplitude):
+            self.send_command(cmd, constants.AMPLITUDE)
+    
+    def amplitude_commands(self, channel, amplitude):
+        """
+        Returns the commands which set amplitude of the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
@@ -183,15 +254,15 @@ class JDS6600(BaseAWG):
         amp_str = "%.3f" % amplitude
         amp_str = amp_str.replace(".", "")
         
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = ":w25=%s." % amp_str
-            self.send_command(cmd)
+            cmds.append(":w25=%s." % amp_str)
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = ":w26=%s." % amp_str
-            self.send_command(cmd)
+            cmds.append(":w26=%s." % amp_str)
+        return cmds
     
     def set_offset(self, channel, offset):
         """
@@ -205,6 +276,13 @@ class JDS6600(BaseAWG):
             :w28=1. 
                 sets the offset of channel 2 to -9.99V.
         """
+        for cmd in self.offset_commands(channel, offset):
+            self.send_command(cmd, constants.OFFSET)
+    
+    def offset_commands(self, channel, offset):
+        """
+        Returns the commands which set DC offset of the selected channel.
+        """
         if channel is not None and channel not in CHANNELS:
             raise UnknownChannelError(CHANNELS_ERROR)
         
@@ -213,15 +291,118 @@ class JDS6600(BaseAWG):
         
         offset_val = 1000 + int(offset * 100)
         
+        cmds = []
         # Channel 1
         if channel in (0, 1) or channel is None:
-            cmd = ":w27=%s." % offset_val
-            self.send_command(cmd)
+            cmds.append(":w27=%s." % offset_val)
         
         # Channel 2
         if channel in (0, 2) or channel is None:
-            cmd = ":w28=%s." % offset_val
-            self.send_command(cmd)
+            cmds.append(":w28=%s." % offset_val)
+        return cmds
+        
+    def apply(self, channel, settings):
+        """
+        Applies several settings of the selected channel at once.
+        The commands are written by a single write. Then the driver waits for
+        all the acknowledgements or a single delay instead of waiting
+        after each command.
+        """
+        cmds = []
+        for setting in SETTINGS_ORDER:
+            if setting not in settings:
+                continue
+            value = settings[setting]
+            if setting == constants.LOAD:
+                # Load impedance isn't sent to the AWG. It changes the
+                # amplitude and offset commands which follow.
+                self.set_load_impedance(channel, value)
+                continue
+            cmds.extend(self.encode_setting(setting, channel, value))
+            if setting == constants.OUTPUT:
+                self.channel_on = self.output_state(channel, value)
+        
+        if cmds:
+            self.transport.send(cmds, settings)
+        
+    def run_sweep(self, start, stop, points, log=True, dwell=DEFAULT_DWELL, channel=1):
+        """
+        Runs the sweep by the built-in sweep function of JDS6600. The AWG sweeps
+        continuously from start to stop during points * dwell seconds, so only
+        two writes are needed for the whole sweep. If the sweep time is out of
+        the range of the built-in sweep, the frequencies are set one by one.
+        """
+        duration = points * dwell
+        if channel not in SWEEP_START_COMMANDS or not SWEEP_TIME_MIN <= duration <= SWEEP_TIME_MAX:
+            return BaseAWG.run_sweep(self, start, stop, points, log, dwell, channel)
+        
+        cmds = self.sweep_commands(start, stop, duration, log)
+        cmds.append(SWEEP_START_COMMANDS[channel])
+        self.transport.send(cmds)
+        try:
+            time.sleep(duration)
+        finally:
+            # The AWG keeps sweeping until it is stopped, e.g. after Ctrl+C.
+            self.send_command(SWEEP_STOP_COMMAND)
+    
+    def sweep_commands(self, start, stop, duration, log):
+        """
+        Returns the commands which configure the built-in sweep.
+        
+        Commands
+            :w40=1000,0.
+            :w41=10000000,0.
+                set start and end frequencies to 10Hz and 100kHz.
+            :w42=100.
+                sets the sweep time to 10 seconds.
+            :w43=0.
+                sets the sweep direction up.
+            :w44=1.
+                sets logarithmic sweep. 0 sets linear sweep.
+        """
+        start_str = ("%.2f" % start).replace(".", "")
+        stop_str = ("%.2f" % stop).replace(".", "")
+        return [":w40=%s,0." % start_str,
+                ":w41=%s,0." % stop_str,
+                ":w42=%d." % int(round(duration * 10)),
+                ":w43=0.",
+                ":w44=%d." % (1 if log else 0)]
+    
+    def read_setting(self, channel, setting):
+        """
+        Reads frequency, amplitude or output state of channel 1 or 2.
+        Returns the value in the units of the corresponding setter or None
+        if the answer can't be parsed.
+        
+        Command examples:
+            :r23=0.
+                is answered by :r23=5000000,0. (50kHz on channel 1)
+            :r25=0.
+                is answered by :r25=4000. (4V on channel 1)
+            :r20=0.
+                is answered by :r20=1,0. (channel 1 on, channel 2 off)
+        """
+        if channel not in (1, 2):
+            raise UnknownChannelError(CHANNELS_ERROR)
+        if setting not in READ_COMMANDS:
+            raise ValueError("%s can't be read back." % setting)
+        
+        cmd = READ_COMMANDS[setting][channel-1]
+        ans = self.transport.query(cmd, ".\r\n")
+        ans = ans.replace(":ok", "").strip()
+        prefix = cmd[:5]
+        if not ans.startswith(prefix) or not ans.endswith("."):
+            return None
+        fields = ans[len(prefix):-1].split(",")
+        try:
+            if setting == constants.FREQUENCY:
+                return int(fields[0]) / 100.0 * FREQUENCY_UNITS[int(fields[1])]
+            elif setting == constants.AMPLITUDE:
+                return int(fields[0]) / 1000.0 * self.v_out_coeff[channel-1]
+            else:
+                return fields[channel-1] == "1"
+        except (ValueError, IndexError):
+            return None
         
     def set_load_impedance(self, channel, z):
         """
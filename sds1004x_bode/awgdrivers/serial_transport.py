@@ -0,0 +1,217 @@
+'''
+Created on Oct 18, 2026
+
+Serial port transport shared by the AWG drivers.
+'''
+
+import serial
+import time
+import calibration
+
+# Default port settings
+BITS = serial.EIGHTBITS
+PARITY = serial.PARITY_NONE
+STOP_BITS = serial.STOPBITS_ONE
+
+# Names of the trace spans of the port I/O
+WRITE_SPAN = "serial_write"
+WAIT_SPAN = "serial_wait"
+
+class SerialTransport(object):
+    '''
+    Sends commands to an AWG over a serial port.
+
+    Each command is encoded together with its end of line characters, and
+    several commands are written to the port by a single write call.
+    After the commands the transport waits for their acknowledgements
+    if the AWG sends them, or for a delay otherwise.
+
+    Between begin_batch() and end_batch() the commands of several operations,
+    e.g. consecutive operations queued to a worker, are collected and written
+    together, followed by a single combined wait.
+    '''
+
+    def __init__(self, port, baud_rate, eol, timeout, delay, ack=None, ack_timeout=None,
+                 bits=BITS, parity=PARITY, stop_bits=STOP_BITS, batching=False):
+        """
+        @param eol: characters terminating each command.
+        @param timeout: timeout of reading answers to queries.
+        @param delay: delay after commands of the settings which weren't calibrated.
+        @param ack: characters which the AWG sends back after each command or None
+                if it doesn't acknowledge commands. Setting the ack attribute to
+                None later disables acknowledgements.
+        @param ack_timeout: maximum time to wait for an acknowledgement.
+        @param batching: if True, the AWG accepts the commands of several
+                operations in one write, so begin_batch() may be used.
+        """
+        self.port = port
+        self.baud_rate = baud_rate
+        self.eol = eol
+        self.timeout = timeout
+        self.delay = delay
+        self.ack = ack
+        self.ack_timeout = ack_timeout
+        self.bits = bits
+        self.parity = parity
+        self.stop_bits = stop_bits
+        self.batching = batching
+        self.ser = None
+        # Prepared commands collected since begin_batch() or None
+        self.batch = None
+        # Calibrated delays of command classes
+        self.delays = {}
+        # Set if an acknowledgement didn't arrive in time
+        self.ack_lost = False
+        # Statistics
+        self.bytes_written = 0
+        self.writes = 0
+        self.blocked_time = 0.0
+        self.ack_timeouts = 0
+        # Tracer recording the writes and waits (see tracing.py) or None
+        self.tracer = None
+
+    def open(self):
+        # Reading an acknowledgement never waits longer than ack_timeout
+        timeout = self.ack_timeout if self.ack is not None else self.timeout
+        self.ser = serial.Serial(self.port, self.baud_rate, self.bits, self.parity,
+                                 self.stop_bits, timeout=timeout)
+
+    def close(self):
+        self.ser.close()
+
+    def encode(self, cmds):
+        """
+        Returns the data written to the port for the given commands.
+        """
+        return self.eol.join(cmds) + self.eol
+
+    def write(self, data):
+        """
+        Writes encoded commands to the port by a single write call.
+        """
+        if self.ack_lost:
+            # A late acknowledgement must not be taken for
+            # the acknowledgement of these commands.
+            self.ser.reset_input_buffer()
+            self.ack_lost = False
+        tracer = self.tracer
+        if tracer is not None:
+            span_start = tracer.now()
+        start = time.time()
+        self.ser.write(data)
+        self.blocked_time += time.time() - start
+        self.bytes_written += len(data)
+        self.writes += 1
+        if tracer is not None:
+            tracer.span(WRITE_SPAN, span_start, {"data": data.encode("string_escape")})
+
+    def send(self, cmds, settings=(None,)):
+        """
+        Sends the commands and waits until the AWG executes them.
+        @param settings: the settings changed by the commands.
+                They define the delay if acknowledgements are not used.
+        """
+        self.send_prepared(self.prepare(cmds, settings))
+
+    def prepare(self, cmds, settings=(None,)):
+        """
+        Encodes the commands in advance. Returns the argument of send_prepared().
+        """
+        return (self.encode(cmds), len(cmds),
+                calibration.command_delay(self.delays, settings, self.delay))
+
+    def send_prepared(self, prepared):
+        """
+        Sends the commands prepared by prepare() and waits until the AWG executes them.
+        """
+        if self.batch is not None:
+            self.batch.append(prepared)
+            return
+        data, count, delay = prepared
+        self.write(data)
+        self.wait(count, delay)
+
+    def begin_batch(self):
+        """
+        Collects the commands sent until end_batch() instead of sending them.
+        """
+        self.flush()
+        self.batch = []
+
+    def end_batch(self):
+        """
+        Writes the collected commands by a single write and waits until
+        the AWG executes all of them. Without acknowledgements, the delays
+        of the commands are added.
+        """
+        self.flush()
+        self.batch = None
+
+    def flush(self):
+        """
+        Sends the commands collected so far.
+        """
+        batch = self.batch
+        if not batch:
+            return
+        self.batch = []
+        self.write("".join(data for data, _, _ in batch))
+        self.wait(sum(count for _, count, _ in batch), sum(delay for _, _, delay in batch))
+
+    def wait(self, count, delay):
+        """
+        Waits until the AWG acknowledges the given number of commands.
+        If acknowledgements are disabled, waits the delay instead.
+        """
+        tracer = self.tracer
+        if tracer is not None:
+            span_start = tracer.now()
+        start = time.time()
+        try:
+            if self.ack is None:
+                time.sleep(delay)
+                return
+            for _ in xrange(count):
+                ans = self.ser.read_until(self.ack)
+                if not ans.endswith(self.ack):
+                    # Timeout. The AWG had enough time to execute the commands.
+                    self.ack_lost = True
+                    self.ack_timeouts += 1
+                    return
+        finally:
+            self.blocked_time += time.time() - start
+            if tracer is not None:
+                tracer.span(WAIT_SPAN, span_start, {
+                    "commands": count, "ack": self.ack is not None, "ack_lost": self.ack_lost})
+
+    def reset_input(self):
+        self.ser.reset_input_buffer()
+
+    def read_answer(self, terminator):
+        """
+        Reads an answer to a query. The answer may take longer
+        than an acknowledgement, so the port timeout is used.
+        """
+        port_timeout = self.ser.timeout
+        self.ser.timeout = self.timeout
+        try:
+            return self.ser.read_until(terminator)
+        finally:
+            self.ser.timeout = port_timeout
+
+    def query(self, cmd, terminator):
+        """
+        Sends a query and returns the answer. Earlier unread input is discarded.
+        Batched commands are sent first.
+        """
+        self.flush()
+        self.reset_input()
+        self.write(self.encode((cmd,)))
+        return self.read_answer(terminator)
+
+    def get_stats(self):
+        """
+        Returns a string describing the port usage.
+        """
+        return "%d bytes in %d writes, %.3f s blocked, %d acknowledgement timeouts" % (
+            self.bytes_written, self.writes, self.blocked_time, self.ack_timeouts)
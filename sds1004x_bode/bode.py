@@ -6,28 +6,76 @@ Created on May 5, 2018
 
 import sys
 from awg_server import AwgServer
+from async_awg_server import AsyncAwgServer
 from awg_factory import awg_factory
+from phase_timing import PhaseTimer
+from wire_capture import WireCapture
+from tracing import Tracer
+from cli_options import parse_options
+from awgdrivers.caching_awg import CachingAWG
+from command_ring import RingAWG
+from awgdrivers import calibration
 
 DEFAULT_AWG = "dummy"
 DEFAULT_PORT = "/dev/ttyUSB0"
 DEFAULT_BAUD_RATE = None
 
+# Server modes
+## --sequential runs the original single connection server loop.
+SEQUENTIAL_OPTION = "--sequential"
+## --timing prints the time spent in each phase of the connection cycle.
+TIMING_OPTION = "--timing"
+## --pipelined replies to the oscilloscope before the AWG executes the command.
+PIPELINED_OPTION = "--pipelined"
+## --coalescing works as --pipelined and skips outdated frequency, amplitude
+## and offset updates when the AWG is slower than the oscilloscope.
+COALESCING_OPTION = "--coalescing"
+## --cache doesn't send settings which wouldn't change the AWG state.
+CACHE_OPTION = "--cache"
+## --no-ack waits a fixed delay after each command instead of the AWG
+## acknowledgement. Use it if the AWG firmware doesn't acknowledge commands.
+NO_ACK_OPTION = "--no-ack"
+## --speculative prepares the AWG commands of the next expected sweep
+## frequency while the server waits for the oscilloscope.
+SPECULATIVE_OPTION = "--speculative"
+## --calibrate measures the shortest safe delays between the commands of
+## the attached AWG, stores them in its timing profile and exits.
+CALIBRATE_OPTION = "--calibrate"
+## --split runs the AWG driver in a separate process which receives the
+## commands through a shared memory ring, so a slow AWG never stalls the server.
+SPLIT_OPTION = "--split"
+## --capture=<file> records the requests and replies of the oscilloscopes
+## into a capture file, which replay_capture.py can send to the server again.
+CAPTURE_OPTION = "--capture"
+## --trace=<file> writes trace spans of each request, from receiving it to
+## the completion of the serial port I/O, as Chrome trace events. A file
+## name ending with .jsonl gets JSON lines. The serial port spans are missing
+## if the driver runs in a separate process (--split).
+TRACE_OPTION = "--trace"
+
+# Time given to the driver process to complete the commands on exit
+STOP_TIMEOUT = 5.0
+
 if __name__ == '__main__':
+    # Separate options from positional parameters
+    options = parse_options(sys.argv[1:])
+    params = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    
     # Extract AWG name from parameters
-    if len(sys.argv) >= 2:
-        awg_name = sys.argv[1]
+    if len(params) >= 1:
+        awg_name = params[0]
     else:
         awg_name = DEFAULT_AWG
         
     # Extract port name from parameters
-    if len(sys.argv) >= 3:
-        awg_port = sys.argv[2]
+    if len(params) >= 2:
+        awg_port = params[1]
     else:
         awg_port = DEFAULT_PORT
         
     # Extract AWG port baud rate from parameters
-    if len(sys.argv) == 4:
-        awg_baud_rate = int(sys.argv[3])
+    if len(params) == 3:
+        awg_baud_rate = int(params[2])
     else:
         awg_baud_rate = DEFAULT_BAUD_RATE  
     
@@ -35,14 +83,57 @@ if __name__ == '__main__':
     print "Initializing AWG..."
     print "AWG: %s" % awg_name
     print "Port: %s" % awg_port
-    awg_class = awg_factory.get_class_by_name(awg_name)
-    awg = awg_class(awg_port, awg_baud_rate)
-    awg.initialize()
+    if SPLIT_OPTION in options and CALIBRATE_OPTION not in options:
+        awg = RingAWG(awg_name, awg_port, awg_baud_rate, ack=NO_ACK_OPTION not in options,
+                      caching=CACHE_OPTION in options)
+        awg.start()
+        # The serial port belongs to the driver process, which prints its statistics.
+        transport = None
+    else:
+        awg_class = awg_factory.get_class_by_name(awg_name)
+        awg = awg_class(awg_port, awg_baud_rate)
+        # Serial port of the AWG driver. The dummy AWG doesn't have it.
+        transport = getattr(awg, "transport", None)
+        if NO_ACK_OPTION in options and transport is not None:
+            transport.ack = None
+        if CALIBRATE_OPTION in options:
+            if transport is None:
+                print "The %s AWG can't be calibrated because it doesn't use a serial port." % awg_name
+                sys.exit(1)
+            awg.initialize()
+            print "Calibrating delays between commands. The AWG output will be switched on and off."
+            delays = calibration.calibrate(awg)
+            calibration.save_profile(awg_name, awg_port, delays)
+            print "Timing profile saved to %s." % calibration.PROFILES_FILE
+            awg.disconnect()
+            sys.exit(0)
+        if CACHE_OPTION in options:
+            awg = CachingAWG(awg)
+        awg.initialize()
     
     # Run AWG server
     server = None
+    timer = None
+    capture = None
+    tracer = None
+    if TIMING_OPTION in options:
+        timer = PhaseTimer()
+    if options.get(CAPTURE_OPTION):
+        capture = WireCapture(options[CAPTURE_OPTION])
+    if options.get(TRACE_OPTION):
+        tracer = Tracer(options[TRACE_OPTION])
+        if transport is not None:
+            transport.tracer = tracer
+    pipelined = PIPELINED_OPTION in options
+    coalescing = COALESCING_OPTION in options
+    speculative = SPECULATIVE_OPTION in options
     try:
-        server = AwgServer(awg)
+        if SEQUENTIAL_OPTION in options:
+            server = AwgServer(awg, timer=timer, pipelined=pipelined, coalescing=coalescing,
+                               speculative=speculative, capture=capture, tracer=tracer)
+        else:
+            server = AsyncAwgServer(awg, timer=timer, pipelined=pipelined, coalescing=coalescing,
+                                    speculative=speculative, capture=capture, tracer=tracer)
         server.start()
     
     except KeyboardInterrupt:
@@ -51,6 +142,22 @@ if __name__ == '__main__':
     finally:
         if server is not None:
             server.close_sockets()
+            server.stop_workers()
+            server.print_worker_stats()
+            server.print_parser_stats()
+        if isinstance(awg, CachingAWG):
+            print "AWG cache: %s." % (awg.get_stats())
+        if transport is not None:
+            print "AWG serial port: %s." % (transport.get_stats())
+        if isinstance(awg, RingAWG):
+            awg.stop(STOP_TIMEOUT)
+            print "Command ring: %s." % (awg.get_stats())
+        if timer is not None:
+            timer.print_summary()
+        if capture is not None:
+            capture.close()
+        if tracer is not None:
+            tracer.close()
     
     print "Bye."
     
\ No newline at end of file
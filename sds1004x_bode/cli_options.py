@@ -0,0 +1,17 @@
+'''
+Created on Oct 18, 2026
+
+Command line option parsing shared by the server entry points and the tools.
+'''
+
+def parse_options(args):
+    """
+    Returns a dictionary of --name=value options. Options without value are mapped to None.
+    """
+    options = {}
+    for arg in args:
+        if not arg.startswith("--"):
+            continue
+        name, sep, value = arg.partition("=")
+        options[name] = value if sep else None
+    return options
@@ -4,19 +4,122 @@ Created on May 4, 2018
 @author: 4x1md
 '''
 
+import math
+import itertools
 from awgdrivers import constants
+from awg_state import AwgState
+
+# Speculative preparation of sweep frequencies
+## The oscilloscope sends frequencies with 9 significant digits.
+FREQUENCY_DIGITS = 9
+## The predicted frequency may differ from the one computed by the oscilloscope
+## in the last digit. Neighbouring values are prepared as well.
+PREDICTION_SPREAD = 2
+## Sweep frequency command of a channel
+FREQUENCY_COMMAND = "C%d:BSWV FRQ,%s"
+
+# Number of command lines whose actions are cached. A sweep repeated with
+# the same settings is parsed only once.
+CACHE_SIZE = 1024
+## When the cache is full, this part of the least recently used lines is
+## removed at once, so the lines aren't sorted by their use for each new line.
+CACHE_EVICTION = 0.25
+
+def parse_load(arg):
+    """
+    Converts the argument of OUTP LOAD to the load impedance.
+    """
+    if arg == "HZ":
+        return constants.HI_Z
+    return int(arg)
+
+# Arguments of each SCPI header. Each keyword is mapped to the setting it
+# changes, the number of values following the keyword and the function
+# converting the values to the value of the setting.
+## The argument of WVTP is not checked because the oscilloscope
+## sets sine waveform only.
+BSWV_ARGUMENTS = {
+    "WVTP": (constants.WAVE_TYPE, 1, lambda arg: constants.SINE),
+    "FRQ": (constants.FREQUENCY, 1, float),
+    "AMP": (constants.AMPLITUDE, 1, float),
+    "OFST": (constants.OFFSET, 1, float),
+    "PHSE": (constants.PHASE, 1, float)
+    }
+
+## The oscilloscope doesn't seem to turn the output off after the plot.
+## OUTP OFF is supported in case it will be used in future.
+OUTP_ARGUMENTS = {
+    "ON": (constants.OUTPUT, 0, lambda: True),
+    "OFF": (constants.OUTPUT, 0, lambda: False),
+    "LOAD": (constants.LOAD, 1, parse_load)
+    }
+
+COMMAND_TABLE = {
+    "BSWV": BSWV_ARGUMENTS,
+    "OUTP": OUTP_ARGUMENTS
+    }
+
+## Single argument BSWV commands, which the oscilloscope sends during
+## the sweep, are compiled by their prefix, e.g. "C1:BSWV FRQ,".
+## Prefix -> channel, setting and conversion of the value
+SINGLE_ARGUMENT_COMMANDS = dict(
+    ("C%d:BSWV %s," % (channel, keyword), (channel, setting, convert))
+    for channel in (1, 2)
+    for keyword, (setting, count, convert) in BSWV_ARGUMENTS.iteritems()
+    if count == 1)
+
+def parse_arguments(args, table, settings):
+    """
+    Stores the settings defined by the comma separated arguments of a command
+    in the settings dictionary. Unknown keywords are skipped.
+    """
+    n = 0
+    while n < len(args):
+        entry = table.get(args[n])
+        if entry is None:
+            n += 1
+            continue
+        setting, count, convert = entry
+        settings[setting] = convert(*args[n + 1:n + 1 + count])
+        n += 1 + count
+
 
 class CommandParser(object):
     """
     Parses the commands sent by the oscilloscope and sends them to the AWG.
+    
+    Each command line is compiled to a list of actions, i.e. methods of
+    the AWG, of the parser and of the AWG state model with their arguments. The actions of recent
+    lines are cached, so a repeated line is executed without parsing.
     """
     
-    def __init__(self, awg):
+    def __init__(self, awg, speculative=False, cache_size=CACHE_SIZE):
         """
         Initializes the command parses.
         Gets an instance of the initialized AWG as argument.
+        @param speculative: if True, prefetch() prepares the AWG commands of
+                the frequencies which the oscilloscope is expected to send next.
+        @param cache_size: number of command lines whose actions are cached.
         """
         self.awg = awg
+        self.speculative = speculative
+        self.cache_size = cache_size
+        # Settings of the AWG channels
+        self.state = AwgState()
+        # Command line -> [last use, actions]
+        self.cache = {}
+        self.clock = itertools.count()
+        # Channel -> the last two frequencies of the sweep
+        self.history = {}
+        # The channel which received the last frequency, if it must be predicted
+        self.pending = None
+        # Command line -> frequency setting prepared by the AWG
+        self.predictions = {}
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def parse_scpi_command(self, line):
         """
@@ -30,99 +133,174 @@ class CommandParser(object):
             Actual implementation of the bode plot doesn't require any reply from the AWG. 
             4. C1:BSWV FRQ,10 - sets AWG frequency during the frequency sweep.
         
-        If the command is a query to the AWG, it is ignored.
+        Queries are answered from the AWG state model. The parser is shared
+        by all the links of the AWG, so the reply is returned to the caller,
+        which keeps it for the DEVICE_READ of the link that sent the query.
+        
+        Frequencies predicted by prefetch() are sent to the AWG without parsing.
+        Single argument BSWV commands, which the oscilloscope sends during
+        the sweep, are looked up by their prefix without splitting the line
+        into commands. They are executed without caching, because each sweep
+        frequency is usually sent only once and would only evict other lines.
+        Other lines are looked up in the cache and compiled by compile_line()
+        if they aren't found.
+        @return: the reply to a query or None.
         """
-        if line.endswith("?"):
+        prepared = self.predictions.get(line)
+        if prepared is not None:
+            self.hits += 1
+            self.awg.send_prepared(prepared)
+            self.state.set(prepared[0], constants.FREQUENCY, prepared[1])
+            self.observe_frequency(prepared[0], prepared[1])
             return
-
-        channel = int(line[1])
         
-        commands = line[3:].split(';')
+        start = line.find(",") + 1
+        entry = SINGLE_ARGUMENT_COMMANDS.get(line[:start])
+        if entry is not None and line.find(",", start) < 0 and line.find(";", start) < 0:
+            channel, setting, convert = entry
+            self.apply_setting(channel, setting, convert(line[start:]))
+            return
+        
+        if line.endswith("?"):
+            return self.answer(self.state.compile_query(line))
+        
+        entry = self.cache.get(line)
+        if entry is None:
+            self.cache_misses += 1
+            actions = self.compile_line(line)
+            if self.cache_size > 0:
+                if len(self.cache) >= self.cache_size:
+                    self.evict()
+                self.cache[line] = [next(self.clock), actions]
+        else:
+            self.cache_hits += 1
+            entry[0] = next(self.clock)
+            actions = entry[1]
         
-        for command in commands:
-            token = command[0:4]
-            args = command[5:].split(',')
-            
-            if token == "BSWV":
-                self.parse_bswv(args, channel)
-            
-            elif token == "OUTP":
-                self.parse_outp(args, channel)
+        for method, args in actions:
+            method(*args)
+    
+    def evict(self):
+        """
+        Removes the least recently used lines from the cache.
+        """
+        cache = self.cache
+        count = max(1, int(len(cache) * CACHE_EVICTION))
+        for line in sorted(cache, key=lambda line: cache[line][0])[:count]:
+            del cache[line]
     
-    def parse_bswv(self, args, channel):
+    def compile_line(self, line):
         """
-        Parses and executes the basic wave (BSWV) command which is used
-        to set the wave form, frequency, amplitude, offset and phase.
+        Returns the actions executing a command line.
         
-        Examples:
-            BSWV WVTP,SINE,PHSE,0,FRQ,50000,AMP,2,OFST,0
-            BSWV FRQ,10.8890427
-        """
-        n = 0
-        while n < len(args):
-            if args[n] == "WVTP":
-                """
-                The argument of the WVTP command is not checked because
-                the oscilloscope will set sine waveform only.
-                """
-                self.awg.set_wave_type(channel, constants.SINE)
-                n += 2
-
-            elif args[n] == "FRQ":
-                freq = float(args[n+1])
-                self.awg.set_frequency(channel, freq)
-                n += 2
-
-            elif args[n] == "AMP":
-                ampl = float(args[n+1])
-                self.awg.set_amplitue(channel, ampl)
-                n += 2
-            
-            elif args[n] == "OFST":
-                offset = float(args[n+1])
-                self.awg.set_offset(channel, offset)
-                n += 2
-            
-            elif args[n] == "PHSE":
-                phase = float(args[n+1])
-                self.awg.set_phase(phase)
-                n += 2
-            
-            else:
-                n += 1
+        The line is parsed by the command table. All the settings of
+        a line are collected first. A single setting is applied by its setter,
+        several settings are applied at once by the apply() method of the AWG.
+        """
+        channel = int(line[1])
+        settings = {}
+        for command in line[3:].split(";"):
+            header, _, args = command.partition(" ")
+            table = COMMAND_TABLE.get(header)
+            if table is not None:
+                parse_arguments(args.split(","), table, settings)
+        
+        if len(settings) == 1:
+            setting, value = settings.popitem()
+            return self.compile_setting(channel, setting, value)
+        if settings:
+            return ((self.awg.apply, (channel, settings)),
+                    (self.state.get_channel(channel).update, (settings,)),
+                    (self.start_sweep, (channel,)))
+        return ()
+    
+    def apply_setting(self, channel, setting, value):
+        """
+        Applies a single setting of a sweep line.
+        """
+        self.awg.set_setting(channel, setting, value)
+        self.state.get_channel(channel)[setting] = value
+        if setting == constants.FREQUENCY and self.speculative:
+            self.count_frequency(channel, value)
+    
+    def compile_setting(self, channel, setting, value):
+        """
+        Returns the actions applying a single setting.
+        """
+        actions = ((self.awg.set_setting, (channel, setting, value)),
+                   (self.state.get_channel(channel).__setitem__, (setting, value)))
+        if setting == constants.FREQUENCY and self.speculative:
+            return actions + ((self.count_frequency, (channel, value)),)
+        return actions
+    
+    def answer(self, query):
+        """
+        Generates the reply to a query.
+        @param query: function and arguments returned by AwgState.compile_query()
+                or None if the query has no reply of its own.
+        @return: the reply or None.
+        """
+        return query[0](*query[1]) if query is not None else None
+    
+    def count_frequency(self, channel, freq):
+        """
+        Handles a sweep frequency which wasn't predicted.
+        """
+        self.misses += 1
+        self.observe_frequency(channel, freq)
     
-    def parse_outp(self, args, channel):
+    def start_sweep(self, channel):
         """
-        Parses and executes the OUTP command which is used to turn the AWG output on and
-        to set the load impedance of the AWG to 50 Ohm, 75 Ohm or Hi-Z.
+        A new sweep begins after the setup line.
+        """
+        self.history.pop(channel, None)
+        self.predictions.clear()
+    
+    def observe_frequency(self, channel, freq):
+        """
+        Remembers a sweep frequency for the prediction of the next one.
+        """
+        if not self.speculative:
+            return
+        history = self.history.get(channel, ())
+        self.history[channel] = (history[-1], freq) if history else (freq,)
+        self.pending = channel
+    
+    def prefetch(self):
+        """
+        Prepares the AWG commands of the frequencies which are likely to be
+        sent next. The oscilloscope sweeps the frequency in a geometric
+        progression, so the next frequency is the last one multiplied by
+        the ratio of the last two.
+        Is called by the server after the reply to the oscilloscope is sent,
+        so the preparation doesn't delay the reply.
+        """
+        channel = self.pending
+        if channel is None:
+            return
+        self.pending = None
+        self.predictions.clear()
+        history = self.history.get(channel, ())
+        if len(history) < 2 or history[0] <= 0 or history[1] <= 0 or history[0] == history[1]:
+            return
         
-        Examples:
-            OUTP LOAD,50
-            OUTP LOAD,75
-            OUTP LOAD,HZ
-            OUTP ON
-            
-        It seems that the oscilloscope doesn't turn the AWG output off after
-        completing the plot. Even thought, the OUTP OFF command was added for
-        the case it will be used in future.
-        """
-        n = 0
-        while n < len(args):
-            if args[n] == "ON":
-                self.awg.enable_output(channel, True)
-                n += 1
-
-            elif args[n] == "LOAD":
-                if args[n+1] == "HZ":
-                    z = constants.HI_Z
-                else:
-                    z = int(args[n+1]) 
-                self.awg.set_load_impedance(channel, z)
-                n += 2
-            
-            elif args[n] == "OFF":
-                self.awg.enable_output(channel, False)
-                n += 1
-            
-            else:
-                n += 1
+        predicted = history[1] * history[1] / history[0]
+        # Enumerate the values which differ from the prediction in the last digit
+        exponent = int(math.floor(math.log10(predicted)))
+        scale = 10.0 ** (exponent - FREQUENCY_DIGITS + 1)
+        mantissa = int(round(predicted / scale))
+        for n in xrange(mantissa - PREDICTION_SPREAD, mantissa + PREDICTION_SPREAD + 1):
+            text = "%.*g" % (FREQUENCY_DIGITS, n * scale)
+            line = FREQUENCY_COMMAND % (channel, text)
+            self.predictions[line] = self.awg.prepare_frequency(channel, float(text))
+    
+    def get_stats(self):
+        """
+        Returns a string describing the prediction and cache hit rates.
+        """
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        lines = self.cache_hits + self.cache_misses
+        cache_rate = 100.0 * self.cache_hits / lines if lines else 0.0
+        return "%d of %d sweep frequencies predicted (%.1f%% hit rate), %d of %d lines cached (%.1f%% hit rate)" % (
+            self.hits, total, rate, self.cache_hits, lines, cache_rate)
@@ -0,0 +1,366 @@
+'''
+Created on Oct 18, 2026
+
+Passes AWG operations from the server process to a driver process through
+a ring of fixed-size records in shared memory. Blocking serial port writes
+and delays of the driver never stall the network loop of the server.
+'''
+
+import os
+import mmap
+import time
+import errno
+import select
+import struct
+import multiprocessing
+from awgdrivers import constants
+from awgdrivers.base_awg import BATCH_METHODS, MAX_BATCH
+from awgdrivers.caching_awg import CachingAWG
+from awg_process import ProcessAWG, create_awg
+
+# Number of records in the ring. When the ring is full, the server waits
+# for the driver before queuing the next operation.
+CAPACITY = 256
+# While the server waits for a free record, it checks the ring at least
+# this often in seconds, in case a notification was missed.
+FULL_POLL_INTERVAL = 0.1
+
+# Ring header, written only by the driver process:
+## number of executed operations,
+## sum and maximum of the queue latency (from queuing until the execution starts),
+## sum and maximum of the end-to-end latency (from queuing until the execution ends).
+HEADER = struct.Struct("=Qdddd")
+# The number of queued operations and the flag telling that the server waits
+# for a free record are written only by the server process. They are kept
+# in their own cache line.
+QUEUED_OFFSET = 64
+QUEUED = struct.Struct("=Q")
+WAITING_OFFSET = 72
+WAITING = struct.Struct("=Q")
+# The reply to get_id, written only by the driver process: a flag telling
+# that the ID was read, the length of the ID and the ID itself.
+ID_OFFSET = 128
+ID_HEADER = struct.Struct("=BH")
+ID_SIZE = 256
+RECORDS_OFFSET = ID_OFFSET + ID_SIZE
+
+# Record: time of queuing, operation, channel, settings mask and 7 values
+RECORD = struct.Struct("=dBBH7d")
+VALUES = 7
+
+# Operations and the layout of their arguments
+## c - channel, f - float, i - integer, b - boolean, s - settings dictionary
+OPERATIONS = (
+    (None, ""),
+    ("connect", ""),
+    ("disconnect", ""),
+    ("initialize", ""),
+    ("enable_output", "cb"),
+    ("set_frequency", "cf"),
+    ("set_phase", "f"),
+    ("set_wave_type", "ci"),
+    ("set_amplitue", "cf"),
+    ("set_offset", "cf"),
+    ("set_load_impedance", "cf"),
+    ("apply", "cs"),
+    ("run_sweep", "ffibfc"),
+    ("get_id", "")
+    )
+OPERATION_CODES = dict((method, code) for code, (method, _) in enumerate(OPERATIONS))
+
+def encode_record(method, args, queued_time):
+    """
+    Encodes an operation to a record.
+    @param args: arguments of the AWG method.
+    """
+    code = OPERATION_CODES[method]
+    layout = OPERATIONS[code][1]
+    channel = 0
+    mask = 0
+    values = [0.0] * VALUES
+    n = 0
+    for kind, arg in zip(layout, args):
+        if kind == "c":
+            channel = arg
+        elif kind == "s":
+            # The values of the settings are stored in the order of SETTINGS
+            for bit, setting in enumerate(constants.SETTINGS):
+                if setting in arg:
+                    mask |= 1 << bit
+                    values[bit] = float(arg[setting])
+        else:
+            values[n] = float(arg)
+            n += 1
+    return RECORD.pack(queued_time, code, channel, mask, *values)
+
+def decode_record(data, offset=0):
+    """
+    Decodes a record.
+    @return: tuple of time of queuing, method name and its arguments.
+            The method name is None for the record which stops the driver process.
+    """
+    fields = RECORD.unpack_from(data, offset)
+    queued_time, code, channel, mask = fields[:4]
+    values = fields[4:]
+    method, layout = OPERATIONS[code]
+    args = []
+    n = 0
+    for kind in layout:
+        if kind == "c":
+            args.append(channel)
+        elif kind == "s":
+            args.append(dict((setting, decode_setting(setting, values[bit]))
+                             for bit, setting in enumerate(constants.SETTINGS) if mask & (1 << bit)))
+        else:
+            value = values[n]
+            n += 1
+            if kind == "i":
+                value = int(value)
+            elif kind == "b":
+                value = bool(value)
+            args.append(value)
+    return (queued_time, method, tuple(args))
+
+def write_id(ring, awg_id):
+    """
+    Stores the reply to get_id. None is stored if the ID couldn't be read.
+    IDs longer than the space reserved for them are truncated.
+    """
+    if awg_id is None:
+        ID_HEADER.pack_into(ring, ID_OFFSET, 0, 0)
+        return
+    data = str(awg_id)[:ID_SIZE - ID_HEADER.size]
+    start = ID_OFFSET + ID_HEADER.size
+    ring[start:start + len(data)] = data
+    ID_HEADER.pack_into(ring, ID_OFFSET, 1, len(data))
+
+def read_id(ring):
+    """
+    Returns the reply to get_id stored by write_id().
+    """
+    valid, length = ID_HEADER.unpack_from(ring, ID_OFFSET)
+    if not valid:
+        return None
+    start = ID_OFFSET + ID_HEADER.size
+    return ring[start:start + length]
+
+def decode_setting(setting, value):
+    if setting == constants.WAVE_TYPE:
+        return int(value)
+    if setting == constants.OUTPUT:
+        return bool(value)
+    return value
+
+def record_offset(index, capacity):
+    return RECORDS_OFFSET + (index % capacity) * RECORD.size
+
+def execute(awg, method, args):
+    """
+    Calls an AWG method.
+    @return: the result of the method or None if it failed.
+    """
+    try:
+        return getattr(awg, method)(*args)
+    except Exception, e:
+        # A failed command must not stop the following ones.
+        print "AWG command %s%s failed: %s" % (method, args, e)
+
+def run_ring_process(ring, items, notify_fd, capacity, driver, port, baud_rate, ack, caching):
+    """
+    Main function of the driver process. Executes the records of the ring
+    in the order of their arrival. When the ring becomes empty, a byte is
+    written to the notification pipe, so the server learns that the AWG is idle.
+    While the server waits for a free record, a byte is written after each record.
+    Consecutive records which only send commands are executed as a batch,
+    so their commands are written together if the AWG allows it.
+    """
+    awg = create_awg(driver, port, baud_rate, ack, caching)
+    done = 0
+    queue_sum = queue_max = total_sum = total_max = 0.0
+    try:
+        while True:
+            items.acquire()
+            batch = [decode_record(ring, record_offset(done, capacity))]
+            method = batch[0][1]
+            if method is None:
+                break
+            start = time.time()
+            if method in BATCH_METHODS and awg.begin_batch():
+                # Records which were queued already. The semaphore was
+                # released for each of them, so acquiring it never waits.
+                queued = QUEUED.unpack_from(ring, QUEUED_OFFSET)[0]
+                while len(batch) < MAX_BATCH and done + len(batch) < queued:
+                    record = decode_record(ring, record_offset(done + len(batch), capacity))
+                    if record[1] not in BATCH_METHODS:
+                        break
+                    items.acquire()
+                    batch.append(record)
+                for _, method, args in batch:
+                    execute(awg, method, args)
+                execute(awg, "end_batch", ())
+            else:
+                result = execute(awg, method, batch[0][2])
+                if method == "get_id":
+                    # Stored before the record is reported as done
+                    write_id(ring, result)
+            end = time.time()
+            for queued_time, _, _ in batch:
+                queue_sum += start - queued_time
+                queue_max = max(queue_max, start - queued_time)
+                total_sum += end - queued_time
+                total_max = max(total_max, end - queued_time)
+            done += len(batch)
+            HEADER.pack_into(ring, 0, done, queue_sum, queue_max, total_sum, total_max)
+            if done == QUEUED.unpack_from(ring, QUEUED_OFFSET)[0] or \
+                    WAITING.unpack_from(ring, WAITING_OFFSET)[0]:
+                os.write(notify_fd, "\x00")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport = getattr(awg, "transport", None)
+        if isinstance(awg, CachingAWG):
+            transport = getattr(awg.awg, "transport", None)
+            print "AWG cache of %s: %s." % (port, awg.get_stats())
+        if transport is not None:
+            print "AWG serial port %s: %s." % (port, transport.get_stats())
+        awg.disconnect()
+
+
+class RingAWG(ProcessAWG):
+    '''
+    AWG proxy which passes the operations to a driver process through
+    a shared memory ring. The methods return as soon as the record is written.
+
+    The driver process writes a byte to a notification pipe when it has
+    executed all the records. The pipe is watched by AwgNotifier like
+    the pipe of ProcessAWG.
+    '''
+    SHORT_NAME = "ring"
+
+    def __init__(self, driver, port, baud_rate=None, ack=True, caching=False, capacity=CAPACITY):
+        ProcessAWG.__init__(self, driver, port, baud_rate, ack, caching)
+        self.capacity = capacity
+        self.ring = None
+        self.items = None
+        self.notify_fd = None
+
+    def start(self):
+        """
+        Creates the ring and starts the driver process.
+        """
+        # Anonymous memory maps are shared with the child processes
+        self.ring = mmap.mmap(-1, RECORDS_OFFSET + self.capacity * RECORD.size)
+        self.items = multiprocessing.Semaphore(0)
+        self.notify_fd, child_fd = os.pipe()
+        self.process = multiprocessing.Process(
+            target=run_ring_process, name="AWG-%s" % self.port,
+            args=(self.ring, self.items, child_fd, self.capacity, self.driver, self.port,
+                  self.baud_rate, self.ack, self.caching))
+        self.process.daemon = True
+        self.process.start()
+        # Only the driver process keeps the write end, so the pipe is closed
+        # when the process exits.
+        os.close(child_fd)
+
+    def stop(self, timeout=None):
+        if self.alive:
+            self.put(None)
+        self.process.join(timeout)
+
+    def fileno(self):
+        return self.notify_fd
+
+    def put(self, method, *args):
+        if not self.alive:
+            return
+        if self.is_full():
+            # Wait for a free record. The flag makes the driver notify
+            # after each record it executes.
+            WAITING.pack_into(self.ring, WAITING_OFFSET, 1)
+            while self.alive and self.is_full():
+                self.wait_notification(FULL_POLL_INTERVAL)
+            WAITING.pack_into(self.ring, WAITING_OFFSET, 0)
+            if not self.alive:
+                return
+        offset = record_offset(self.sent, self.capacity)
+        self.ring[offset:offset + RECORD.size] = encode_record(method, args, time.time())
+        self.sent += 1
+        QUEUED.pack_into(self.ring, QUEUED_OFFSET, self.sent)
+        self.items.release()
+
+    def get_done(self):
+        return HEADER.unpack_from(self.ring, 0)[0]
+
+    def is_full(self):
+        return self.alive and self.sent - self.get_done() >= self.capacity
+
+    def receive(self):
+        """
+        Reads the notifications without waiting.
+        """
+        self.wait_notification(0)
+
+    def wait_notification(self, timeout):
+        """
+        Reads the notification pipe. Waits for the notification at most
+        timeout seconds or forever if timeout is None.
+        """
+        readable, _, _ = select.select([self.notify_fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self.notify_fd, 4096)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                return
+            raise
+        if not data:
+            # The driver process died. Its operations will never be executed.
+            print "AWG process of %s exited." % (self.port)
+            self.alive = False
+
+    def poll(self):
+        """
+        Reads the notifications and calls the callbacks waiting for the AWG
+        if it became idle.
+        """
+        self.receive()
+        if self.alive:
+            self.done = self.get_done()
+        else:
+            self.done = self.sent
+        if self.done == self.sent and self.idle_callbacks:
+            callbacks = self.idle_callbacks
+            self.idle_callbacks = []
+            for callback in callbacks:
+                callback()
+
+    def wait_idle(self):
+        self.poll()
+        while self.done < self.sent:
+            self.wait_notification(None)
+            self.poll()
+
+    def get_id(self):
+        """
+        Waits until the driver process reads the ID and returns it.
+        Returns None if the ID couldn't be read.
+        """
+        if not self.alive:
+            return None
+        self.put("get_id")
+        self.wait_idle()
+        if not self.alive:
+            return None
+        return read_id(self.ring)
+
+    def get_stats(self):
+        """
+        Returns a string describing the latency of the queued operations.
+        """
+        done, queue_sum, queue_max, total_sum, total_max = HEADER.unpack_from(self.ring, 0)
+        if done == 0:
+            return "no operations executed"
+        return ("%d operations, queue latency mean %.3f ms, max %.3f ms, "
+                "end-to-end latency mean %.3f ms, max %.3f ms") % (
+            done, queue_sum / done * 1000, queue_max * 1000, total_sum / done * 1000, total_max * 1000)
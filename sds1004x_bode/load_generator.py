@@ -0,0 +1,258 @@
+'''
+Created on Oct 18, 2026
+
+Load generator emulating several oscilloscopes which sweep at the same
+time. Measures how the AWG server degrades under load: refused connections,
+RPC timeouts and tail latency of the commands.
+
+Usage:
+    python load_generator.py [host] [options]
+
+Run bode.py or supervisor.py first. The default host is 127.0.0.1.
+
+Options:
+    --scopes=<n>        number of oscilloscopes. Default is 4.
+    --rate=<n>          commands per second sent by each oscilloscope.
+                        0 sends the next command as soon as the previous one
+                        is completed. Default is 20.
+    --jitter=<share>    random variation of the intervals between the commands,
+                        e.g. 0.2 for +-20%. Default is 0.1.
+    --duration=<sec>    duration of the test. Default is 10 s.
+    --timeout=<sec>     time an oscilloscope waits for each reply. Default is 2 s.
+    --port=<n>          RPCBIND port of the server. Default is 111.
+    --processes=<n>     number of client processes the oscilloscopes are
+                        distributed over. Default is the number of CPUs.
+    --session=<file>    commands sent by each oscilloscope in a loop.
+                        The default is a logarithmic sweep from 10 Hz to 1 MHz.
+    --ramp              doubles the number of oscilloscopes from 1 up to --scopes
+                        and reports the saturation point.
+    --json              prints the results of each test as a JSON line.
+'''
+
+import sys
+import json
+import errno
+import random
+import socket
+import threading
+import time
+import multiprocessing
+from awg_server import RPCBIND_PORT
+from awgdrivers.base_awg import sweep_frequencies
+from cli_options import parse_options
+from vxi11_client import Vxi11Client, RpcError, ConnectTimeoutError, read_session, latency_summary
+
+DEFAULT_HOST = "127.0.0.1"
+SCOPES = 4
+RATE = 20.0
+JITTER = 0.1
+DURATION = 10.0
+TIMEOUT = 2.0
+
+# Default session: a sweep the way the oscilloscope sends it
+SWEEP_START = 10
+SWEEP_STOP = 1e6
+SWEEP_POINTS = 100
+SWEEP_COMMAND = "C1:BSWV FRQ,%.9g"
+
+# Options
+SCOPES_OPTION = "--scopes"
+RATE_OPTION = "--rate"
+JITTER_OPTION = "--jitter"
+DURATION_OPTION = "--duration"
+TIMEOUT_OPTION = "--timeout"
+PORT_OPTION = "--port"
+PROCESSES_OPTION = "--processes"
+SESSION_OPTION = "--session"
+RAMP_OPTION = "--ramp"
+JSON_OPTION = "--json"
+
+# Command outcomes
+COMPLETED = "completed"
+REFUSED = "refused"
+TIMEOUTS = "timeouts"
+ERRORS = "errors"
+OUTCOMES = (COMPLETED, REFUSED, TIMEOUTS, ERRORS)
+## Socket errors meaning that the server didn't accept the connection.
+## Connection timeouts are counted as refused connections as well.
+REFUSED_ERRORS = (errno.ECONNREFUSED, errno.ECONNRESET)
+
+# The server is saturated if it completes less than this share of the offered
+# commands or, without rate limit, if doubling the load adds less than this gain.
+SATURATION_SHARE = 0.95
+SATURATION_GAIN = 0.05
+
+def sweep_session():
+    return [SWEEP_COMMAND % freq for freq in sweep_frequencies(SWEEP_START, SWEEP_STOP, SWEEP_POINTS)]
+
+def run_scope(host, port, commands, rate, jitter, duration, timeout, seed, counts, latencies):
+    """
+    Sends the commands in a loop like an oscilloscope: each command waits
+    for the previous one. The outcome and latency of each command are added
+    to counts and latencies.
+    """
+    client = Vxi11Client(host, port, timeout=timeout)
+    rnd = random.Random(seed)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    # Oscilloscopes don't start at the same moment
+    next_time = time.time() + rnd.uniform(0, interval)
+    end_time = time.time() + duration
+    n = 0
+    while True:
+        now = time.time()
+        if next_time > now:
+            time.sleep(next_time - now)
+        if time.time() >= end_time:
+            break
+        cmd = commands[n % len(commands)]
+        n += 1
+        start = time.time()
+        outcome = COMPLETED
+        try:
+            client.send_command(cmd)
+        except ConnectTimeoutError:
+            outcome = REFUSED
+        except socket.timeout:
+            outcome = TIMEOUTS
+        except socket.error, e:
+            outcome = REFUSED if e.args[0] in REFUSED_ERRORS else ERRORS
+        except RpcError:
+            outcome = ERRORS
+        end = time.time()
+        counts[outcome] += 1
+        if outcome == COMPLETED:
+            latencies.append(end - start)
+        # A late oscilloscope doesn't try to catch up
+        next_time = max(next_time + interval * rnd.uniform(1 - jitter, 1 + jitter), end)
+
+def run_scopes(queue, host, port, commands, rate, jitter, duration, timeout, seeds):
+    """
+    Main function of a client process. Runs an oscilloscope thread per seed
+    and puts the outcome counts and the latencies into the queue.
+    """
+    counts = dict.fromkeys(OUTCOMES, 0)
+    latencies = []
+    threads = []
+    for seed in seeds:
+        # The latencies list is shared by the threads. Appends are atomic.
+        scope_counts = dict.fromkeys(OUTCOMES, 0)
+        thread = threading.Thread(target=run_scope, args=(
+            host, port, commands, rate, jitter, duration, timeout, seed, scope_counts, latencies))
+        thread.daemon = True
+        thread.start()
+        threads.append((thread, scope_counts))
+    for thread, scope_counts in threads:
+        thread.join()
+        for outcome in OUTCOMES:
+            counts[outcome] += scope_counts[outcome]
+    queue.put((counts, latencies))
+
+def run_load(host, port, commands, scopes, rate, jitter, duration, timeout, processes):
+    """
+    Runs the oscilloscopes over the client processes.
+    @return: dictionary of the results.
+    """
+    processes = max(1, min(processes, scopes))
+    queue = multiprocessing.Queue()
+    workers = []
+    for n in xrange(processes):
+        seeds = range(n, scopes, processes)
+        worker = multiprocessing.Process(target=run_scopes, args=(
+            queue, host, port, commands, rate, jitter, duration, timeout, seeds))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+    counts = dict.fromkeys(OUTCOMES, 0)
+    latencies = []
+    for _ in workers:
+        worker_counts, worker_latencies = queue.get()
+        for outcome in OUTCOMES:
+            counts[outcome] += worker_counts[outcome]
+        latencies.extend(worker_latencies)
+    for worker in workers:
+        worker.join()
+
+    results = {
+        "scopes": scopes,
+        "rate": rate,
+        "jitter": jitter,
+        "duration": duration,
+        "offered_rate": scopes * rate,
+        "completed_rate": counts[COMPLETED] / duration,
+        "latency_ms": latency_summary(latencies)
+        }
+    results.update(counts)
+    return results
+
+def is_saturated(results, previous):
+    """
+    Returns True if the server didn't keep up with the load of the test.
+    @param previous: results of the test with half the oscilloscopes or None.
+    """
+    if results[REFUSED] or results[TIMEOUTS] or results[ERRORS]:
+        return True
+    if results["offered_rate"] > 0:
+        return results["completed_rate"] < SATURATION_SHARE * results["offered_rate"]
+    return previous is not None and \
+        results["completed_rate"] < (1 + SATURATION_GAIN) * previous["completed_rate"]
+
+def print_results(results):
+    latency = results["latency_ms"]
+    if latency:
+        latency = "latency p50 %.2f ms, p99 %.2f ms, p99.9 %.2f ms, max %.2f ms" % (
+            latency["p50"], latency["p99"], latency["p999"], latency["max"])
+    else:
+        latency = "no completed commands"
+    print "%d scopes: %.1f commands/s completed, %d refused, %d timeouts, %d errors, %s" % (
+        results["scopes"], results["completed_rate"], results[REFUSED], results[TIMEOUTS],
+        results[ERRORS], latency)
+
+if __name__ == '__main__':
+    params = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = parse_options(sys.argv[1:])
+    if len(params) > 1:
+        print __doc__
+        sys.exit(1)
+
+    host = params[0] if params else DEFAULT_HOST
+    port = int(options.get(PORT_OPTION) or RPCBIND_PORT)
+    scopes = int(options.get(SCOPES_OPTION) or SCOPES)
+    rate = float(options.get(RATE_OPTION) or RATE)
+    jitter = float(options.get(JITTER_OPTION) or JITTER)
+    duration = float(options.get(DURATION_OPTION) or DURATION)
+    timeout = float(options.get(TIMEOUT_OPTION) or TIMEOUT)
+    processes = int(options.get(PROCESSES_OPTION) or multiprocessing.cpu_count())
+    session = options.get(SESSION_OPTION)
+    commands = read_session(session) if session else sweep_session()
+
+    steps = [scopes]
+    if RAMP_OPTION in options:
+        steps = []
+        n = 1
+        while n < scopes:
+            steps.append(n)
+            n *= 2
+        steps.append(scopes)
+
+    if JSON_OPTION not in options:
+        print "Loading %s:%d, %s commands/s per scope, %.0f%% jitter, %g s per test..." % (
+            host, port, "max" if rate == 0 else "%g" % rate, jitter * 100, duration)
+    previous = None
+    saturation = None
+    for n in steps:
+        results = run_load(host, port, commands, n, rate, jitter, duration, timeout, processes)
+        if saturation is None and is_saturated(results, previous):
+            saturation = n
+        results["saturated"] = saturation is not None
+        if JSON_OPTION in options:
+            print json.dumps(results, sort_keys=True)
+        else:
+            print_results(results)
+        sys.stdout.flush()
+        previous = results
+
+    if RAMP_OPTION in options and JSON_OPTION not in options:
+        if saturation is None:
+            print "The server kept up with %d scopes." % scopes
+        else:
+            print "The server saturated at %d scopes." % saturation
@@ -0,0 +1,131 @@
+'''
+Created on Oct 18, 2026
+
+Measures the time spent in each phase of the connection cycle which
+the oscilloscope runs for every command.
+'''
+
+import ctypes
+import ctypes.util
+import time
+
+# Phases of the cycle in the order of their appearance.
+GETPORT = "getport"
+CONNECT = "connect"
+CREATE_LINK = "create_link"
+DEVICE_WRITE = "device_write"
+DEVICE_READ = "device_read"
+DESTROY_LINK = "destroy_link"
+PHASES = (GETPORT, CONNECT, CREATE_LINK, DEVICE_WRITE, DEVICE_READ, DESTROY_LINK)
+
+# Phases which are connection overhead rather than command execution.
+OVERHEAD_PHASES = (GETPORT, CONNECT, CREATE_LINK, DESTROY_LINK)
+
+# clock_gettime() clock which isn't affected by system time changes
+CLOCK_MONOTONIC = 1
+
+class Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+def load_clock_gettime():
+    """
+    Returns clock_gettime() of the C library or None if it isn't available.
+    Python 2 doesn't provide a monotonic clock.
+    """
+    for name in ("c", "rt"):
+        path = ctypes.util.find_library(name)
+        if path is None:
+            continue
+        try:
+            clock_gettime = ctypes.CDLL(path, use_errno=True).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(Timespec)]
+        return clock_gettime
+    return None
+
+clock_gettime = load_clock_gettime()
+
+def monotonic():
+    """
+    Returns the time in seconds of a clock which never goes backwards.
+    Falls back to time.time() on systems without clock_gettime().
+    """
+    if clock_gettime is None:
+        return time.time()
+    # A new structure per call, so the clock may be read by several threads
+    timespec = Timespec()
+    if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(timespec)) != 0:
+        return time.time()
+    return timespec.tv_sec + timespec.tv_nsec * 1e-9
+
+class PhaseTimer(object):
+    '''
+    Collects phase durations of each oscilloscope separately.
+    A cycle begins with RPCBIND request and ends with DESTROY_LINK.
+    Each phase lasts from the end of the previous phase until the reply
+    to the corresponding request is ready.
+    '''
+
+    def __init__(self, verbose=True):
+        """
+        @param verbose: print the phases of each cycle when it ends.
+        """
+        self.verbose = verbose
+        # Scope address -> (end time of the last phase, phase durations)
+        self.cycles = {}
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.count = 0
+
+    def begin(self, scope):
+        """
+        Starts a new cycle of the oscilloscope.
+        """
+        self.cycles[scope] = (time.time(), dict.fromkeys(PHASES, 0.0))
+
+    def mark(self, scope, phase):
+        """
+        Ends a phase of the current cycle of the oscilloscope.
+        A cycle which didn't begin with RPCBIND request begins here.
+        """
+        now = time.time()
+        if scope not in self.cycles:
+            self.cycles[scope] = (now, dict.fromkeys(PHASES, 0.0))
+            return
+        last, phases = self.cycles[scope]
+        phases[phase] += now - last
+        self.cycles[scope] = (now, phases)
+
+    def end(self, scope):
+        """
+        Ends the current cycle of the oscilloscope and adds it to the totals.
+        """
+        if scope not in self.cycles:
+            return
+        last, phases = self.cycles.pop(scope)
+        for phase in PHASES:
+            self.totals[phase] += phases[phase]
+        self.count += 1
+        if self.verbose:
+            print "Timing %s: %s" % (scope, self.format_phases(phases))
+
+    def format_phases(self, phases):
+        """
+        Formats phase durations and the share of connection overhead.
+        """
+        total = sum(phases.values())
+        overhead = sum(phases[phase] for phase in OVERHEAD_PHASES)
+        share = 100.0 * overhead / total if total > 0 else 0.0
+        parts = ["%s %.2f ms" % (phase, phases[phase] * 1000) for phase in PHASES]
+        return "%s. Overhead %.2f ms of %.2f ms (%.1f%%)." % (
+            ", ".join(parts), overhead * 1000, total * 1000, share)
+
+    def print_summary(self):
+        """
+        Prints the average phase durations of all the completed cycles.
+        """
+        if self.count == 0:
+            print "Timing: no complete connection cycles."
+            return
+        averages = dict((phase, self.totals[phase] / self.count) for phase in PHASES)
+        print "Timing average of %d cycles: %s" % (self.count, self.format_phases(averages))
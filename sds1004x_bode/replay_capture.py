@@ -0,0 +1,262 @@
+'''
+Created on Oct 18, 2026
+
+Sends the requests of a capture file recorded by bode.py --capture to an AWG
+server again and compares its replies with the recorded ones. Reproduces
+timing dependent problems and benchmarks the server with real oscilloscope traffic.
+
+Usage:
+    python replay_capture.py <capture_file> [host] [options]
+
+Run bode.py or supervisor.py first. The default host is 127.0.0.1.
+The link IDs and the VXI-11 port assigned by the server are mapped to the
+recorded ones, so the replies are expected to be identical.
+
+Options:
+    --fast              sends each request as soon as possible instead of
+                        keeping the recorded intervals between the requests.
+    --port=<n>          RPCBIND port of the server. Default is 111.
+    --timeout=<sec>     time to wait for each reply. Default is 5 s.
+    --json              prints the results as JSON.
+'''
+
+import sys
+import json
+import socket
+import time
+import wire_capture
+from awg_server import RPCBIND_PORT, VXI11_PORT, VXI11_CORE_ID, CREATE_LINK, DEVICE_WRITE, \
+    DEVICE_READ, DESTROY_LINK, RPCBIND_DATAGRAM_SIZE
+from cli_options import parse_options
+from phase_timing import monotonic
+from rpc_record import RecordReader
+from vxi11_client import RpcError, TIMEOUT, BODY_OFFSET, LINK_ID_OFFSET, latency_summary
+from xdr_codec import UINT, RECORD_MARK_SIZE, unpack_uint
+
+DEFAULT_HOST = "127.0.0.1"
+
+# Offsets in the requests, including the record marking header
+PROGRAM_OFFSET = 0x10
+PROCEDURE_OFFSET = 0x18
+## First argument of DEVICE_WRITE, DEVICE_READ and DESTROY_LINK
+REQUEST_LINK_ID_OFFSET = 0x2C
+LINK_PROCEDURES = (DEVICE_WRITE, DEVICE_READ, DESTROY_LINK)
+
+# Options
+FAST_OPTION = "--fast"
+PORT_OPTION = "--port"
+TIMEOUT_OPTION = "--timeout"
+JSON_OPTION = "--json"
+
+# Request outcomes
+REQUESTS = "requests"
+REPLIES = "replies"
+MISMATCHES = "mismatches"
+TIMEOUTS = "timeouts"
+ERRORS = "errors"
+OUTCOMES = (REQUESTS, REPLIES, MISMATCHES, TIMEOUTS, ERRORS)
+
+def patch_uint(data, offset, value):
+    """
+    Returns the data with the unsigned integer at the offset replaced.
+    Data which is too short is returned unchanged.
+    """
+    if len(data) < offset + UINT.size:
+        return data
+    return data[:offset] + UINT.pack(value) + data[offset + UINT.size:]
+
+class ReplayConnection(object):
+    '''
+    Socket replaying one recorded connection.
+    '''
+
+    def __init__(self, service, sock):
+        self.service = service
+        self.sock = sock
+        self.reader = RecordReader()
+        # VXI-11 procedure of the last request
+        self.procedure = None
+        # Time the last request was sent
+        self.sent = None
+
+class CaptureReplay(object):
+    '''
+    Replays the records of a capture in their order by a single thread.
+    Each recorded connection is replayed over its own socket.
+    '''
+
+    def __init__(self, records, host=DEFAULT_HOST, rpcbind_port=RPCBIND_PORT, fast=False,
+                 timeout=TIMEOUT):
+        """
+        @param records: CaptureRecords as returned by wire_capture.read_capture().
+        @param fast: if False, each request is sent at its recorded time relative
+                to the first record. Replies are awaited in any case.
+        """
+        self.records = records
+        self.host = host
+        self.rpcbind_port = rpcbind_port
+        self.fast = fast
+        self.timeout = timeout
+        # Updated by each GETPORT reply
+        self.vxi11_port = VXI11_PORT
+        # Capture connection ID -> ReplayConnection
+        self.connections = {}
+        # Connections which failed. Their remaining records are skipped.
+        self.failed = set()
+        # Recorded link ID -> link ID assigned by the server
+        self.link_ids = {}
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.latencies = []
+        self.duration = 0.0
+
+    def run(self):
+        """
+        @return: dictionary of the results.
+        """
+        start = monotonic()
+        first = self.records[0].time if self.records else 0.0
+        for record in self.records:
+            if record.connection in self.failed:
+                continue
+            if not self.fast and record.event in (wire_capture.OPEN, wire_capture.REQUEST):
+                delay = start + record.time - first - monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                self.replay_record(record)
+            except socket.timeout:
+                self.fail(record.connection, TIMEOUTS)
+            except (socket.error, RpcError):
+                self.fail(record.connection, ERRORS)
+        self.duration = monotonic() - start
+        for connection in self.connections.values():
+            connection.sock.close()
+        self.connections.clear()
+
+        results = {
+            "duration": self.duration,
+            "recorded_duration": self.records[-1].time - first if self.records else 0.0,
+            "fast": self.fast,
+            "latency_ms": latency_summary(self.latencies)
+            }
+        results.update(self.counts)
+        return results
+
+    def replay_record(self, record):
+        if record.event == wire_capture.OPEN:
+            self.open(record)
+        elif record.event == wire_capture.REQUEST:
+            self.send_request(record)
+        elif record.event == wire_capture.REPLY:
+            self.receive_reply(record)
+        elif record.event == wire_capture.CLOSE:
+            connection = self.connections.pop(record.connection, None)
+            if connection is not None:
+                connection.sock.close()
+
+    def open(self, record):
+        port = self.rpcbind_port if record.service == wire_capture.RPCBIND_TCP else self.vxi11_port
+        sock = socket.create_connection((self.host, port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections[record.connection] = ReplayConnection(record.service, sock)
+
+    def send_request(self, record):
+        if record.service == wire_capture.RPCBIND_UDP:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.settimeout(self.timeout)
+            sock.connect((self.host, self.rpcbind_port))
+            self.connections[record.connection] = ReplayConnection(record.service, sock)
+        connection = self.connections.get(record.connection)
+        if connection is None:
+            # The connection was opened before the capture started
+            return
+        data = record.data
+        if record.service == wire_capture.VXI11 and len(data) > PROCEDURE_OFFSET + UINT.size and \
+                unpack_uint(data, PROGRAM_OFFSET) == VXI11_CORE_ID:
+            connection.procedure = unpack_uint(data, PROCEDURE_OFFSET)
+            if connection.procedure in LINK_PROCEDURES and len(data) >= REQUEST_LINK_ID_OFFSET + UINT.size:
+                link_id = unpack_uint(data, REQUEST_LINK_ID_OFFSET)
+                data = patch_uint(data, REQUEST_LINK_ID_OFFSET, self.link_ids.get(link_id, link_id))
+        connection.sock.sendall(data)
+        connection.sent = monotonic()
+        self.counts[REQUESTS] += 1
+
+    def receive_reply(self, record):
+        """
+        Waits for the reply of the server and compares it with the recorded one.
+        @raise RpcError: if the server closed the connection.
+        """
+        connection = self.connections.get(record.connection)
+        if connection is None or connection.sent is None:
+            return
+        if connection.service == wire_capture.RPCBIND_UDP:
+            reply = connection.sock.recv(RPCBIND_DATAGRAM_SIZE)
+        else:
+            reply = connection.reader.read_record(connection.sock)
+            if reply is None:
+                raise RpcError("Connection closed by the server.")
+            reply = reply.tobytes()
+        self.latencies.append(monotonic() - connection.sent)
+        self.counts[REPLIES] += 1
+
+        expected = record.data
+        if connection.service == wire_capture.VXI11:
+            if connection.procedure == CREATE_LINK and len(reply) >= LINK_ID_OFFSET + UINT.size:
+                link_id = unpack_uint(reply, LINK_ID_OFFSET)
+                if len(expected) >= LINK_ID_OFFSET + UINT.size:
+                    self.link_ids[unpack_uint(expected, LINK_ID_OFFSET)] = link_id
+                expected = patch_uint(expected, LINK_ID_OFFSET, link_id)
+        else:
+            # GETPORT reply carries the VXI-11 port. Datagrams don't have the record marking header.
+            offset = BODY_OFFSET
+            if connection.service == wire_capture.RPCBIND_UDP:
+                offset -= RECORD_MARK_SIZE
+            if len(reply) >= offset + UINT.size:
+                self.vxi11_port = unpack_uint(reply, offset)
+                expected = patch_uint(expected, offset, self.vxi11_port)
+        if reply != expected:
+            self.counts[MISMATCHES] += 1
+
+    def fail(self, connection_id, outcome):
+        self.counts[outcome] += 1
+        self.failed.add(connection_id)
+        connection = self.connections.pop(connection_id, None)
+        if connection is not None:
+            connection.sock.close()
+
+def print_results(results):
+    print "Replayed %d requests in %.3f s (recorded %.3f s)." % (
+        results[REQUESTS], results["duration"], results["recorded_duration"])
+    print "%d replies, %d mismatches, %d timeouts, %d errors." % (
+        results[REPLIES], results[MISMATCHES], results[TIMEOUTS], results[ERRORS])
+    latency = results["latency_ms"]
+    if latency:
+        print "Reply latency: mean %.3f ms, p50 %.3f ms, p99 %.3f ms, max %.3f ms" % (
+            latency["mean"], latency["p50"], latency["p99"], latency["max"])
+
+if __name__ == '__main__':
+    params = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = parse_options(sys.argv[1:])
+    if len(params) not in (1, 2):
+        print __doc__
+        sys.exit(1)
+
+    try:
+        start_time, records = wire_capture.read_capture(params[0])
+    except (IOError, wire_capture.CaptureError), e:
+        print e
+        sys.exit(1)
+
+    host = params[1] if len(params) > 1 else DEFAULT_HOST
+    replay = CaptureReplay(records, host, int(options.get(PORT_OPTION) or RPCBIND_PORT),
+                           fast=FAST_OPTION in options,
+                           timeout=float(options.get(TIMEOUT_OPTION) or TIMEOUT))
+    if JSON_OPTION not in options:
+        print "Replaying %d records captured on %s to %s:%d..." % (
+            len(records), time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_time)),
+            replay.host, replay.rpcbind_port)
+    results = replay.run()
+    if JSON_OPTION in options:
+        print json.dumps(results, sort_keys=True)
+    else:
+        print_results(results)
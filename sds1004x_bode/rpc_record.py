@@ -0,0 +1,142 @@
+'''
+Created on Oct 18, 2026
+
+RPC record marking reader (RFC 5531, section 11).
+'''
+
+import errno
+import socket
+
+# Record marking header
+## 1... .... .... .... .... .... .... .... = Last Fragment
+LAST_FRAGMENT = 0x80000000
+## .xxx xxxx xxxx xxxx xxxx xxxx xxxx xxxx = Fragment Length
+FRAGMENT_LENGTH_MASK = 0x7FFFFFFF
+HEADER_SIZE = 4
+
+# Initial size of the receive buffer. Any request of the oscilloscope fits in it.
+BUF_SIZE = 4096
+
+# Maximum record size. Equals to Maximum Receive Size sent in CREATE_LINK reply.
+MAX_RECORD_SIZE = 0x00800000
+
+# Socket errors meaning that no data is available yet.
+WOULD_BLOCK_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+class RecordTooLongError(ValueError):
+    pass
+
+class RecordReader(object):
+    '''
+    Reassembles RPC records received from a stream socket.
+
+    The data is received with recv_into() into a preallocated buffer and the
+    records are returned as memoryviews of that buffer, so a request which
+    arrives in a single TCP segment costs one system call and no copies.
+    Fragments of a multi-fragment record are moved in place to make the record
+    body contiguous.
+
+    A returned record is valid until the next call to fill() or read_record().
+    '''
+
+    def __init__(self, buf_size=BUF_SIZE):
+        self.buf = bytearray(buf_size)
+        self.view = memoryview(self.buf)
+        # Beginning of the current record (its first record marking header)
+        self.start = 0
+        # Length of the current record body assembled so far
+        self.assembled = 0
+        # Position of the next fragment header
+        self.pos = 0
+        # End of the received data
+        self.end = 0
+
+    def fill(self, sock):
+        """
+        Receives available data from the socket into the buffer.
+        @return: number of received bytes. 0 means that the peer closed the connection.
+        """
+        if self.start == self.end:
+            # All the received data was processed
+            self.start = self.pos = self.end = 0
+        elif self.end == len(self.buf):
+            self.make_room()
+        n = sock.recv_into(self.view[self.end:])
+        self.end += n
+        return n
+
+    def fill_nonblocking(self, sock):
+        """
+        Same as fill() for non-blocking sockets.
+        @return: number of received bytes or None if no data is available.
+        """
+        try:
+            n = self.fill(sock)
+        except socket.error, e:
+            if e.args[0] in WOULD_BLOCK_ERRORS:
+                return None
+            raise
+        return n
+
+    def next_record(self):
+        """
+        Returns the next complete record found in the buffer or None if more
+        data has to be received.
+        The record is returned with its first record marking header, so the
+        offsets of the fields are the same as in the raw TCP stream.
+        """
+        while self.end - self.pos >= HEADER_SIZE:
+            buf, pos = self.buf, self.pos
+            hdr = (buf[pos] << 24) | (buf[pos + 1] << 16) | (buf[pos + 2] << 8) | buf[pos + 3]
+            length = hdr & FRAGMENT_LENGTH_MASK
+            if self.assembled + length > MAX_RECORD_SIZE:
+                raise RecordTooLongError("RPC record exceeds %d bytes." % MAX_RECORD_SIZE)
+            body = self.pos + HEADER_SIZE
+            if self.end - body < length:
+                # The fragment is not complete yet
+                break
+
+            record_end = self.start + HEADER_SIZE + self.assembled
+            if body != record_end:
+                # Append the fragment to the record body written over its header
+                self.buf[record_end:record_end + length] = self.buf[body:body + length]
+            self.assembled += length
+            self.pos = body + length
+
+            if hdr & LAST_FRAGMENT:
+                record = self.view[self.start:self.start + HEADER_SIZE + self.assembled]
+                self.start = self.pos
+                self.assembled = 0
+                return record
+        return None
+
+    def read_record(self, sock):
+        """
+        Reads the next record from a blocking socket.
+        @return: the record or None if the peer closed the connection.
+        """
+        record = self.next_record()
+        while record is None:
+            if self.fill(sock) == 0:
+                return None
+            record = self.next_record()
+        return record
+
+    def make_room(self):
+        """
+        Moves the unprocessed data to the beginning of the buffer.
+        The buffer is enlarged if the data doesn't leave any free space.
+        """
+        if self.start > 0:
+            self.buf[0:self.end - self.start] = self.buf[self.start:self.end]
+        else:
+            size = 2 * len(self.buf)
+            if size > MAX_RECORD_SIZE + BUF_SIZE:
+                raise RecordTooLongError("RPC record exceeds %d bytes." % MAX_RECORD_SIZE)
+            buf = bytearray(size)
+            buf[0:self.end] = self.buf[0:self.end]
+            self.buf = buf
+            self.view = memoryview(self.buf)
+        self.pos -= self.start
+        self.end -= self.start
+        self.start = 0
@@ -0,0 +1,209 @@
+'''
+Created on Oct 18, 2026
+
+Serves several AWGs by a single server. Each AWG driver runs in its own
+worker process, so the serial port I/O of a slow AWG never delays the
+oscilloscopes which use the other AWGs.
+
+Usage:
+    python supervisor.py <config_file> [options]
+
+Config file (JSON):
+    {
+        "awgs": [
+            {"driver": "jds6600", "port": "/dev/ttyUSB0", "scopes": ["192.168.1.20"]},
+            {"driver": "fy6600", "port": "/dev/ttyUSB1", "links": {"inst1": 1, "inst2": 2}},
+            {"driver": "bk4075", "port": "/dev/ttyUSB2", "baud": 19200, "scopes": ["192.168.1.21"]}
+        ]
+    }
+
+    driver  AWG driver name as used by bode.py.
+    port    serial port of the AWG.
+    baud    baud rate for AWGs which support it. Optional.
+    scopes  IP addresses of the oscilloscopes using the AWG. Optional.
+    links   VXI-11 device names mapped to the AWG channel they control.
+            null keeps the channel set by the oscilloscope. Optional.
+    The first AWG serves the links which aren't assigned to any AWG.
+
+Options:
+    --timing        prints the time spent in each phase of the connection cycle.
+    --pipelined     replies to DEVICE_WRITE as soon as the command is passed to the
+                    worker process instead of when the AWG has executed it.
+    --speculative   prepares the commands of the next expected sweep frequency.
+    --cache         doesn't send settings which wouldn't change the AWG state.
+    --no-ack        waits a fixed delay after each command instead of the AWG acknowledgement.
+    --capture=<file>
+                    records the requests and replies of the oscilloscopes into a capture file.
+    --trace=<file>  writes trace spans of the requests as Chrome trace events, or as
+                    JSON lines if the file name ends with .jsonl. The AWG worker
+                    processes don't record spans.
+'''
+
+import sys
+import json
+import xdr_codec
+from async_awg_server import AsyncAwgServer
+from awg_server import DEVICE_WRITE
+from awg_factory import awg_factory
+from awg_process import ProcessAWG
+from phase_timing import PhaseTimer
+from wire_capture import WireCapture
+from tracing import Tracer
+from cli_options import parse_options
+
+# Options
+TIMING_OPTION = "--timing"
+PIPELINED_OPTION = "--pipelined"
+SPECULATIVE_OPTION = "--speculative"
+CACHE_OPTION = "--cache"
+NO_ACK_OPTION = "--no-ack"
+CAPTURE_OPTION = "--capture"
+TRACE_OPTION = "--trace"
+
+# Time given to each worker process to complete its commands on exit
+STOP_TIMEOUT = 5.0
+
+class ConfigError(Exception):
+    pass
+
+def read_config(path):
+    """
+    Reads and validates the config file.
+    @return: list of AWG entries. Each entry is a dictionary with driver, port,
+            baud, scopes and links keys. Missing optional keys are filled.
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (IOError, ValueError), e:
+        raise ConfigError("Can't read config file %s: %s" % (path, e))
+    return parse_config(config)
+
+def parse_config(config):
+    """
+    Validates the config and fills the missing optional keys.
+    """
+    entries = config.get("awgs") if isinstance(config, dict) else None
+    if not entries:
+        raise ConfigError("Config must contain a non-empty list of awgs.")
+    awgs = []
+    for n, entry in enumerate(entries):
+        if not isinstance(entry, dict) or "driver" not in entry or "port" not in entry:
+            raise ConfigError("AWG %d must have driver and port." % (n + 1))
+        if entry["driver"] not in awg_factory.awgs:
+            raise ConfigError("AWG %d has unknown driver %s." % (n + 1, entry["driver"]))
+        baud_rate = entry.get("baud")
+        awgs.append({
+            "driver": str(entry["driver"]),
+            "port": str(entry["port"]),
+            "baud": int(baud_rate) if baud_rate is not None else None,
+            "scopes": [str(scope) for scope in entry.get("scopes", [])],
+            "links": dict((str(device), int(channel) if channel is not None else None)
+                          for device, channel in entry.get("links", {}).iteritems())
+            })
+    return awgs
+
+class SupervisorServer(AsyncAwgServer):
+    '''
+    Event loop server which routes the links to AWGs running in worker processes.
+    The requests waiting for an AWG are resumed when its worker reports that
+    it executed all the commands, so other links are served meanwhile.
+    DEVICE_WRITE is acknowledged the same way, after the command was executed.
+    '''
+
+    def __init__(self, awg_configs, host=None, rpcbind_port=None, vxi11_port=None, timer=None,
+                 pipelined=False, speculative=False, ack=True, caching=False, capture=None,
+                 tracer=None):
+        """
+        @param awg_configs: AWG entries as returned by read_config().
+        @param pipelined: if True, DEVICE_WRITE is acknowledged as soon as
+                the command is passed to the worker process. The worker
+                processes queue the commands themselves, so the server doesn't
+                run the worker threads of its own pipelined mode.
+        @param ack: if False, the AWGs are used without acknowledgements.
+        @param caching: if True, each worker wraps its AWG by CachingAWG.
+        """
+        self.early_ack = pipelined
+        self.processes = []
+        awgs = {}
+        devices = {}
+        for entry in awg_configs:
+            awg = ProcessAWG(entry["driver"], entry["port"], entry["baud"], ack, caching)
+            self.processes.append(awg)
+            for scope in entry["scopes"]:
+                awgs[scope] = awg
+            for device, channel in entry["links"].iteritems():
+                devices[device] = (awg, channel)
+        AsyncAwgServer.__init__(self, self.processes[0], host, rpcbind_port, vxi11_port, timer,
+                                awgs=awgs, speculative=speculative, devices=devices, capture=capture,
+                                tracer=tracer)
+
+    def start(self):
+        print "Starting %d AWG processes..." % len(self.processes)
+        for awg in self.processes:
+            print "AWG: %s, port: %s" % (awg.driver, awg.port)
+            awg.start()
+        AsyncAwgServer.start(self)
+
+    def get_reply_awg(self, rx_buf):
+        """
+        Returns the AWG of the link which must execute a DEVICE_WRITE
+        before it is acknowledged.
+        """
+        if self.early_ack or xdr_codec.unpack_uint(rx_buf, 0x18) != DEVICE_WRITE:
+            return None
+        link = self.links.get(self.get_link_id(rx_buf))
+        if link is None:
+            return None
+        return link.parser.awg
+
+    def stop_processes(self, timeout=STOP_TIMEOUT):
+        """
+        Lets the workers complete the queued commands and stops them.
+        """
+        for awg in self.processes:
+            if awg.process is not None:
+                awg.stop(timeout)
+
+if __name__ == '__main__':
+    params = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = parse_options(sys.argv[1:])
+    if len(params) != 1:
+        print __doc__
+        sys.exit(1)
+
+    try:
+        awg_configs = read_config(params[0])
+    except ConfigError, e:
+        print e
+        sys.exit(1)
+
+    timer = PhaseTimer() if TIMING_OPTION in options else None
+    capture = WireCapture(options[CAPTURE_OPTION]) if options.get(CAPTURE_OPTION) else None
+    tracer = Tracer(options[TRACE_OPTION]) if options.get(TRACE_OPTION) else None
+    server = None
+    try:
+        server = SupervisorServer(awg_configs, timer=timer,
+                                  pipelined=PIPELINED_OPTION in options,
+                                  speculative=SPECULATIVE_OPTION in options,
+                                  ack=NO_ACK_OPTION not in options,
+                                  caching=CACHE_OPTION in options,
+                                  capture=capture, tracer=tracer)
+        server.start()
+
+    except KeyboardInterrupt:
+        print('Ctrl+C pressed. Exiting...')
+
+    finally:
+        if server is not None:
+            server.close_sockets()
+            server.print_parser_stats()
+            server.stop_processes()
+        if timer is not None:
+            timer.print_summary()
+        if capture is not None:
+            capture.close()
+        if tracer is not None:
+            tracer.close()
+
+    print "Bye."
@@ -0,0 +1,176 @@
+'''
+Created on Oct 18, 2026
+
+Runs frequency sweeps on the AWG without the oscilloscope, e.g. long
+characterisation sweeps or production tests of a device under test.
+
+Usage:
+    python sweep.py <awg_name> <serial_port> <start> <stop> <points> [options]
+    python sweep.py <awg_name> <serial_port> <start> <stop> --ppd=<n> [options]
+
+Options:
+    --ppd=<n>       number of points per decade instead of the total number of points.
+    --lin           linear sweep. The default sweep is logarithmic.
+    --dwell=<sec>   time each frequency is held. Default is 0.1 s.
+                    0 sends the frequencies as fast as the AWG accepts them.
+    --channel=<n>   AWG channel. Default is 1.
+    --baud=<rate>   serial port baud rate for AWGs which support it.
+    --builtin       use the built-in sweep function of the AWG if it has one.
+                    The AWG sweeps continuously instead of stepping.
+'''
+
+import sys
+import math
+import time
+from awg_factory import awg_factory
+from cli_options import parse_options
+from awgdrivers.base_awg import DEFAULT_DWELL, sweep_frequencies
+
+# Options
+PPD_OPTION = "--ppd"
+LIN_OPTION = "--lin"
+DWELL_OPTION = "--dwell"
+CHANNEL_OPTION = "--channel"
+BAUD_OPTION = "--baud"
+BUILTIN_OPTION = "--builtin"
+
+DEFAULT_CHANNEL = 1
+DEFAULT_BAUD_RATE = None
+
+# The last part of each wait is spent polling the clock, because sleep()
+# may oversleep by a scheduler tick.
+SPIN_TIME = 0.002
+
+def frequency_plan(start, stop, points=None, points_per_decade=None, log=True):
+    """
+    Returns the frequencies of the sweep.
+    @param points: total number of points.
+    @param points_per_decade: defines the number of points if points is None.
+    """
+    if points is None:
+        decades = abs(math.log10(float(stop) / start))
+        points = int(math.ceil(decades * points_per_decade)) + 1
+    return sweep_frequencies(start, stop, points, log)
+
+def sleep_until(deadline):
+    """
+    Waits until the deadline as precisely as possible.
+    """
+    remaining = deadline - time.time()
+    if remaining > SPIN_TIME:
+        time.sleep(remaining - SPIN_TIME)
+    while time.time() < deadline:
+        pass
+
+class SweepResult(object):
+    '''
+    Timing of a completed stepped sweep.
+    '''
+
+    def __init__(self, duration, send_times, dwell):
+        """
+        @param duration: time from the first point until the end of the last dwell.
+        @param send_times: time at which each point was sent.
+        @param dwell: requested time between the points.
+        """
+        self.duration = duration
+        self.send_times = send_times
+        self.dwell = dwell
+
+    def points_per_second(self):
+        return len(self.send_times) / self.duration if self.duration > 0 else 0.0
+
+    def jitter(self):
+        """
+        Returns the deviation of each interval between two points from the dwell.
+        """
+        times = self.send_times
+        return [abs(times[n] - times[n - 1] - self.dwell) for n in xrange(1, len(times))]
+
+    def format(self):
+        """
+        Returns a string describing the achieved rate and the jitter.
+        """
+        text = "%d points in %.3f s, %.1f points/s." % (
+            len(self.send_times), self.duration, self.points_per_second())
+        jitter = sorted(self.jitter())
+        if not jitter:
+            return text
+        mean = sum(jitter) / len(jitter)
+        p99 = jitter[min(len(jitter) - 1, int(len(jitter) * 0.99))]
+        return "%s Jitter: mean %.3f ms, p99 %.3f ms, max %.3f ms." % (
+            text, mean * 1000, p99 * 1000, jitter[-1] * 1000)
+
+def stepped_sweep(awg, plan, dwell=DEFAULT_DWELL, channel=DEFAULT_CHANNEL):
+    """
+    Sets the frequencies of the plan one by one. Point n is sent at n * dwell
+    after the first point. The commands are formatted before the sweep starts.
+    If the AWG is slower than the dwell, each point is sent right after
+    the previous one completes.
+    @return: SweepResult.
+    """
+    prepared = [awg.prepare_frequency(channel, freq) for freq in plan]
+    send_times = []
+    start = time.time()
+    for n, item in enumerate(prepared):
+        sleep_until(start + n * dwell)
+        send_times.append(time.time())
+        awg.send_prepared(item)
+    # Hold the last frequency
+    sleep_until(start + len(prepared) * dwell)
+    return SweepResult(time.time() - start, send_times, dwell)
+
+def builtin_sweep(awg, plan, log=True, dwell=DEFAULT_DWELL, channel=DEFAULT_CHANNEL):
+    """
+    Runs the sweep by the built-in sweep function of the AWG.
+    @return: duration of the sweep in seconds.
+    """
+    start = time.time()
+    awg.run_sweep(plan[0], plan[-1], len(plan), log, dwell, channel)
+    return time.time() - start
+
+if __name__ == '__main__':
+    params = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = parse_options(sys.argv[1:])
+    if len(params) not in (4, 5) or (len(params) == 4 and not options.get(PPD_OPTION)):
+        print __doc__
+        sys.exit(1)
+
+    awg_name, awg_port = params[0], params[1]
+    start, stop = float(params[2]), float(params[3])
+    points = int(params[4]) if len(params) == 5 else None
+    points_per_decade = float(options.get(PPD_OPTION) or 0)
+    log = LIN_OPTION not in options
+    dwell = float(options.get(DWELL_OPTION) or DEFAULT_DWELL)
+    channel = int(options.get(CHANNEL_OPTION) or DEFAULT_CHANNEL)
+    baud_rate = options.get(BAUD_OPTION)
+    baud_rate = int(baud_rate) if baud_rate else DEFAULT_BAUD_RATE
+    plan = frequency_plan(start, stop, points, points_per_decade, log)
+
+    print "Initializing AWG..."
+    print "AWG: %s" % awg_name
+    print "Port: %s" % awg_port
+    awg_class = awg_factory.get_class_by_name(awg_name)
+    if baud_rate is None:
+        awg = awg_class(awg_port)
+    else:
+        awg = awg_class(awg_port, baud_rate)
+    awg.initialize()
+
+    try:
+        awg.enable_output(channel, True)
+        print "Sweeping %s from %g Hz to %g Hz, %d points, %g s per point..." % (
+            "logarithmically" if log else "linearly", start, stop, len(plan), dwell)
+        if BUILTIN_OPTION in options:
+            print "Sweep completed in %.3f s." % builtin_sweep(awg, plan, log, dwell, channel)
+        else:
+            print "Sweep completed: %s" % stepped_sweep(awg, plan, dwell, channel).format()
+    except KeyboardInterrupt:
+        print('Ctrl+C pressed. Exiting...')
+    finally:
+        transport = getattr(awg, "transport", None)
+        if transport is not None:
+            print "AWG serial port: %s." % (transport.get_stats())
+        awg.disconnect()
+
+    print "Bye."
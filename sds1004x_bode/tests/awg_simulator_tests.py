@@ -0,0 +1,121 @@
+'''
+Created on Oct 18, 2026
+
+@note: Runs the AWG drivers against the virtual AWGs of awg_simulator.py.
+Checks that the settings made by each driver reach the state of the AWG,
+measures the command throughput and verifies that lost commands are
+detected by the acknowledgement timeouts. Operations queued to a worker
+must be written in batches without losing any of them.
+'''
+
+import time
+from sds1004x_bode.awg_factory import awg_factory
+from sds1004x_bode.awg_worker import AwgWorker, QueuedAWG
+from sds1004x_bode.awg_simulator import simulators
+from sds1004x_bode.awgdrivers import constants
+
+FREQUENCIES = [1000.0 + n * 12.5 for n in xrange(50)]
+SETTINGS = {
+    constants.WAVE_TYPE: constants.SINE,
+    constants.AMPLITUDE: 2.0,
+    constants.OFFSET: 0.5,
+    constants.OUTPUT: True
+    }
+DROP_RATE = 0.2
+DROP_COMMANDS = 20
+
+def run_driver(name, sim):
+    """
+    Sweeps the frequency and applies the settings by the driver.
+    @return: the sweep throughput in commands per second.
+    """
+    awg = awg_factory.get_class_by_name(name)(sim.port)
+    awg.initialize()
+    try:
+        start = time.time()
+        for freq in FREQUENCIES:
+            awg.set_frequency(1, freq)
+        throughput = len(FREQUENCIES) / (time.time() - start)
+        awg.apply(1, SETTINGS)
+        # Read back through the serial port
+        assert awg.read_setting(1, constants.FREQUENCY) == FREQUENCIES[-1]
+        assert awg.read_setting(1, constants.OUTPUT) is True
+    finally:
+        awg.disconnect()
+    return throughput
+
+def test_driver(name):
+    sim = simulators[name]()
+    sim.start()
+    try:
+        throughput = run_driver(name, sim)
+    finally:
+        sim.stop()
+    state = sim.get_state(1)
+    assert state[constants.FREQUENCY] == FREQUENCIES[-1], state
+    for setting, value in SETTINGS.iteritems():
+        assert state[setting] == value, (setting, state)
+    assert not sim.get_commands("invalid"), sim.get_commands("invalid")
+    print "%s: %.1f commands/s, %s." % (name, throughput, sim.get_stats())
+
+def test_dropped_commands(name):
+    sim = simulators[name](drop_rate=DROP_RATE, seed=1)
+    sim.start()
+    awg = awg_factory.get_class_by_name(name)(sim.port)
+    try:
+        awg.initialize()
+        for n in xrange(DROP_COMMANDS):
+            awg.set_frequency(1, FREQUENCIES[n])
+    finally:
+        awg.disconnect()
+        sim.stop()
+    dropped = len(sim.get_commands("dropped"))
+    assert dropped > 0
+    # Each lost command costs the driver an acknowledgement timeout
+    assert awg.transport.ack_timeouts == dropped, (awg.transport.ack_timeouts, dropped)
+    print "%s with %d%% losses: %s, %s." % (
+        name, DROP_RATE * 100, sim.get_stats(), awg.transport.get_stats())
+
+def sim_frequency_commands(awg):
+    """
+    Returns the frequency commands of the sweep as the virtual AWG records them.
+    """
+    return set(cmd for freq in FREQUENCIES for cmd in awg.frequency_commands(1, freq))
+
+def test_batched_worker(name):
+    sim = simulators[name]()
+    sim.start()
+    awg = awg_factory.get_class_by_name(name)(sim.port)
+    try:
+        awg.initialize()
+        writes = awg.transport.writes
+        worker = AwgWorker(awg)
+        worker.start()
+        queued = QueuedAWG(worker)
+        start = time.time()
+        for freq in FREQUENCIES:
+            queued.set_frequency(1, freq)
+        queued.apply(1, SETTINGS)
+        queued.wait_idle()
+        throughput = len(FREQUENCIES) / (time.time() - start)
+        worker.stop()
+    finally:
+        awg.disconnect()
+        sim.stop()
+    writes = awg.transport.writes - writes
+    state = sim.get_state(1)
+    assert state[constants.FREQUENCY] == FREQUENCIES[-1], state
+    assert not sim.get_commands("invalid") and not sim.get_commands("dropped")
+    frequencies = [cmd for cmd in sim.get_commands() if cmd in sim_frequency_commands(awg)]
+    assert len(frequencies) == len(FREQUENCIES), len(frequencies)
+    # The operations queued while the first one was executed are batched
+    assert writes < len(FREQUENCIES), writes
+    print "%s batched by a worker: %.1f commands/s, %d operations in %d writes." % (
+        name, throughput, len(FREQUENCIES) + 1, writes)
+
+if __name__ == '__main__':
+    for name in sorted(simulators):
+        test_driver(name)
+    test_dropped_commands("jds6600")
+    for name in ("jds6600", "fy6600"):
+        test_batched_worker(name)
@@ -0,0 +1,149 @@
+'''
+Created on Oct 18, 2026
+
+@note: Tests the awg_worker.py module in the event loop server. Stalls the
+worker thread of the pipelined mode and verifies that a new link waiting
+for the worker and a write to the full queue pause only their own
+connections, while the server keeps answering the other requests.
+'''
+
+import os
+import sys
+import socket
+import struct
+import threading
+import time
+from sds1004x_bode.async_awg_server import AsyncAwgServer
+from sds1004x_bode.awg_worker import QUEUE_SIZE
+from sds1004x_bode.awgdrivers.dummy_awg import DummyAWG
+
+HOST = "127.0.0.1"
+# Unprivileged ports, so the test doesn't require root.
+RPCBIND_PORT = 10118
+VXI11_PORT = 10710
+
+# The worker sleeps this long on the first frequency setting
+STALL = 1.0
+# Maximum reply time allowed while the worker is stalled
+MAX_RTT = 0.05
+REQUESTS = 50
+
+PORTMAP_PROGRAM = 100000
+VXI11_CORE_ID = 395183
+GET_PORT = 3
+CREATE_LINK = 10
+DEVICE_WRITE = 11
+DESTROY_LINK = 23
+
+class StalledAWG(DummyAWG):
+    '''
+    Dummy AWG whose first frequency setting blocks like a hung serial port.
+    '''
+    SHORT_NAME = "stalled"
+
+    def __init__(self):
+        self.stalled = False
+
+    def set_frequency(self, channel, freq):
+        if not self.stalled:
+            self.stalled = True
+            time.sleep(STALL)
+
+def call(xid, prog, proc, body, vers=1):
+    """
+    Generates an RPC call with record marking header.
+    """
+    msg = struct.pack(">IIIIII", xid, 0, 2, prog, vers, proc) + "\x00" * 16 + body
+    return struct.pack(">I", 0x80000000 | len(msg)) + msg
+
+def opaque(data):
+    return struct.pack(">I", len(data)) + data + "\x00" * (-len(data) % 4)
+
+def read_reply(sock):
+    header = ""
+    while len(header) < 4:
+        header += sock.recv(4 - len(header))
+    length = struct.unpack(">I", header)[0] & 0x7fffffff
+    data = ""
+    while len(data) < length:
+        data += sock.recv(length - len(data))
+    return data
+
+def request(sock, data):
+    """
+    Sends a request and returns the reply and the round trip time.
+    """
+    t0 = time.time()
+    sock.sendall(data)
+    reply = read_reply(sock)
+    return reply, time.time() - t0
+
+def create_link(xid):
+    return call(xid, VXI11_CORE_ID, CREATE_LINK, struct.pack(">III", 0, 0, 0) + opaque("inst0"))
+
+def device_write(xid, link_id, cmd):
+    return call(xid, VXI11_CORE_ID, DEVICE_WRITE, struct.pack(">IIII", link_id, 0, 0, 8) + opaque(cmd))
+
+def test_stalled_worker(server):
+    lxi = socket.create_connection((HOST, VXI11_PORT))
+    reply, _ = request(lxi, create_link(1))
+    link_id = struct.unpack(">I", reply[28:32])[0]
+
+    # The write is acknowledged at once and stalls the worker.
+    # The following writes fill the queue.
+    t0 = time.time()
+    request(lxi, device_write(2, link_id, "C1:BSWV FRQ,100"))
+    for n in xrange(QUEUE_SIZE):
+        request(lxi, device_write(3 + n, link_id, "C1:BSWV AMP,%d" % (n % 5 + 1)))
+    # A write to the full queue waits for the worker
+    lxi.sendall(device_write(100, link_id, "C1:BSWV AMP,1"))
+    # A new link of another connection waits for the worker
+    waiting = socket.create_connection((HOST, VXI11_PORT))
+    waiting.sendall(create_link(200))
+    rtts = []
+    for n in xrange(REQUESTS):
+        rpcbind = socket.create_connection((HOST, RPCBIND_PORT))
+        reply, rtt = request(rpcbind, call(n, PORTMAP_PROGRAM, GET_PORT,
+                                           struct.pack(">IIII", VXI11_CORE_ID, 1, 6, 0), vers=2))
+        rpcbind.close()
+        rtts.append(rtt)
+        assert struct.unpack(">I", reply[-4:])[0] == VXI11_PORT
+    elapsed = time.time() - t0
+    read_reply(waiting)
+    link_time = time.time() - t0
+    waiting.close()
+    read_reply(lxi)
+    write_time = time.time() - t0
+    request(lxi, call(1000, VXI11_CORE_ID, DESTROY_LINK, struct.pack(">I", link_id)))
+    lxi.close()
+    assert elapsed < STALL, "The requests were answered after the stall: %.3f s" % elapsed
+    assert max(rtts) < MAX_RTT, "Maximum round trip time %.3f s" % max(rtts)
+    assert link_time >= STALL, "The new link didn't wait for the worker: %.3f s" % link_time
+    assert write_time >= STALL, "The write to the full queue didn't wait: %.3f s" % write_time
+    return rtts, link_time, write_time
+
+if __name__ == '__main__':
+    server = AsyncAwgServer(StalledAWG(), HOST, RPCBIND_PORT, VXI11_PORT, pipelined=True)
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+
+    # The server logs every request. Keep the results readable.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        thread.start()
+        time.sleep(0.5)
+        rtts, link_time, write_time = test_stalled_worker(server)
+    finally:
+        server.stop()
+        thread.join()
+        server.close_sockets()
+        server.stop_workers()
+        sys.stdout = stdout
+
+    rtts.sort()
+    print "While the worker was stalled for %.1f s, %d requests were answered:" % (STALL, len(rtts))
+    print "mean %.3f ms, p99 %.3f ms, max %.3f ms" % (
+        sum(rtts) / len(rtts) * 1000, rtts[int(len(rtts) * 0.99)] * 1000, rtts[-1] * 1000)
+    print "CREATE_LINK waiting for the worker: %.3f s" % link_time
+    print "DEVICE_WRITE waiting for the full queue: %.3f s" % write_time
@@ -0,0 +1,160 @@
+'''
+Created on Oct 18, 2026
+
+@summary: Measures per-line cost of parsing the commands recorded in
+awg_commands_log.txt. The log is replayed many times. The original if/elif
+parser is reproduced here as the reference. A sweep in which every frequency
+is sent once is measured too, because its lines are never found in the cache.
+'''
+
+import timeit
+from sds1004x_bode.command_parser import CommandParser
+from sds1004x_bode.awgdrivers.base_awg import BaseAWG
+from sds1004x_bode.awgdrivers import constants
+
+REPLAYS = 2000
+# Sweep with a unique frequency on each line
+SWEEP_LINES = 200000
+SWEEP_START = 10.0
+SWEEP_STOP = 10.0e6
+
+class RecordingAWG(BaseAWG):
+    '''
+    Records the settings it receives instead of sending them.
+    '''
+    SHORT_NAME = "recording"
+
+    def __init__(self):
+        self.calls = []
+
+    def set_setting(self, channel, setting, value):
+        self.calls.append((channel, setting, value))
+
+    def apply(self, channel, settings):
+        self.calls.append((channel, sorted(settings.items())))
+
+class NullAWG(BaseAWG):
+    '''
+    Ignores the settings, so only the parsing is measured.
+    '''
+    SHORT_NAME = "null"
+
+    def set_setting(self, channel, setting, value):
+        pass
+
+    def apply(self, channel, settings):
+        pass
+
+def legacy_parse_bswv(args, settings):
+    n = 0
+    while n < len(args):
+        if args[n] == "WVTP":
+            settings[constants.WAVE_TYPE] = constants.SINE
+            n += 2
+        elif args[n] == "FRQ":
+            settings[constants.FREQUENCY] = float(args[n+1])
+            n += 2
+        elif args[n] == "AMP":
+            settings[constants.AMPLITUDE] = float(args[n+1])
+            n += 2
+        elif args[n] == "OFST":
+            settings[constants.OFFSET] = float(args[n+1])
+            n += 2
+        elif args[n] == "PHSE":
+            settings[constants.PHASE] = float(args[n+1])
+            n += 2
+        else:
+            n += 1
+
+def legacy_parse_outp(args, settings):
+    n = 0
+    while n < len(args):
+        if args[n] == "ON":
+            settings[constants.OUTPUT] = True
+            n += 1
+        elif args[n] == "LOAD":
+            if args[n+1] == "HZ":
+                z = constants.HI_Z
+            else:
+                z = int(args[n+1])
+            settings[constants.LOAD] = z
+            n += 2
+        elif args[n] == "OFF":
+            settings[constants.OUTPUT] = False
+            n += 1
+        else:
+            n += 1
+
+def legacy_parse(awg, line):
+    """Parses a line by fixed offsets and if/elif chains."""
+    if line.endswith("?"):
+        return
+    channel = int(line[1])
+    commands = line[3:].split(';')
+    settings = {}
+    for command in commands:
+        token = command[0:4]
+        args = command[5:].split(',')
+        if token == "BSWV":
+            legacy_parse_bswv(args, settings)
+        elif token == "OUTP":
+            legacy_parse_outp(args, settings)
+    if len(settings) == 1:
+        setting, value = settings.popitem()
+        awg.set_setting(channel, setting, value)
+    elif settings:
+        awg.apply(channel, settings)
+
+def replay(parse, lines):
+    for line in lines:
+        parse(line)
+
+def sweep_lines():
+    ratio = (SWEEP_STOP / SWEEP_START) ** (1.0 / (SWEEP_LINES - 1))
+    return ["C1:BSWV FRQ,%.9g" % (SWEEP_START * ratio ** n) for n in xrange(SWEEP_LINES)]
+
+if __name__ == '__main__':
+    with open("awg_commands_log.txt") as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    # Both parsers must send the same settings to the AWG
+    legacy_awg = RecordingAWG()
+    compiled_awg = RecordingAWG()
+    parser = CommandParser(compiled_awg)
+    for _ in xrange(2):
+        for line in lines:
+            legacy_parse(legacy_awg, line)
+            parser.parse_scpi_command(line)
+    assert legacy_awg.calls == compiled_awg.calls
+
+    awg = NullAWG()
+    uncached = CommandParser(awg, cache_size=0)
+    cached = CommandParser(awg)
+    count = REPLAYS * len(lines)
+
+    t_legacy = timeit.timeit(lambda: replay(lambda line: legacy_parse(awg, line), lines), number=REPLAYS)
+    t_compiled = timeit.timeit(lambda: replay(uncached.parse_scpi_command, lines), number=REPLAYS)
+    t_cached = timeit.timeit(lambda: replay(cached.parse_scpi_command, lines), number=REPLAYS)
+
+    print "Per-line cost (%d lines replayed %d times):" % (len(lines), REPLAYS)
+    print "  if/elif parser:  %.2f us" % (t_legacy / count * 1e6)
+    print "  command table:   %.2f us" % (t_compiled / count * 1e6)
+    print "  cached actions:  %.2f us" % (t_cached / count * 1e6)
+    print "  speedup:         %.1fx" % (t_legacy / t_cached)
+    print "Cache: %s." % cached.get_stats()
+
+    # Unique frequencies must neither fill the cache nor slow down parsing
+    lines = sweep_lines()
+    assert len(set(lines)) == len(lines)
+    uncached = CommandParser(awg, cache_size=0)
+    cached = CommandParser(awg)
+    t_legacy = timeit.timeit(lambda: replay(lambda line: legacy_parse(awg, line), lines), number=1)
+    t_compiled = timeit.timeit(lambda: replay(uncached.parse_scpi_command, lines), number=1)
+    t_cached = timeit.timeit(lambda: replay(cached.parse_scpi_command, lines), number=1)
+    assert not cached.cache
+
+    print "Per-line cost (sweep of %d unique frequencies):" % len(lines)
+    print "  if/elif parser:  %.2f us" % (t_legacy / len(lines) * 1e6)
+    print "  command table:   %.2f us" % (t_compiled / len(lines) * 1e6)
+    print "  cached actions:  %.2f us" % (t_cached / len(lines) * 1e6)
+    print "Cache: %s." % cached.get_stats()
@@ -0,0 +1,274 @@
+'''
+Created on Oct 18, 2026
+
+@note: Tests the command_ring.py module. Checks that each AWG operation
+survives encoding to a ring record, then stalls the driver process of
+a locally running server and verifies that the server keeps answering
+the oscilloscope meanwhile, also when the ring is full.
+'''
+
+import os
+import sys
+import socket
+import struct
+import threading
+import time
+from sds1004x_bode.async_awg_server import AsyncAwgServer
+from sds1004x_bode.awg_factory import awg_factory
+from sds1004x_bode.command_ring import RingAWG, encode_record, decode_record
+from sds1004x_bode.awgdrivers.dummy_awg import DummyAWG
+from sds1004x_bode.awgdrivers import constants
+
+HOST = "127.0.0.1"
+# Unprivileged ports, so the test doesn't require root.
+RPCBIND_PORT = 10112
+VXI11_PORT = 10704
+FULL_RPCBIND_PORT = 10117
+FULL_VXI11_PORT = 10709
+
+# The driver process sleeps this long on the first frequency setting
+STALL = 1.0
+# Maximum reply time allowed while the driver is stalled
+MAX_RTT = 0.05
+REQUESTS = 50
+
+# Small ring, which the tests fill
+FULL_CAPACITY = 8
+# Time the driver process spends on each frequency setting of SlowAWG
+OPERATION_DELAY = 0.05
+
+PORTMAP_PROGRAM = 100000
+VXI11_CORE_ID = 395183
+GET_PORT = 3
+CREATE_LINK = 10
+DEVICE_WRITE = 11
+DESTROY_LINK = 23
+
+OPERATIONS = (
+    ("connect", ()),
+    ("initialize", ()),
+    ("enable_output", (2, True)),
+    ("set_frequency", (1, 12345.678)),
+    ("set_phase", (90.0,)),
+    ("set_wave_type", (1, constants.TRIANGLE)),
+    ("set_amplitue", (2, 0.5)),
+    ("set_offset", (1, -0.25)),
+    ("set_load_impedance", (1, constants.HI_Z)),
+    ("apply", (1, {constants.FREQUENCY: 1000.0, constants.AMPLITUDE: 2.0, constants.OUTPUT: False})),
+    ("run_sweep", (10.0, 1e6, 100, True, 0.01, 2)),
+    ("get_id", ()),
+    (None, ())
+    )
+
+class StalledAWG(DummyAWG):
+    '''
+    Dummy AWG whose first frequency setting blocks like a hung serial port.
+    '''
+    SHORT_NAME = "stalled"
+
+    def __init__(self, *args):
+        self.stalled = False
+
+    def set_frequency(self, channel, freq):
+        if not self.stalled:
+            self.stalled = True
+            time.sleep(STALL)
+
+class SlowAWG(DummyAWG):
+    '''
+    Dummy AWG whose frequency settings take a fixed time.
+    '''
+    SHORT_NAME = "slow"
+
+    def __init__(self, *args):
+        pass
+
+    def set_frequency(self, channel, freq):
+        time.sleep(OPERATION_DELAY)
+
+def call(xid, prog, proc, body, vers=1):
+    """
+    Generates an RPC call with record marking header.
+    """
+    msg = struct.pack(">IIIIII", xid, 0, 2, prog, vers, proc) + "\x00" * 16 + body
+    return struct.pack(">I", 0x80000000 | len(msg)) + msg
+
+def opaque(data):
+    return struct.pack(">I", len(data)) + data + "\x00" * (-len(data) % 4)
+
+def read_reply(sock):
+    header = ""
+    while len(header) < 4:
+        header += sock.recv(4 - len(header))
+    length = struct.unpack(">I", header)[0] & 0x7fffffff
+    data = ""
+    while len(data) < length:
+        data += sock.recv(length - len(data))
+    return data
+
+def request(sock, data):
+    """
+    Sends a request and returns the reply and the round trip time.
+    """
+    t0 = time.time()
+    sock.sendall(data)
+    reply = read_reply(sock)
+    return reply, time.time() - t0
+
+def test_records():
+    for method, args in OPERATIONS:
+        queued_time, decoded_method, decoded_args = decode_record(encode_record(method, args, 1.5))
+        assert queued_time == 1.5
+        assert (decoded_method, decoded_args) == (method, args), (decoded_method, decoded_args)
+    print "Records: %d operations encoded and decoded." % len(OPERATIONS)
+
+def test_get_id():
+    """
+    The ID read by the driver process is returned through the ring.
+    """
+    awg = RingAWG(DummyAWG.SHORT_NAME, "dummy")
+    awg.start()
+    try:
+        awg.set_frequency(1, 1000.0)
+        awg_id = awg.get_id()
+    finally:
+        awg.stop()
+    assert awg_id == DummyAWG().get_id(), awg_id
+    print "ID: %s read through the ring." % awg_id
+
+def test_full_ring():
+    """
+    An operation queued to a full ring waits only until the driver frees a record.
+    """
+    awg = RingAWG(SlowAWG.SHORT_NAME, "slow", capacity=FULL_CAPACITY)
+    awg.start()
+    try:
+        for n in xrange(FULL_CAPACITY):
+            awg.set_frequency(1, 100.0 + n)
+        assert awg.is_full()
+        t0 = time.time()
+        awg.set_frequency(1, 1000.0)
+        elapsed = time.time() - t0
+        awg.wait_idle()
+    finally:
+        awg.stop()
+    assert elapsed < 3 * OPERATION_DELAY, "Waited %.3f s for a free record" % elapsed
+    print "Full ring: a free record was awaited for %.3f s." % elapsed
+
+def test_full_ring_server(server, awg):
+    """
+    A write to a full ring pauses only its connection until the driver catches up.
+    """
+    lxi = socket.create_connection((HOST, FULL_VXI11_PORT))
+    reply, _ = request(lxi, call(1, VXI11_CORE_ID, CREATE_LINK, struct.pack(">III", 0, 0, 0) + opaque("inst0")))
+    link_id = struct.unpack(">I", reply[28:32])[0]
+
+    # The first command stalls the driver process, the following ones fill the ring
+    t0 = time.time()
+    for n in xrange(FULL_CAPACITY):
+        cmd = "C1:BSWV FRQ,100" if n == 0 else "C1:BSWV AMP,%d" % (n % 5 + 1)
+        request(lxi, call(2 + n, VXI11_CORE_ID, DEVICE_WRITE,
+                          struct.pack(">IIII", link_id, 0, 0, 8) + opaque(cmd)))
+    assert awg.is_full()
+    lxi.sendall(call(100, VXI11_CORE_ID, DEVICE_WRITE,
+                     struct.pack(">IIII", link_id, 0, 0, 8) + opaque("C1:BSWV AMP,1")))
+    rtts = []
+    for n in xrange(REQUESTS):
+        rpcbind = socket.create_connection((HOST, FULL_RPCBIND_PORT))
+        reply, rtt = request(rpcbind, call(n, PORTMAP_PROGRAM, GET_PORT,
+                                           struct.pack(">IIII", VXI11_CORE_ID, 1, 6, 0), vers=2))
+        rpcbind.close()
+        rtts.append(rtt)
+        assert struct.unpack(">I", reply[-4:])[0] == FULL_VXI11_PORT
+    elapsed = time.time() - t0
+    # The write to the full ring is acknowledged after the stall
+    read_reply(lxi)
+    write_time = time.time() - t0
+    request(lxi, call(1000, VXI11_CORE_ID, DESTROY_LINK, struct.pack(">I", link_id)))
+    lxi.close()
+    assert elapsed < STALL, "The requests were answered after the stall: %.3f s" % elapsed
+    assert max(rtts) < MAX_RTT, "Maximum round trip time %.3f s" % max(rtts)
+    assert write_time >= STALL, "The write to the full ring was acknowledged after %.3f s" % write_time
+    return rtts, write_time
+
+def run_server(server, test, awg):
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+    # The server logs every request. Keep the results readable.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        thread.start()
+        time.sleep(0.5)
+        return test(server, awg)
+    finally:
+        server.stop()
+        thread.join()
+        server.close_sockets()
+        awg.stop()
+        sys.stdout = stdout
+
+def print_rtts(rtts):
+    rtts.sort()
+    print "mean %.3f ms, p99 %.3f ms, max %.3f ms" % (
+        sum(rtts) / len(rtts) * 1000, rtts[int(len(rtts) * 0.99)] * 1000, rtts[-1] * 1000)
+
+def test_stalled_driver(server, awg):
+    lxi = socket.create_connection((HOST, VXI11_PORT))
+    reply, _ = request(lxi, call(1, VXI11_CORE_ID, CREATE_LINK, struct.pack(">III", 0, 0, 0) + opaque("inst0")))
+    link_id = struct.unpack(">I", reply[28:32])[0]
+
+    # The first command stalls the driver process
+    t0 = time.time()
+    request(lxi, call(2, VXI11_CORE_ID, DEVICE_WRITE,
+                      struct.pack(">IIII", link_id, 0, 0, 8) + opaque("C1:BSWV FRQ,100")))
+    rtts = []
+    for n in xrange(REQUESTS):
+        cmd = "C1:BSWV AMP,%d" % (n % 5 + 1)
+        _, rtt = request(lxi, call(3 + n, VXI11_CORE_ID, DEVICE_WRITE,
+                                   struct.pack(">IIII", link_id, 0, 0, 8) + opaque(cmd)))
+        rtts.append(rtt)
+        rpcbind = socket.create_connection((HOST, RPCBIND_PORT))
+        reply, rtt = request(rpcbind, call(n, PORTMAP_PROGRAM, GET_PORT,
+                                           struct.pack(">IIII", VXI11_CORE_ID, 1, 6, 0), vers=2))
+        rpcbind.close()
+        rtts.append(rtt)
+        assert struct.unpack(">I", reply[-4:])[0] == VXI11_PORT
+    elapsed = time.time() - t0
+    request(lxi, call(1000, VXI11_CORE_ID, DESTROY_LINK, struct.pack(">I", link_id)))
+    lxi.close()
+    assert elapsed < STALL, "The requests were answered after the stall: %.3f s" % elapsed
+    assert max(rtts) < MAX_RTT, "Maximum round trip time %.3f s" % max(rtts)
+
+    # A new link waits until the driver executes the queued commands
+    lxi = socket.create_connection((HOST, VXI11_PORT))
+    _, rtt = request(lxi, call(2000, VXI11_CORE_ID, CREATE_LINK, struct.pack(">III", 0, 0, 0) + opaque("inst0")))
+    lxi.close()
+    assert time.time() - t0 >= STALL
+    assert awg.is_idle()
+    return rtts, rtt
+
+if __name__ == '__main__':
+    test_records()
+
+    test_get_id()
+    awg_factory.add_awg(SlowAWG.SHORT_NAME, SlowAWG)
+    test_full_ring()
+
+    awg_factory.add_awg(StalledAWG.SHORT_NAME, StalledAWG)
+    awg = RingAWG(StalledAWG.SHORT_NAME, "stall")
+    awg.start()
+    server = AsyncAwgServer(awg, HOST, RPCBIND_PORT, VXI11_PORT)
+    rtts, link_rtt = run_server(server, test_stalled_driver, awg)
+    print "While the driver was stalled for %.1f s, %d requests were answered:" % (STALL, len(rtts))
+    print_rtts(rtts)
+    print "CREATE_LINK waiting for the driver: %.3f s" % link_rtt
+    print "Command ring: %s." % awg.get_stats()
+
+    full_awg = RingAWG(StalledAWG.SHORT_NAME, "stall", capacity=FULL_CAPACITY)
+    full_awg.start()
+    server = AsyncAwgServer(full_awg, HOST, FULL_RPCBIND_PORT, FULL_VXI11_PORT)
+    rtts, write_time = run_server(server, test_full_ring_server, full_awg)
+    print "While the ring of %d records was full, %d requests were answered:" % (FULL_CAPACITY, len(rtts))
+    print_rtts(rtts)
+    print "DEVICE_WRITE waiting for a free record: %.3f s" % write_time
@@ -0,0 +1,101 @@
+'''
+Created on Oct 18, 2026
+
+@summary: Compares round-trip times of RPCBIND GETPORT requests sent over
+TCP and over UDP to a locally running AWG server. The client does the same
+work as the oscilloscope before each command: a new TCP connection per
+request or a single datagram.
+'''
+
+import os
+import sys
+import socket
+import struct
+import threading
+import time
+from sds1004x_bode.async_awg_server import AsyncAwgServer
+from sds1004x_bode.awgdrivers.dummy_awg import DummyAWG
+
+HOST = "127.0.0.1"
+# Unprivileged ports, so the benchmark doesn't require root.
+RPCBIND_PORT = 10111
+VXI11_PORT = 10703
+
+REQUESTS = 2000
+
+PORTMAP_PROGRAM = 100000
+PORTMAP_VERSION = 2
+VXI11_CORE_ID = 395183
+GET_PORT = 3
+IPPROTO_TCP = 6
+
+def getport_call(xid):
+    """
+    Generates RPCBIND GETPORT call without the record marking header.
+    """
+    # XID, Call (0), RPC version 2, program, version, procedure
+    call = struct.pack(">IIIIII", xid, 0, 2, PORTMAP_PROGRAM, PORTMAP_VERSION, GET_PORT)
+    # Credentials and verifier: AUTH_NULL
+    call += "\x00" * 16
+    # Program, version, protocol, port
+    call += struct.pack(">IIII", VXI11_CORE_ID, 1, IPPROTO_TCP, 0)
+    return call
+
+def getport_tcp(xid):
+    call = getport_call(xid)
+    sock = socket.create_connection((HOST, RPCBIND_PORT))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(struct.pack(">I", 0x80000000 | len(call)) + call)
+    reply = ""
+    while len(reply) < 32:
+        data = sock.recv(64)
+        if not data:
+            break
+        reply += data
+    sock.close()
+    return struct.unpack(">I", reply[28:32])[0]
+
+def getport_udp(sock, xid):
+    sock.sendto(getport_call(xid), (HOST, RPCBIND_PORT))
+    reply = sock.recv(64)
+    return struct.unpack(">I", reply[24:28])[0]
+
+def measure(func, *args):
+    rtts = []
+    for xid in xrange(REQUESTS):
+        t0 = time.time()
+        port = func(*(args + (xid,)))
+        rtts.append(time.time() - t0)
+        assert port == VXI11_PORT
+    rtts.sort()
+    return rtts
+
+def print_stats(name, rtts):
+    mean = sum(rtts) / len(rtts)
+    print "%s: mean %.1f us, median %.1f us, p99 %.1f us" % (
+        name, mean * 1e6, rtts[len(rtts) // 2] * 1e6, rtts[int(len(rtts) * 0.99)] * 1e6)
+
+if __name__ == '__main__':
+    server = AsyncAwgServer(DummyAWG(), HOST, RPCBIND_PORT, VXI11_PORT)
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+
+    # The server logs every request. Keep the results readable.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        thread.start()
+        time.sleep(0.5)
+        tcp_rtts = measure(getport_tcp)
+        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_sock.settimeout(1.0)
+        udp_rtts = measure(getport_udp, udp_sock)
+    finally:
+        server.stop()
+        thread.join()
+        server.close_sockets()
+        sys.stdout = stdout
+
+    print "GETPORT round trip over %d requests:" % REQUESTS
+    print_stats("TCP", tcp_rtts)
+    print_stats("UDP", udp_rtts)
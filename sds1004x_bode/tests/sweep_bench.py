@@ -0,0 +1,183 @@
+'''
+Created on Oct 18, 2026
+
+@summary: End-to-end benchmark of the whole server path. Replays an
+oscilloscope session with the connection cycle of the oscilloscope
+(GETPORT, CREATE_LINK, DEVICE_WRITE, DEVICE_READ, DESTROY_LINK) against
+an AWG server running in a separate process, so the client doesn't
+compete with the server for the interpreter lock. The server controls
+the dummy AWG or a virtual AWG on a pseudo-terminal through the unmodified driver.
+
+Usage:
+    python sweep_bench.py [options]
+
+Options:
+    --awg=<name>        dummy (default), jds6600, fy6600 or bk4075.
+                        The last three are emulated by awg_simulator.py.
+    --latency=<sec>     command latency of the virtual AWG.
+    --session=<file>    commands to replay. Default is awg_commands_log.txt.
+    --sweeps=<n>        number of times the session is replayed. Default is 5.
+    --sequential        runs AwgServer instead of AsyncAwgServer.
+    --pipelined         replies to the oscilloscope before the AWG executes the command.
+    --speculative       prepares the commands of the next expected sweep frequency.
+    --json              prints the results as JSON instead of text.
+'''
+
+import os
+import sys
+import json
+import multiprocessing
+import threading
+import time
+from sds1004x_bode import phase_timing
+from sds1004x_bode.awg_server import AwgServer
+from sds1004x_bode.async_awg_server import AsyncAwgServer
+from sds1004x_bode.awg_factory import awg_factory
+from sds1004x_bode.awg_simulator import simulators
+from sds1004x_bode.awgdrivers.dummy_awg import DummyAWG
+from sds1004x_bode.cli_options import parse_options
+from sds1004x_bode.vxi11_client import Vxi11Client, read_session, latency_summary
+
+HOST = "127.0.0.1"
+# Unprivileged ports, so the benchmark doesn't require root.
+RPCBIND_PORT = 10113
+VXI11_PORT = 10705
+
+SESSION_FILE = "awg_commands_log.txt"
+SWEEPS = 5
+
+# Options
+AWG_OPTION = "--awg"
+LATENCY_OPTION = "--latency"
+SESSION_OPTION = "--session"
+SWEEPS_OPTION = "--sweeps"
+SEQUENTIAL_OPTION = "--sequential"
+PIPELINED_OPTION = "--pipelined"
+SPECULATIVE_OPTION = "--speculative"
+JSON_OPTION = "--json"
+
+def create_awg(name, latency):
+    """
+    Returns the AWG and the virtual AWG it is connected to or None.
+    """
+    if name == DummyAWG.SHORT_NAME:
+        return DummyAWG(), None
+    sim = simulators[name](latency=latency)
+    sim.start()
+    awg = awg_factory.get_class_by_name(name)(sim.port)
+    awg.initialize()
+    return awg, sim
+
+def replay(client, commands, sweeps):
+    """
+    Replays the session.
+    @return: wall time of each sweep, the latency of each command and
+            the total duration of each phase of the connection cycle.
+    """
+    sweep_times = []
+    latencies = []
+    phases = dict.fromkeys(phase_timing.PHASES, 0.0)
+    for _ in xrange(sweeps):
+        start = time.time()
+        for cmd in commands:
+            t0 = time.time()
+            client.send_command(cmd)
+            latencies.append(time.time() - t0)
+            for phase, duration in client.phases.iteritems():
+                phases[phase] += duration
+        sweep_times.append(time.time() - start)
+    return sweep_times, latencies, phases
+
+def run_server(conn, options):
+    """
+    Main function of the server process. Runs the server until the benchmark
+    sends the stop request, then sends back the number of commands executed
+    by the virtual AWG or None.
+    """
+    # The server logs every request. Keep the results readable.
+    sys.stdout = sys.stderr = open(os.devnull, "w")
+    latency = options.get(LATENCY_OPTION)
+    awg, sim = create_awg(options.get(AWG_OPTION) or DummyAWG.SHORT_NAME,
+                          float(latency) if latency else None)
+    sequential = SEQUENTIAL_OPTION in options
+    server_class = AwgServer if sequential else AsyncAwgServer
+    server = server_class(awg, HOST, RPCBIND_PORT, VXI11_PORT, pipelined=PIPELINED_OPTION in options,
+                          speculative=SPECULATIVE_OPTION in options)
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+    thread.start()
+    time.sleep(0.5)
+    conn.send(server_class.__name__)
+    conn.recv()
+    # The sequential server can't be stopped. Its thread ends with the process.
+    if not sequential:
+        server.stop()
+        thread.join()
+        server.close_sockets()
+    server.stop_workers()
+    awg_commands = None
+    if sim is not None:
+        awg.disconnect()
+        sim.stop()
+        awg_commands = len(sim.get_commands())
+    conn.send(awg_commands)
+
+def run(options):
+    awg_name = options.get(AWG_OPTION) or DummyAWG.SHORT_NAME
+    commands = read_session(options.get(SESSION_OPTION) or SESSION_FILE)
+    sweeps = int(options.get(SWEEPS_OPTION) or SWEEPS)
+
+    conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=run_server, args=(child_conn, options))
+    process.start()
+    try:
+        server_name = conn.recv()
+        client = Vxi11Client(HOST, RPCBIND_PORT)
+        sweep_times, latencies, phases = replay(client, commands, sweeps)
+    finally:
+        conn.send(None)
+        awg_commands = conn.recv()
+        process.join()
+
+    wall_time = sum(sweep_times)
+    results = {
+        "server": server_name,
+        "awg": awg_name,
+        "pipelined": PIPELINED_OPTION in options,
+        "speculative": SPECULATIVE_OPTION in options,
+        "commands": len(commands),
+        "sweeps": sweeps,
+        "sweep_time": {
+            "mean": wall_time / sweeps,
+            "min": min(sweep_times),
+            "max": max(sweep_times)
+            },
+        "latency_ms": latency_summary(latencies),
+        "phases_ms": dict((phase, phases[phase] / len(latencies) * 1000) for phase in phase_timing.PHASES),
+        "connections_per_s": client.connections / wall_time,
+        "commands_per_s": len(latencies) / wall_time
+        }
+    if awg_commands is not None:
+        results["awg_commands"] = awg_commands
+    return results
+
+def print_results(results):
+    print "%s, %s AWG, %d commands x %d sweeps" % (
+        results["server"], results["awg"], results["commands"], results["sweeps"])
+    sweep_time = results["sweep_time"]
+    print "Sweep time: mean %.3f s, min %.3f s, max %.3f s" % (
+        sweep_time["mean"], sweep_time["min"], sweep_time["max"])
+    latency = results["latency_ms"]
+    print "Command latency: mean %.3f ms, p50 %.3f ms, p90 %.3f ms, p99 %.3f ms, max %.3f ms" % (
+        latency["mean"], latency["p50"], latency["p90"], latency["p99"], latency["max"])
+    print "Phases: %s" % ", ".join("%s %.3f ms" % (phase, results["phases_ms"][phase])
+                                   for phase in phase_timing.PHASES)
+    print "%.1f connections/s, %.1f commands/s" % (results["connections_per_s"], results["commands_per_s"])
+
+if __name__ == '__main__':
+    options = parse_options(sys.argv[1:])
+    results = run(options)
+    if JSON_OPTION in options:
+        print json.dumps(results, sort_keys=True)
+    else:
+        print_results(results)
@@ -0,0 +1,116 @@
+'''
+Created on Oct 18, 2026
+
+@note: Tests the tracing.py module. Sends oscilloscope commands to a locally
+running server which controls a virtual JDS6600 through the unmodified driver,
+then checks that the trace contains the spans of the whole request path and
+that the serial port spans lie within the SCPI command which caused them.
+'''
+
+import os
+import sys
+import json
+import tempfile
+import threading
+import time
+from sds1004x_bode import tracing
+from sds1004x_bode.async_awg_server import AsyncAwgServer
+from sds1004x_bode.awg_factory import awg_factory
+from sds1004x_bode.awg_simulator import simulators
+from sds1004x_bode.vxi11_client import Vxi11Client
+
+HOST = "127.0.0.1"
+# Unprivileged ports, so the test doesn't require root.
+RPCBIND_PORT = 10116
+VXI11_PORT = 10708
+
+AWG = "jds6600"
+COMMANDS = ["IDN-SGLT-PRI?", "C1:BSWV WVTP,SINE", "C1:BSWV?"] + \
+    ["C1:BSWV FRQ,%d" % freq for freq in (10, 100, 1000, 10000)]
+SPANS = (tracing.ACCEPT, tracing.RECV, tracing.SEND, tracing.HANDLE_LXI, tracing.PARSE_LXI,
+         tracing.PARSE_SCPI, tracing.SERIAL_WRITE, tracing.SERIAL_WAIT)
+
+def run_session(tracer, pipelined):
+    sim = simulators[AWG]()
+    sim.start()
+    awg = awg_factory.get_class_by_name(AWG)(sim.port)
+    awg.initialize()
+    awg.transport.tracer = tracer
+    server = AsyncAwgServer(awg, HOST, RPCBIND_PORT, VXI11_PORT, pipelined=pipelined, tracer=tracer)
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+    thread.start()
+    time.sleep(0.5)
+    try:
+        client = Vxi11Client(HOST, RPCBIND_PORT)
+        for cmd in COMMANDS:
+            client.send_command(cmd)
+    finally:
+        server.stop()
+        thread.join()
+        server.close_sockets()
+        server.stop_workers()
+        server.print_worker_stats()
+        awg.disconnect()
+        sim.stop()
+        tracer.close()
+
+def read_trace(path, json_lines):
+    with open(path) as f:
+        if json_lines:
+            return [json.loads(line) for line in f]
+        return json.load(f)
+
+def contains(outer, inner):
+    return outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+def test_trace(path, json_lines, pipelined):
+    tracer = tracing.Tracer(path, json_lines)
+    run_session(tracer, pipelined)
+    events = read_trace(path, tracer.json_lines)
+    spans = [event for event in events if event["ph"] == "X"]
+    names = set(span["name"] for span in spans)
+    for name in SPANS:
+        assert name in names, (name, names)
+    for span in spans:
+        assert span["dur"] >= 0 and span["cat"] == tracing.CATEGORIES[span["name"]], span
+    threads = dict((event["tid"], event["args"]["name"]) for event in events if event["ph"] == "M")
+    assert set(span["tid"] for span in spans) == set(threads)
+
+    scpi = [span for span in spans if span["name"] == tracing.PARSE_SCPI]
+    assert [span["args"]["command"] for span in scpi] == COMMANDS
+    writes = [span for span in spans if span["name"] == tracing.SERIAL_WRITE]
+    if not pipelined:
+        # The driver runs within the SCPI command span of the server thread
+        for write in writes:
+            assert any(contains(span, write) for span in scpi), write
+    else:
+        # The driver runs in the worker thread
+        assert all(threads[write["tid"]] != threads[scpi[0]["tid"]] for write in writes)
+    return spans
+
+def print_summary(title, spans):
+    totals = {}
+    for span in spans:
+        count, total = totals.get(span["name"], (0, 0.0))
+        totals[span["name"]] = (count + 1, total + span["dur"])
+    print "%s: %s." % (title, ", ".join("%s %d x %.3f ms" % (name, totals[name][0],
+                                                           totals[name][1] / totals[name][0] / 1000)
+                                        for name in SPANS))
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    results = []
+    # The server logs every request. Keep the results readable.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        for name, json_lines, pipelined in (("trace.json", False, False), ("trace.jsonl", None, True)):
+            path = os.path.join(directory, name)
+            results.append((name, test_trace(path, json_lines, pipelined)))
+            os.remove(path)
+    finally:
+        sys.stdout = stdout
+    os.rmdir(directory)
+    for name, spans in results:
+        print_summary(name, spans)
@@ -0,0 +1,141 @@
+'''
+Created on Oct 18, 2026
+
+@note: Tests the wire_capture.py module and replay_capture.py. Records an
+oscilloscope session sent to a locally running server, checks the records
+of the capture file and replays it against a second server, as fast as
+possible and at the recorded speed. The replies must match the recorded ones.
+'''
+
+import os
+import sys
+import socket
+import struct
+import tempfile
+import threading
+import time
+from sds1004x_bode import wire_capture
+from sds1004x_bode.async_awg_server import AsyncAwgServer
+from sds1004x_bode.awgdrivers.dummy_awg import DummyAWG
+from sds1004x_bode.replay_capture import CaptureReplay, REQUESTS, REPLIES, MISMATCHES
+from sds1004x_bode.vxi11_client import Vxi11Client, read_session, VXI11_VERSION, IPPROTO_TCP
+
+HOST = "127.0.0.1"
+# Unprivileged ports, so the test doesn't require root. The replay server
+# uses another VXI-11 port, which the replay learns from its GETPORT replies.
+RPCBIND_PORT = 10114
+VXI11_PORT = 10706
+REPLAY_RPCBIND_PORT = 10115
+REPLAY_VXI11_PORT = 10707
+
+SESSION_FILE = "awg_commands_log.txt"
+COMMANDS = 40
+
+PORTMAP_PROGRAM = 100000
+GET_PORT = 3
+
+def getport_datagram(xid):
+    """
+    Generates RPCBIND GETPORT request sent over UDP.
+    """
+    return struct.pack(">IIIIII", xid, 0, 2, PORTMAP_PROGRAM, 2, GET_PORT) + "\x00" * 16 + \
+        struct.pack(">IIII", 395183, VXI11_VERSION, IPPROTO_TCP, 0)
+
+def run_server(server, target):
+    """
+    Runs the server while the target function runs.
+    """
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+    thread.start()
+    time.sleep(0.5)
+    try:
+        return target()
+    finally:
+        server.stop()
+        thread.join()
+        server.close_sockets()
+
+def record_session(path, commands):
+    capture = wire_capture.WireCapture(path)
+    server = AsyncAwgServer(DummyAWG(), HOST, RPCBIND_PORT, VXI11_PORT, capture=capture)
+
+    def send_commands():
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.settimeout(1.0)
+        udp.sendto(getport_datagram(1), (HOST, RPCBIND_PORT))
+        assert struct.unpack(">I", udp.recv(1024)[-4:])[0] == VXI11_PORT
+        udp.close()
+        client = Vxi11Client(HOST, RPCBIND_PORT)
+        for cmd in commands:
+            client.send_command(cmd)
+
+    try:
+        run_server(server, send_commands)
+    finally:
+        capture.close()
+
+def test_capture(path, commands):
+    _, records = wire_capture.read_capture(path)
+    queries = len([cmd for cmd in commands if cmd.endswith("?")])
+    events = [(record.service, record.event) for record in records]
+    # UDP GETPORT, then a RPCBIND and a VXI-11 connection per command
+    assert events[:2] == [(wire_capture.RPCBIND_UDP, wire_capture.REQUEST),
+                          (wire_capture.RPCBIND_UDP, wire_capture.REPLY)], events[:2]
+    assert events.count((wire_capture.RPCBIND_TCP, wire_capture.OPEN)) == len(commands)
+    assert events.count((wire_capture.VXI11, wire_capture.OPEN)) == len(commands)
+    assert events.count((wire_capture.VXI11, wire_capture.CLOSE)) == len(commands)
+    # CREATE_LINK, DEVICE_WRITE, DEVICE_READ of queries and DESTROY_LINK
+    vxi11_requests = 3 * len(commands) + queries
+    assert events.count((wire_capture.VXI11, wire_capture.REQUEST)) == vxi11_requests
+    assert events.count((wire_capture.VXI11, wire_capture.REPLY)) == vxi11_requests
+    times = [record.time for record in records]
+    assert times == sorted(times)
+
+    # A truncated last record is dropped
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path + ".part", "wb") as f:
+        f.write(data[:-1])
+    _, truncated = wire_capture.read_capture(path + ".part")
+    os.remove(path + ".part")
+    assert truncated == records[:-1]
+    return records
+
+def replay_session(records, fast):
+    server = AsyncAwgServer(DummyAWG(), HOST, REPLAY_RPCBIND_PORT, REPLAY_VXI11_PORT)
+
+    def replay():
+        # Shift the link IDs of the server
+        Vxi11Client(HOST, REPLAY_RPCBIND_PORT).send_command("C1:BSWV FRQ,1000")
+        return CaptureReplay(records, HOST, REPLAY_RPCBIND_PORT, fast=fast).run()
+
+    results = run_server(server, replay)
+    assert results[REQUESTS] == len([r for r in records if r.event == wire_capture.REQUEST]), results
+    assert results[REPLIES] == results[REQUESTS], results
+    assert results[MISMATCHES] == 0, results
+    return results
+
+if __name__ == '__main__':
+    commands = read_session(SESSION_FILE)[:COMMANDS]
+    path = os.path.join(tempfile.mkdtemp(), "session.cap")
+
+    # The server logs every request. Keep the results readable.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        record_session(path, commands)
+        records = test_capture(path, commands)
+        fast = replay_session(records, True)
+        recorded = replay_session(records, False)
+    finally:
+        sys.stdout = stdout
+
+    print "Capture: %d records, %d bytes." % (len(records), os.path.getsize(path))
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    for results in (fast, recorded):
+        print "Replay%s: %d requests in %.3f s (recorded %.3f s), p99 latency %.3f ms." % (
+            " as fast as possible" if results["fast"] else " at recorded speed", results[REQUESTS],
+            results["duration"], results["recorded_duration"], results["latency_ms"]["p99"])
+    assert recorded["duration"] >= recorded["recorded_duration"]
@@ -0,0 +1,104 @@
+'''
+Created on Oct 18, 2026
+
+@summary: Measures per-packet cost of decoding VXI-11 requests and encoding
+the replies. The original string based implementation is reproduced here
+as the reference.
+'''
+
+import timeit
+from sds1004x_bode import xdr_codec
+from sds1004x_bode.awg_server import AwgServer, AWG_ID_STRING
+from sds1004x_bode.awgdrivers.dummy_awg import DummyAWG
+
+ITERATIONS = 100000
+
+# DEVICE_WRITE request carrying "C1:BSWV FRQ,10.8890427"
+SCPI_COMMAND = "C1:BSWV FRQ,10.8890427"
+DEVICE_WRITE_REQUEST = (
+    xdr_codec.pack_uint(0x80000000 | (0x3C + 24))
+    + "\x12\x34\x56\x78" + "\x00\x00\x00\x00" + "\x00\x00\x00\x02"
+    + xdr_codec.pack_uint(395183) + "\x00\x00\x00\x01" + xdr_codec.pack_uint(11)
+    + "\x00" * 16
+    + "\x00" * 16
+    + xdr_codec.pack_uint(len(SCPI_COMMAND)) + SCPI_COMMAND + "\x00\x00")
+
+def legacy_bytes_to_uint(bytes_seq):
+    num = ord(bytes_seq[0])
+    num = num * 0x100 + ord(bytes_seq[1])
+    num = num * 0x100 + ord(bytes_seq[2])
+    num = num * 0x100 + ord(bytes_seq[3])
+    return num
+
+def legacy_uint_to_bytes(num):
+    byte3 = (num / 0x1000000) & 0xFF
+    byte2 = (num / 0x10000) & 0xFF
+    byte1 = (num / 0x100) & 0xFF
+    byte0 = num & 0xFF
+    return bytearray((byte3, byte2, byte1, byte0))
+
+def legacy_rpc_header(xid):
+    hdr = ""
+    hdr += xid
+    hdr += "\x00\x00\x00\x01"
+    hdr += "\x00\x00\x00\x00"
+    hdr += "\x00\x00\x00\x00"
+    hdr += "\x00\x00\x00\x00"
+    hdr += "\x00\x00\x00\x00"
+    return hdr
+
+def legacy_resp_data(rx_buf, resp):
+    rpc_hdr = legacy_rpc_header(rx_buf[0x04:0x08])
+    size_hdr = legacy_uint_to_bytes((len(rpc_hdr) + len(resp)) | 0x80000000)
+    return size_hdr + rpc_hdr + resp
+
+def legacy_create_link_body():
+    resp = "\x00\x00\x00\x00"
+    resp += "\x00\x00\x00\x00"
+    resp += "\x00\x00\x00\x00"
+    resp += "\x00\x80\x00\x00"
+    return resp
+
+def legacy_idn_body(id_string):
+    resp = "\x00\x00\x00\x00"
+    resp += "\x00\x00\x00\x04"
+    resp += legacy_uint_to_bytes(len(id_string) + 3)
+    resp += id_string
+    resp += "\x0A\x00\x00"
+    return resp
+
+def legacy_packet(rx_buf):
+    """Decodes a DEVICE_WRITE request and generates CREATE_LINK and IDN replies."""
+    legacy_bytes_to_uint(rx_buf[0x10:0x14])
+    legacy_bytes_to_uint(rx_buf[0x18:0x1c])
+    cmd_length = legacy_bytes_to_uint(rx_buf[0x3C:0x40])
+    str(rx_buf[0x40:0x40 + cmd_length]).strip()
+    legacy_resp_data(rx_buf, legacy_create_link_body())
+    return legacy_resp_data(rx_buf, legacy_idn_body(AWG_ID_STRING))
+
+def codec_packet(server, rx_buf):
+    """Same work done with the codec and the prebuilt reply templates."""
+    server.parse_lxi_request(rx_buf)
+    server.generate_resp_data(rx_buf, server.generate_lxi_create_link_response(0))
+    return server.idn_reply.render_for(rx_buf)
+
+if __name__ == '__main__':
+    server = AwgServer(DummyAWG())
+
+    # Both implementations must generate the same bytes
+    assert str(legacy_packet(DEVICE_WRITE_REQUEST)) == codec_packet(server, DEVICE_WRITE_REQUEST)
+    assert str(legacy_resp_data(DEVICE_WRITE_REQUEST, legacy_create_link_body())) == \
+        server.generate_resp_data(DEVICE_WRITE_REQUEST, server.generate_lxi_create_link_response(0))
+
+    rx_view = memoryview(bytearray(DEVICE_WRITE_REQUEST))
+
+    t_legacy = timeit.timeit(lambda: legacy_packet(DEVICE_WRITE_REQUEST), number=ITERATIONS)
+    t_codec = timeit.timeit(lambda: codec_packet(server, rx_view), number=ITERATIONS)
+    t_write = timeit.timeit(lambda: xdr_codec.write_reply(xdr_codec.get_xid(rx_view), 24),
+                            number=ITERATIONS)
+
+    print "Per-packet cost (%d iterations):" % ITERATIONS
+    print "  string based:    %.2f us" % (t_legacy / ITERATIONS * 1e6)
+    print "  struct codec:    %.2f us" % (t_codec / ITERATIONS * 1e6)
+    print "  speedup:         %.1fx" % (t_legacy / t_codec)
+    print "DEVICE_WRITE reply: %.2f us" % (t_write / ITERATIONS * 1e6)
@@ -0,0 +1,125 @@
+'''
+Created on Oct 18, 2026
+
+Records trace spans of the request path, from receiving a packet to the
+completion of the serial port I/O, so a sweep can be opened in a trace viewer
+(chrome://tracing or Perfetto) and the slowest stage seen at a glance.
+
+The spans are written as complete events of the Chrome trace event format,
+either as a JSON array or, for file names ending with .jsonl, as JSON lines.
+Tracing is disabled by passing no tracer. The traced code then only checks
+that its tracer is None.
+'''
+
+import os
+import json
+import threading
+from phase_timing import monotonic
+
+# Spans
+## Accepting a TCP connection
+ACCEPT = "accept"
+## Receiving a request: TCP record or UDP datagram
+RECV = "recv"
+## Sending a reply
+SEND = "send"
+## Processing a VXI-11 request, from parsing it to the reply
+HANDLE_LXI = "handle_lxi_request"
+PARSE_LXI = "parse_lxi_request"
+PARSE_SCPI = "parse_scpi_command"
+## Serial port spans of SerialTransport, which can't import this module
+SERIAL_WRITE = "serial_write"
+SERIAL_WAIT = "serial_wait"
+
+# Span name -> category shown by the trace viewer
+CATEGORIES = {
+    ACCEPT: "net",
+    RECV: "net",
+    SEND: "net",
+    HANDLE_LXI: "vxi11",
+    PARSE_LXI: "vxi11",
+    PARSE_SCPI: "scpi",
+    SERIAL_WRITE: "serial",
+    SERIAL_WAIT: "serial"
+    }
+DEFAULT_CATEGORY = "awg"
+
+JSON_LINES_EXTENSION = ".jsonl"
+
+class Tracer(object):
+    '''
+    Writes trace spans to a file. Spans may be recorded by any thread.
+    '''
+
+    def __init__(self, path, json_lines=None):
+        """
+        @param json_lines: write JSON lines instead of a JSON array. If None,
+                JSON lines are written if the file name ends with .jsonl.
+        """
+        if json_lines is None:
+            json_lines = path.endswith(JSON_LINES_EXTENSION)
+        self.path = path
+        self.json_lines = json_lines
+        self.file = open(path, "w")
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.start = monotonic()
+        # Threads whose names were written
+        self.threads = set()
+        self.spans = 0
+        self.separator = ""
+        if not json_lines:
+            # The closing bracket may be missing if the server was killed.
+            # Trace viewers accept such files.
+            self.file.write("[")
+
+    def now(self):
+        """
+        Returns the start time of a span.
+        """
+        return monotonic()
+
+    def span(self, name, start, args=None):
+        """
+        Records a span which began at start and ends now.
+        @param start: time returned by now().
+        @param args: dictionary of values shown with the span or None.
+        """
+        end = monotonic()
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": CATEGORIES.get(name, DEFAULT_CATEGORY),
+            "ph": "X",
+            "ts": (start - self.start) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self.pid,
+            "tid": thread.ident
+            }
+        if args:
+            event["args"] = args
+        with self.lock:
+            if self.file.closed:
+                return
+            if thread.ident not in self.threads:
+                self.threads.add(thread.ident)
+                self.write({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident,
+                            "args": {"name": thread.name}})
+            self.write(event)
+            self.spans += 1
+
+    def write(self, event):
+        if self.json_lines:
+            self.file.write(json.dumps(event) + "\n")
+        else:
+            self.file.write(self.separator + "\n" + json.dumps(event))
+            self.separator = ","
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            if not self.json_lines:
+                self.file.write("\n]\n")
+            self.file.close()
+        print "Trace: %d spans written to %s." % (self.spans, self.path)
@@ -0,0 +1,200 @@
+'''
+Created on Oct 18, 2026
+
+VXI-11 client which sends commands to the AWG server the way the
+oscilloscope does. Used by the benchmarks and the load generator.
+'''
+
+import socket
+import time
+import phase_timing
+from awg_server import RPCBIND_PORT, VXI11_CORE_ID, GET_PORT, CREATE_LINK, DEVICE_WRITE, \
+    DEVICE_READ, DESTROY_LINK
+from rpc_record import RecordReader
+from xdr_codec import UINT, LAST_FRAGMENT, pack_opaque, unpack_uint
+
+# RPC program numbers and versions
+PORTMAP_PROGRAM = 100000
+PORTMAP_VERSION = 2
+VXI11_VERSION = 1
+IPPROTO_TCP = 6
+
+# Device name sent in CREATE_LINK by the oscilloscope
+DEFAULT_DEVICE = "inst0"
+# Maximum time to wait for a reply of the server
+TIMEOUT = 5.0
+
+# DEVICE_WRITE flags: the data ends the message
+END_FLAG = 8
+# Maximum reply size requested by DEVICE_READ
+READ_SIZE = 255
+# DEVICE_READ termination character
+TERM_CHAR = 0x0A
+
+# Offsets in the replies, including the record marking header
+## Accept state of the RPC reply
+ACCEPT_STATE_OFFSET = 0x18
+## First field of the reply body: port number or VXI-11 error code
+BODY_OFFSET = 0x1C
+## Link ID in CREATE_LINK reply
+LINK_ID_OFFSET = 0x20
+## Reply data of DEVICE_READ
+READ_DATA_OFFSET = 0x24
+
+class RpcError(Exception):
+    pass
+
+class ConnectTimeoutError(RpcError):
+    pass
+
+def read_session(path):
+    """
+    Reads the commands of an oscilloscope session, one command per line,
+    e.g. tests/awg_commands_log.txt.
+    """
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def percentile(values, fraction):
+    """
+    Returns the value below which the given fraction of the sorted values lies.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def latency_summary(latencies):
+    """
+    Returns mean, median, 90th, 99th, 99.9th percentile and maximum
+    of latencies in milliseconds.
+    """
+    values = sorted(latencies)
+    if not values:
+        return {}
+    return {
+        "mean": sum(values) / len(values) * 1000,
+        "p50": percentile(values, 0.5) * 1000,
+        "p90": percentile(values, 0.9) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "p999": percentile(values, 0.999) * 1000,
+        "max": values[-1] * 1000
+        }
+
+class Vxi11Client(object):
+    '''
+    Runs the connection cycle of the oscilloscope for each command:
+    RPCBIND GETPORT over a new TCP connection, a new VXI-11 connection,
+    CREATE_LINK, DEVICE_WRITE, DEVICE_READ for queries and DESTROY_LINK.
+    The duration of each phase of the last cycle is kept in phases.
+    '''
+
+    def __init__(self, host, rpcbind_port=RPCBIND_PORT, device=DEFAULT_DEVICE, timeout=TIMEOUT):
+        self.host = host
+        self.rpcbind_port = rpcbind_port
+        self.device = device
+        self.timeout = timeout
+        self.xid = 0
+        self.reader = RecordReader()
+        self.phases = dict.fromkeys(phase_timing.PHASES, 0.0)
+        # Number of TCP connections opened
+        self.connections = 0
+
+    def connect(self, port):
+        """
+        @raise ConnectTimeoutError: if the server didn't accept the connection in time,
+                e.g. because its listen queue is full.
+        """
+        try:
+            sock = socket.create_connection((self.host, port), self.timeout)
+        except socket.timeout:
+            raise ConnectTimeoutError("Connection to port %d timed out." % port)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections += 1
+        self.reader = RecordReader()
+        return sock
+
+    def call(self, sock, prog, vers, proc, body):
+        """
+        Sends an RPC call and returns the reply record.
+        @raise RpcError: if the server closed the connection or rejected the call.
+        """
+        self.xid += 1
+        # XID, Call (0), RPC version 2, program, version, procedure,
+        # credentials and verifier: AUTH_NULL
+        msg = UINT.pack(self.xid) + "\x00\x00\x00\x00\x00\x00\x00\x02" + \
+            UINT.pack(prog) + UINT.pack(vers) + UINT.pack(proc) + "\x00" * 16 + body
+        sock.sendall(UINT.pack(LAST_FRAGMENT | len(msg)) + msg)
+        reply = self.reader.read_record(sock)
+        if reply is None:
+            raise RpcError("Connection closed by the server.")
+        reply = reply.tobytes()
+        if len(reply) < BODY_OFFSET or unpack_uint(reply, ACCEPT_STATE_OFFSET) != 0:
+            raise RpcError("RPC call %d rejected." % proc)
+        return reply
+
+    def vxi11_call(self, sock, proc, body):
+        """
+        Sends a VXI-11 call and checks the error code of the reply.
+        """
+        reply = self.call(sock, VXI11_CORE_ID, VXI11_VERSION, proc, body)
+        error = unpack_uint(reply, BODY_OFFSET)
+        if error != 0:
+            raise RpcError("VXI-11 procedure %d failed with error %d." % (proc, error))
+        return reply
+
+    def getport(self):
+        """
+        Asks RPCBIND for the VXI-11 port over a new TCP connection.
+        """
+        sock = self.connect(self.rpcbind_port)
+        try:
+            body = UINT.pack(VXI11_CORE_ID) + UINT.pack(VXI11_VERSION) + UINT.pack(IPPROTO_TCP) + UINT.pack(0)
+            reply = self.call(sock, PORTMAP_PROGRAM, PORTMAP_VERSION, GET_PORT, body)
+            return unpack_uint(reply, BODY_OFFSET)
+        finally:
+            sock.close()
+
+    def send_command(self, cmd):
+        """
+        Runs a complete connection cycle for the command.
+        @return: the reply without the line feed for queries, None otherwise.
+        """
+        phases = self.phases = dict.fromkeys(phase_timing.PHASES, 0.0)
+        last = time.time()
+        port = self.getport()
+        now = time.time()
+        phases[phase_timing.GETPORT], last = now - last, now
+
+        sock = self.connect(port)
+        try:
+            now = time.time()
+            phases[phase_timing.CONNECT], last = now - last, now
+
+            # Client ID, lock device, lock timeout, device name
+            reply = self.vxi11_call(sock, CREATE_LINK, UINT.pack(0) * 3 + pack_opaque(self.device))
+            link_id = UINT.pack(unpack_uint(reply, LINK_ID_OFFSET))
+            now = time.time()
+            phases[phase_timing.CREATE_LINK], last = now - last, now
+
+            # Link ID, I/O timeout, lock timeout, flags, data
+            self.vxi11_call(sock, DEVICE_WRITE, link_id + UINT.pack(0) * 2 + UINT.pack(END_FLAG) +
+                            pack_opaque(cmd))
+            now = time.time()
+            phases[phase_timing.DEVICE_WRITE], last = now - last, now
+
+            answer = None
+            if cmd.endswith("?"):
+                # Link ID, request size, I/O timeout, lock timeout, flags, termination character
+                reply = self.vxi11_call(sock, DEVICE_READ, link_id + UINT.pack(READ_SIZE) +
+                                        UINT.pack(0) * 3 + UINT.pack(TERM_CHAR))
+                size = unpack_uint(reply, READ_DATA_OFFSET)
+                answer = reply[READ_DATA_OFFSET + 4:READ_DATA_OFFSET + 4 + size].rstrip("\n")
+                now = time.time()
+                phases[phase_timing.DEVICE_READ], last = now - last, now
+
+            self.vxi11_call(sock, DESTROY_LINK, link_id)
+            now = time.time()
+            phases[phase_timing.DESTROY_LINK] = now - last
+        finally:
+            sock.close()
+        return answer
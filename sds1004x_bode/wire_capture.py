@@ -0,0 +1,111 @@
+'''
+Created on Oct 18, 2026
+
+Records the raw RPCBIND and VXI-11 requests and replies of the server
+into a compact binary capture file, which replay_capture.py sends back
+to a server.
+
+File format (native byte order):
+    header  8 bytes magic, 8 bytes wall clock time of the capture start
+    record  8 bytes monotonic time since the capture start,
+            4 bytes connection ID, 1 byte service, 1 byte event,
+            4 bytes data length, followed by the data
+The data of TCP requests and replies includes the record marking header.
+Each UDP datagram gets its own connection ID without OPEN and CLOSE events.
+'''
+
+import collections
+import struct
+import time
+import itertools
+from phase_timing import monotonic
+
+MAGIC = "SDSCAP\x00\x01"
+HEADER = struct.Struct("=8sd")
+RECORD = struct.Struct("=dIBBI")
+
+# Services
+RPCBIND_TCP = 0
+RPCBIND_UDP = 1
+VXI11 = 2
+SERVICES = ("rpcbind_tcp", "rpcbind_udp", "vxi11")
+
+# Events
+OPEN = 0
+REQUEST = 1
+REPLY = 2
+CLOSE = 3
+EVENTS = ("open", "request", "reply", "close")
+
+CaptureRecord = collections.namedtuple("CaptureRecord", "time connection service event data")
+
+class CaptureError(Exception):
+    pass
+
+class WireCapture(object):
+    '''
+    Writes the capture file. Must be used by the thread which runs the server loop.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.start = monotonic()
+        self.file.write(HEADER.pack(MAGIC, time.time()))
+        self.connection_ids = itertools.count(1)
+        self.records = 0
+
+    def open_connection(self, service):
+        """
+        Records a new connection.
+        @return: ID of the connection.
+        """
+        connection = self.connection_ids.next()
+        if service != RPCBIND_UDP:
+            self.record(connection, service, OPEN)
+        return connection
+
+    def close_connection(self, connection, service):
+        self.record(connection, service, CLOSE)
+
+    def record(self, connection, service, event, data=""):
+        """
+        @param data: string, bytearray or memoryview with the request or reply.
+        """
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        else:
+            data = str(data)
+        self.file.write(RECORD.pack(monotonic() - self.start, connection, service, event, len(data)))
+        self.file.write(data)
+        self.records += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            print "Capture: %d records written to %s." % (self.records, self.path)
+
+def read_capture(path):
+    """
+    Reads a capture file. The last record is ignored if it was truncated,
+    e.g. because the server was killed.
+    @return: the wall clock time of the capture start and a list of CaptureRecords.
+    @raise CaptureError: if the file isn't a capture.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise CaptureError("%s is not a capture file." % path)
+    magic, start_time = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CaptureError("%s is not a capture file." % path)
+    records = []
+    offset = HEADER.size
+    while offset + RECORD.size <= len(data):
+        timestamp, connection, service, event, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if offset + length > len(data):
+            break
+        records.append(CaptureRecord(timestamp, connection, service, event, data[offset:offset + length]))
+        offset += length
+    return start_time, records
@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+XDR encoding and decoding of RPC/VXI-11 packets.
+'''
+
+import struct
+
+# Unsigned 32-bit integer. Byte 0 is MSB.
+UINT = struct.Struct(">I")
+
+# Record marking header of the last (and only) fragment of a record.
+LAST_FRAGMENT = 0x80000000
+
+# RPC reply header following the record marking header
+## XID, Message Type: Reply (1), Reply State: accepted (0),
+## Verifier Flavor: AUTH_NULL (0), Verifier Length: 0,
+## Accept State: RPC executed successfully (0)
+RPC_REPLY_HEADER = struct.Struct(">4sIIIII")
+RPC_REPLY_FIELDS = (1, 0, 0, 0, 0)
+
+# XID position in TCP packets (after the record marking header).
+XID_OFFSET = 0x04
+# UDP packets don't have the record marking header.
+RECORD_MARK_SIZE = 0x04
+
+# Complete reply to VXI-11 DEVICE_WRITE request
+## Record marking header, RPC reply header, Error Code, Size
+WRITE_REPLY = struct.Struct(">I4sIIIIIII")
+WRITE_REPLY_SIZE = WRITE_REPLY.size - UINT.size
+
+def unpack_uint(data, offset=0):
+    """
+    Decodes a 32-bit unsigned integer at the given offset of a packet.
+    @param data: str, bytearray or memoryview.
+    """
+    return UINT.unpack_from(data, offset)[0]
+
+def pack_uint(num):
+    """
+    Encodes a 32-bit unsigned integer.
+    """
+    return UINT.pack(num)
+
+def pack_opaque(data):
+    """
+    Encodes variable length data: its length followed by the data
+    padded with zeros to a multiple of 4 bytes.
+    """
+    return UINT.pack(len(data)) + data + "\x00" * (-len(data) % 4)
+
+def get_xid(rx_data, offset=XID_OFFSET):
+    """
+    Extracts XID from an incoming RPC packet.
+    @param offset: XID position. Is 0 for packets received over UDP.
+    """
+    return memoryview(rx_data)[offset:offset + 4].tobytes()
+
+def rpc_reply(xid, body):
+    """
+    Generates a complete RPC reply: record marking header, RPC header and the body.
+    @param xid: XID from the request packet as bytes sequence.
+    @param body: reply data.
+    """
+    size = RPC_REPLY_HEADER.size + len(body)
+    hdr = RPC_REPLY_HEADER.pack(xid, *RPC_REPLY_FIELDS)
+    return UINT.pack(LAST_FRAGMENT | size) + hdr + body
+
+def write_reply(xid, size):
+    """
+    Generates a complete reply to VXI-11 DEVICE_WRITE request.
+    @param size: number of bytes written.
+    """
+    return WRITE_REPLY.pack(LAST_FRAGMENT | WRITE_REPLY_SIZE, xid,
+                            1, 0, 0, 0, 0,
+                            0, size)
+
+class ReplyTemplate(object):
+    '''
+    Precomputed RPC reply with a constant body.
+    Only XID has to be inserted for each request.
+    '''
+
+    def __init__(self, body):
+        body = str(body)
+        reply = rpc_reply("\x00" * 4, body)
+        self.prefix = reply[:XID_OFFSET]
+        self.suffix = reply[XID_OFFSET + 4:]
+
+    def render(self, xid):
+        """
+        Returns the reply to the request with the given XID.
+        """
+        return self.prefix + xid + self.suffix
+
+    def render_for(self, rx_data):
+        """
+        Returns the reply to the given request packet.
+        """
+        return self.prefix + get_xid(rx_data) + self.suffix
+
+    def render_datagram_for(self, rx_data):
+        """
+        Returns the reply to the given request datagram. UDP replies
+        don't have the record marking header.
+        """
+        return get_xid(rx_data, 0) + self.suffix